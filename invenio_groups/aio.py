@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2015 CERN.
+#
+# Invenio is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+
+"""Non-blocking read API for asynchronous applications.
+
+The data models are bound to the (thread-local) Flask-SQLAlchemy session
+and the supported database drivers are blocking, so the reads of
+:class:`GroupsReader` run on a bounded pool of worker threads
+(``GROUPS_ASYNC_WORKERS``), each call within its own application context
+and database session. Methods return :class:`concurrent.futures.Future`
+objects; on Python 3 :meth:`GroupsReader.for_asyncio` returns a reader
+whose methods return awaitable :mod:`asyncio` futures instead::
+
+    reader = get_reader().for_asyncio()
+    if await reader.is_member(group_id, user_id):
+        ...
+
+Results are plain ids, numbers and dictionaries (never ORM objects), so
+they can be used outside of the worker threads. The batch methods answer
+many lookups with one query per group (or chunk of groups).
+
+On Python 2 the ``futures`` package is required (``pip install
+invenio-groups[async]``).
+"""
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+
+from invenio.modules.accounts.models import User
+
+from .models import EffectiveMembership, Group, GroupAdmin, Membership, \
+    MembershipState, _chunks
+
+
+class GroupsReader(object):
+
+    """Run membership and admin reads on a bounded thread pool."""
+
+    def __init__(self, app, workers=4, executor=None, wrap=None):
+        """Initialize reader.
+
+        :param app: Flask application used by the workers.
+        :param workers: Maximal number of worker threads.
+        :param executor: Executor to share. Default: a new
+            ``ThreadPoolExecutor`` with ``workers`` threads.
+        :param wrap: Function applied to the returned futures.
+        """
+        self.app = app
+        self.executor = executor or ThreadPoolExecutor(max_workers=workers)
+        self.wrap = wrap
+
+    @classmethod
+    def from_app(cls, app):
+        """Create reader using ``GROUPS_ASYNC_WORKERS``."""
+        return cls(app, workers=app.config.get('GROUPS_ASYNC_WORKERS', 4))
+
+    def for_asyncio(self, loop=None):
+        """Get a reader returning :mod:`asyncio` futures (Python 3).
+
+        :param loop: Event loop. Default: the current event loop.
+        :returns: GroupsReader sharing the worker threads.
+        """
+        import asyncio
+
+        def wrap(future):
+            return asyncio.wrap_future(future, loop=loop)
+        return self.__class__(self.app, executor=self.executor, wrap=wrap)
+
+    def shutdown(self, wait=True):
+        """Stop the worker threads."""
+        self.executor.shutdown(wait=wait)
+
+    def _call(self, f, *args, **kwargs):
+        with self.app.app_context():
+            return f(*args, **kwargs)
+
+    def _submit(self, f, *args, **kwargs):
+        future = self.executor.submit(self._call, f, *args, **kwargs)
+        return self.wrap(future) if self.wrap else future
+
+    def is_member(self, group_id, user_id, with_pending=False):
+        """Check if a user is a group member (see ``Group.is_member``).
+
+        :returns: Future of True or False.
+        """
+        pair = (group_id, user_id)
+        return self._submit(lambda: are_members(
+            [pair], with_pending=with_pending)[pair])
+
+    def are_members(self, pairs, with_pending=False):
+        """Check many ``(group_id, user_id)`` pairs at once.
+
+        :returns: Future of a dictionary mapping pairs to True or False.
+        """
+        return self._submit(are_members, list(pairs),
+                            with_pending=with_pending)
+
+    def is_admin(self, group_id, user_id):
+        """Check if a user is directly an admin of a group.
+
+        :returns: Future of True or False.
+        """
+        pair = (group_id, user_id)
+        return self._submit(lambda: are_admins([pair])[pair])
+
+    def are_admins(self, pairs):
+        """Check many ``(group_id, user_id)`` pairs at once.
+
+        :returns: Future of a dictionary mapping pairs to True or False.
+        """
+        return self._submit(are_admins, list(pairs))
+
+    def groups_for_user(self, user_id, with_pending=False):
+        """Get ids of groups of a user (see ``Group.query_by_user``).
+
+        :returns: Future of a sorted list of group ids.
+        """
+        return self._submit(groups_for_user, user_id,
+                            with_pending=with_pending)
+
+    def members_of(self, group_id, state=MembershipState.ACTIVE):
+        """Get ids of direct members of a group.
+
+        :returns: Future of a sorted list of user ids.
+        """
+        return self._submit(members_of, group_id, state=state)
+
+    def pending_counts(self, group_ids):
+        """Get pending membership counters of many groups.
+
+        :returns: Future of a dictionary mapping group ids to dictionaries
+            with keys ``pending_admin`` and ``pending_user``.
+        """
+        return self._submit(pending_counts, list(group_ids))
+
+
+def get_reader():
+    """Get reader of current application."""
+    reader = current_app.extensions.get('invenio-groups-async')
+    if reader is None:
+        reader = GroupsReader.from_app(current_app._get_current_object())
+        current_app.extensions['invenio-groups-async'] = reader
+    return reader
+
+
+#
+# Blocking implementations (run within an application context)
+#
+
+def _by_group(pairs):
+    users = {}
+    for group_id, user_id in pairs:
+        users.setdefault(group_id, set()).add(user_id)
+    return users
+
+
+def are_members(pairs, with_pending=False):
+    """Check many ``(group_id, user_id)`` pairs for membership.
+
+    Active memberships include nested groups (see ``Group.is_member``).
+
+    :returns: Dictionary mapping pairs to True or False.
+    """
+    found = set()
+    for group_id, user_ids in _by_group(pairs).items():
+        for chunk in _chunks(list(user_ids)):
+            query = EffectiveMembership.query.filter(
+                EffectiveMembership.id_group == group_id,
+                EffectiveMembership.id_user.in_(chunk),
+            ).with_entities(EffectiveMembership.id_user)
+            if with_pending:
+                query = query.union(Membership.query.filter(
+                    Membership.id_group == group_id,
+                    Membership.id_user.in_(chunk),
+                ).with_entities(Membership.id_user))
+            found.update((group_id, uid) for (uid, ) in query)
+    return dict((pair, pair in found) for pair in pairs)
+
+
+def are_admins(pairs):
+    """Check many ``(group_id, user_id)`` pairs for direct admin rights.
+
+    :returns: Dictionary mapping pairs to True or False.
+    """
+    found = set()
+    for group_id, user_ids in _by_group(pairs).items():
+        for chunk in _chunks(list(user_ids)):
+            query = GroupAdmin.query.filter(
+                GroupAdmin.group_id == group_id,
+                GroupAdmin.admin_type == 'User',
+                GroupAdmin.admin_id.in_(chunk),
+            ).with_entities(GroupAdmin.admin_id)
+            found.update((group_id, uid) for (uid, ) in query)
+    return dict((pair, pair in found) for pair in pairs)
+
+
+def groups_for_user(user_id, with_pending=False):
+    """Get sorted ids of groups a user is member or admin of."""
+    user = User.query.get(user_id)
+    if user is None:
+        return []
+    return sorted(gid for (gid, ) in Group.query_by_user(
+        user, with_pending=with_pending).with_entities(Group.id))
+
+
+def members_of(group_id, state=MembershipState.ACTIVE):
+    """Get sorted ids of direct members of a group in a given state."""
+    return sorted(uid for (uid, ) in Membership.query_by_group(
+        group_id, state=state).with_entities(Membership.id_user))
+
+
+def pending_counts(group_ids):
+    """Get pending membership counters of many groups."""
+    result = {}
+    for chunk in _chunks(list(set(group_ids))):
+        for gid, pending_admin, pending_user in Group.query.filter(
+                Group.id.in_(chunk)).with_entities(
+                    Group.id, Group.pending_admin_count,
+                    Group.pending_user_count):
+            result[gid] = dict(pending_admin=pending_admin,
+                               pending_user=pending_user)
+    return result
@@ -0,0 +1,430 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2015 CERN.
+#
+# Invenio is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+
+"""Cache of group membership sets.
+
+The cache is disabled by default and can be enabled with
+``GROUPS_CACHE_ENABLED``. Values are stored in a pluggable backend
+(``GROUPS_CACHE_BACKEND``), either process-local (:class:`MemoryBackend`)
+or shared between processes (:class:`RedisBackend`). Entries are
+invalidated by the membership and admin signals defined in
+:mod:`invenio_groups.signals`.
+"""
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+
+from six import string_types
+
+from werkzeug.utils import import_string
+
+from .signals import group_admin_added, group_admin_removed, \
+    group_created, group_deleted, member_group_added, member_group_removed, \
+    memberships_accepted, memberships_added, memberships_removed
+
+
+class LRUCache(object):
+
+    """Thread-safe, size-bounded LRU cache with optional TTL."""
+
+    def __init__(self, maxsize=1024, ttl=None, timer=time.time):
+        """Initialize cache.
+
+        :param int maxsize: Maximum number of entries.
+        :param ttl: Number of seconds an entry is valid. ``None`` means
+            forever.
+        :param timer: Function returning current time in seconds.
+        """
+        assert maxsize > 0
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.timer = timer
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.RLock()
+
+    def get(self, key, default=None):
+        """Get value for a key and mark it as recently used."""
+        with self._lock:
+            try:
+                value, expires = self._data.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            if expires is not None and expires <= self.timer():
+                self.misses += 1
+                return default
+            self._data[key] = (value, expires)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        """Set value for a key, evicting the least recently used entry."""
+        expires = self.timer() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = (value, expires)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        """Remove a key from the cache."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        """Remove all entries."""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        """Number of stored entries (including expired ones)."""
+        return len(self._data)
+
+    def stats(self):
+        """Get hit/miss counters.
+
+        :returns: Dictionary with keys ``hits``, ``misses`` and ``size``.
+        """
+        return dict(hits=self.hits, misses=self.misses, size=len(self))
+
+
+class CacheBackend(object):
+
+    """Interface of membership cache storage backends."""
+
+    def get(self, key):
+        """Get a value or ``None``."""
+        raise NotImplementedError()
+
+    def get_many(self, keys):
+        """Get a list of values (``None`` for missing keys)."""
+        return [self.get(key) for key in keys]
+
+    def get_counters(self, keys):
+        """Get a list of counter values (``0`` for missing counters)."""
+        return [value or 0 for value in self.get_many(keys)]
+
+    def set(self, key, value, ttl=None):
+        """Store a set of integers under a key."""
+        raise NotImplementedError()
+
+    def incr(self, key):
+        """Atomically increment an integer counter and return new value."""
+        raise NotImplementedError()
+
+    @classmethod
+    def from_app(cls, app):
+        """Create backend from application configuration."""
+        return cls()
+
+
+class MemoryBackend(CacheBackend):
+
+    """Process-local backend storing values in a LRU cache.
+
+    Version counters are kept in a separate LRU of the same size. Counters
+    take their values from a single increasing sequence, and a missing
+    counter reads as the largest value evicted so far. An evicted counter
+    therefore never returns to a value it had before, so entries written
+    under old versions stay unreachable.
+    """
+
+    def __init__(self, maxsize=10000, timer=time.time):
+        """Initialize backend."""
+        self.storage = LRUCache(maxsize=maxsize, timer=timer)
+        self.timer = timer
+        self.maxsize = maxsize
+        self._counters = OrderedDict()
+        self._floor = 0
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Get a value or ``None``."""
+        value = self.storage.get(key)
+        if value is None:
+            return None
+        value, expires = value
+        if expires is not None and expires <= self.timer():
+            self.storage.delete(key)
+            return None
+        return value
+
+    def set(self, key, value, ttl=None):
+        """Store a set of integers under a key."""
+        expires = self.timer() + ttl if ttl is not None else None
+        self.storage.set(key, (frozenset(value), expires))
+
+    def get_counters(self, keys):
+        """Get counter values and mark them as recently used."""
+        with self._lock:
+            values = []
+            for key in keys:
+                value = self._counters.pop(key, None)
+                if value is None:
+                    value = self._floor
+                else:
+                    self._counters[key] = value
+                values.append(value)
+            return values
+
+    def incr(self, key):
+        """Increment a version counter, evicting the least recently used."""
+        with self._lock:
+            self._sequence += 1
+            self._counters.pop(key, None)
+            self._counters[key] = self._sequence
+            while len(self._counters) > self.maxsize:
+                dummy, value = self._counters.popitem(last=False)
+                self._floor = max(self._floor, value)
+            return self._sequence
+
+    @classmethod
+    def from_app(cls, app):
+        """Create backend from application configuration."""
+        return cls(maxsize=app.config.get('GROUPS_CACHE_SIZE', 10000))
+
+
+class RedisBackend(CacheBackend):
+
+    """Backend storing values in Redis (or any server speaking its protocol).
+
+    Sets are stored as JSON encoded lists. Version counters are stored
+    without expiration.
+    """
+
+    def __init__(self, client):
+        """Initialize backend.
+
+        :param client: Object implementing the ``redis.StrictRedis`` API
+            (e.g. a ``fakeredis.FakeStrictRedis`` in tests).
+        """
+        self.client = client
+
+    def _decode(self, value):
+        if value is None:
+            return None
+        if isinstance(value, bytes):
+            value = value.decode('utf-8')
+        value = json.loads(value)
+        return frozenset(value) if isinstance(value, list) else value
+
+    def get(self, key):
+        """Get a value or ``None``."""
+        return self._decode(self.client.get(key))
+
+    def get_many(self, keys):
+        """Get many values in one round trip."""
+        return [self._decode(v) for v in self.client.mget(keys)]
+
+    def set(self, key, value, ttl=None):
+        """Store a set of integers under a key."""
+        self.client.set(key, json.dumps(sorted(value)), ex=ttl)
+
+    def incr(self, key):
+        """Increment a version counter."""
+        return self.client.incr(key)
+
+    @classmethod
+    def from_app(cls, app):
+        """Create backend from ``GROUPS_CACHE_REDIS_URL``."""
+        import redis
+        return cls(redis.StrictRedis.from_url(
+            app.config.get('GROUPS_CACHE_REDIS_URL',
+                           'redis://localhost:6379/0')))
+
+
+class MembershipCache(object):
+
+    """Cache of member and admin group ids per user and member ids per group.
+
+    Each entry key embeds a global generation and a per user (or per group)
+    version. Writes bump the versions instead of deleting entries, which
+    makes invalidation safe for backends shared between processes. Old
+    entries simply expire.
+    """
+
+    def __init__(self, backend=None, ttl=300, prefix='groups'):
+        """Initialize cache.
+
+        :param backend: CacheBackend instance. Default: MemoryBackend.
+        :param ttl: Number of seconds an entry is valid.
+        :param prefix: Prefix of all keys.
+        """
+        self.backend = backend if backend is not None else MemoryBackend()
+        self.ttl = ttl
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _version_key(self, kind, obj_id):
+        return '{0}:{1}:{2}:version'.format(self.prefix, kind, obj_id)
+
+    def _get(self, kind, obj_id, name, loader):
+        obj_id = int(obj_id)
+        generation, version = self.backend.get_counters([
+            '{0}:generation'.format(self.prefix),
+            self._version_key(kind, obj_id),
+        ])
+        key = '{0}:{1}:{2}:{3}:{4}:{5}'.format(
+            self.prefix, generation, kind, obj_id, version, name)
+        value = self.backend.get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if value is None:
+            value = frozenset(loader())
+            self.backend.set(key, value, ttl=self.ttl)
+        return value
+
+    def member_group_ids(self, user_id, loader):
+        """Get ids of groups the user is an active member of.
+
+        :param user_id: User identifier.
+        :param loader: Function returning the ids on a cache miss.
+        :returns: Frozen set of group ids.
+        """
+        return self._get('user', user_id, 'member', loader)
+
+    def admin_group_ids(self, user_id, loader):
+        """Get ids of groups the user is directly an admin of.
+
+        :param user_id: User identifier.
+        :param loader: Function returning the ids on a cache miss.
+        :returns: Frozen set of group ids.
+        """
+        return self._get('user', user_id, 'admin', loader)
+
+    def group_member_ids(self, group_id, loader):
+        """Get ids of active members of a group.
+
+        :param group_id: Group identifier.
+        :param loader: Function returning the ids on a cache miss.
+        :returns: Frozen set of user ids.
+        """
+        return self._get('group', group_id, 'member', loader)
+
+    def invalidate_user(self, user_id):
+        """Invalidate all entries of a user."""
+        self.backend.incr(self._version_key('user', int(user_id)))
+
+    def invalidate_group(self, group_id):
+        """Invalidate all entries of a group."""
+        self.backend.incr(self._version_key('group', int(group_id)))
+
+    def clear(self):
+        """Invalidate all entries."""
+        self.backend.incr('{0}:generation'.format(self.prefix))
+
+    def stats(self):
+        """Get hit/miss counters of this process.
+
+        :returns: Dictionary with keys ``hits`` and ``misses``.
+        """
+        return dict(hits=self.hits, misses=self.misses)
+
+
+def get_cache():
+    """Get membership cache of current application.
+
+    :returns: MembershipCache or None if caching is disabled.
+    """
+    if not current_app.config.get('GROUPS_CACHE_ENABLED', False):
+        return None
+    cache = current_app.extensions.get('invenio-groups-cache')
+    if cache is None:
+        backend = current_app.config.get('GROUPS_CACHE_BACKEND',
+                                         MemoryBackend)
+        if isinstance(backend, string_types):
+            backend = import_string(backend)
+        cache = MembershipCache(
+            backend=backend.from_app(current_app),
+            ttl=current_app.config.get('GROUPS_CACHE_TTL', 300),
+            prefix=current_app.config.get('GROUPS_CACHE_PREFIX', 'groups'),
+        )
+        current_app.extensions['invenio-groups-cache'] = cache
+    return cache
+
+
+#
+# Signal receivers
+#
+
+def _invalidate(user_ids=(), group_ids=()):
+    cache = get_cache()
+    if cache is not None:
+        for user_id in user_ids:
+            cache.invalidate_user(user_id)
+        for group_id in group_ids:
+            cache.invalidate_group(group_id)
+
+
+@memberships_added.connect
+@memberships_removed.connect
+def _on_memberships_changed(sender, group=None, user_ids=None, **kwargs):
+    _invalidate(user_ids=user_ids or [], group_ids=[group.id])
+
+
+@memberships_accepted.connect
+def _on_memberships_accepted(sender, keys=None, **kwargs):
+    keys = keys or []
+    _invalidate(user_ids=set(id_user for id_user, dummy in keys),
+                group_ids=set(id_group for dummy, id_group in keys))
+
+
+@group_admin_added.connect
+@group_admin_removed.connect
+def _on_admin_changed(sender, admin_type=None, admin_id=None, **kwargs):
+    if admin_type == 'User':
+        _invalidate(user_ids=[admin_id])
+
+
+@group_created.connect
+def _on_group_created(sender, group=None, **kwargs):
+    _invalidate(user_ids=[a.admin_id for a in group.admins
+                          if a.admin_type == 'User'])
+
+
+@group_deleted.connect
+def _on_group_deleted(sender, group=None, user_ids=None, **kwargs):
+    _invalidate(user_ids=user_ids or [], group_ids=[group.id])
+
+
+@member_group_added.connect
+@member_group_removed.connect
+def _on_member_group_changed(sender, group=None, member=None, **kwargs):
+    # Effective members of the member group gain or lose the group and its
+    # ancestors; cached group members are direct members only.
+    from .models import EffectiveMembership
+
+    if get_cache() is not None:
+        _invalidate(user_ids=[uid for (uid, ) in EffectiveMembership.query
+                              .filter_by(id_group=member.id)
+                              .with_entities(EffectiveMembership.id_user)])
@@ -20,3 +20,98 @@
 """Groups parameters."""
 
 from __future__ import absolute_import, print_function, unicode_literals
+
+GROUPS_CACHE_ENABLED = False
+"""Enable the cache of group membership sets."""
+
+GROUPS_CACHE_BACKEND = 'invenio_groups.cache:MemoryBackend'
+"""Cache backend. Use ``invenio_groups.cache:RedisBackend`` to share the
+cache between processes and hosts."""
+
+GROUPS_CACHE_SIZE = 10000
+"""Maximum number of entries of the in-memory cache backend."""
+
+GROUPS_CACHE_TTL = 300
+"""Number of seconds a cache entry is valid."""
+
+GROUPS_CACHE_PREFIX = 'groups'
+"""Prefix of cache keys."""
+
+GROUPS_CACHE_REDIS_URL = 'redis://localhost:6379/0'
+"""Redis URL used by the Redis cache backend."""
+
+GROUPS_SEARCH_ENGINE = 'invenio_groups.search:SubstringEngine'
+"""Search engine of group names and members. One of
+``invenio_groups.search:SubstringEngine`` (``LIKE '%q%'``, default),
+``invenio_groups.search:PrefixEngine`` (``LIKE 'q%'``, uses indexes but
+only matches the beginning of names) or
+``invenio_groups.search:NGramEngine`` (trigram index)."""
+
+GROUPS_SEARCH_NGRAM_THRESHOLD = 1.0
+"""Minimal fraction of search string trigrams a group name must contain to
+match with the n-gram search engine. Lower values tolerate typos."""
+
+GROUPS_INSTRUMENTATION_ENABLED = False
+"""Count and time SQL queries of groups views and model methods."""
+
+GROUPS_INSTRUMENTATION_HEADER = 'X-Groups-Profile'
+"""Response header with the profile summary of a request. ``None``
+disables the header."""
+
+GROUPS_INSTRUMENTATION_LOG = True
+"""Log the profile summary of each request at ``INFO`` level."""
+
+GROUPS_JOBS_BACKEND = 'invenio_groups.jobs:ThreadPoolBackend'
+"""Backend running background jobs. Use
+``invenio_groups.jobs:CeleryBackend`` to run them on Celery workers."""
+
+GROUPS_JOBS_WORKERS = 2
+"""Number of worker threads of the thread pool job backend."""
+
+GROUPS_JOBS_STALE_TIMEOUT = 3600
+"""Number of seconds without progress after which a running job is marked
+as failed (its worker is assumed to have died)."""
+
+GROUPS_JOBS_CHUNK_SIZE = 1000
+"""Number of memberships deleted per transaction by background deletion."""
+
+GROUPS_MEMBER_INDEX_SET = 'invenio_groups.memberindex:SortedIntSet'
+"""Set class of the in-memory member index. ``pyroaring:BitMap`` uses
+compressed bitmaps (requires the ``pyroaring`` package)."""
+
+GROUPS_MEMBER_INDEX_TTL = 300
+"""Number of seconds after which a group of the member index is reloaded
+from the database (bounds staleness caused by other processes)."""
+
+GROUPS_OUTBOX_ENDPOINTS = []
+"""URLs receiving the change log as batched, gzip compressed JSON POSTs."""
+
+GROUPS_OUTBOX_BATCH_SIZE = 500
+"""Maximum number of change log entries per POST."""
+
+GROUPS_OUTBOX_SETTLE = 5
+"""Minimal age in seconds of delivered change log entries (delivers bursts
+of changes in one batch)."""
+
+GROUPS_OUTBOX_GAP_TIMEOUT = 60
+"""Minimal age in seconds of a change log entry following a gap in the
+sequence numbers before delivery skips the gap. Must exceed the time a
+transaction writing the change log stays open after its first write."""
+
+GROUPS_OUTBOX_TIMEOUT = 10
+"""Socket timeout in seconds of change log delivery."""
+
+GROUPS_OUTBOX_BACKOFF = 2
+"""Seconds to wait after the first failed delivery; doubled after each
+further failure."""
+
+GROUPS_OUTBOX_BACKOFF_MAX = 600
+"""Maximum number of seconds to wait between delivery attempts."""
+
+GROUPS_ASYNC_WORKERS = 4
+"""Maximal number of worker threads of the non-blocking read API (see
+:mod:`invenio_groups.aio`); bounds the database connections it uses."""
+
+GROUPS_SETTINGS_ETAGS = True
+"""Answer conditional requests of the settings views with 304 (Not
+Modified) using ETags derived from group and user version stamps."""
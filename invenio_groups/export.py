@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2015 CERN.
+#
+# Invenio is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+
+"""Serialization of streamed group member lists.
+
+Serializers turn an iterator of rows (see
+:meth:`invenio_groups.models.Membership.stream_by_group`) into an iterator
+of text lines, so a response can be streamed without building it in
+memory.
+"""
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import csv
+import json
+from datetime import datetime
+
+from six import PY2, BytesIO, StringIO, text_type
+
+from .models import EXPORT_FIELDS
+
+
+def _value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _csv_line(values):
+    """Format one CSV line (with line terminator)."""
+    values = ['' if v is None else _value(v) for v in values]
+    if PY2:
+        buf = BytesIO()
+        csv.writer(buf).writerow([
+            v.encode('utf-8') if isinstance(v, text_type) else v
+            for v in values
+        ])
+        return buf.getvalue().decode('utf-8')
+    buf = StringIO()
+    csv.writer(buf).writerow(values)
+    return buf.getvalue()
+
+
+def to_csv(rows, fields=EXPORT_FIELDS):
+    """Serialize rows as CSV with a header line.
+
+    :param rows: Iterable of dictionaries.
+    :param fields: Names of the columns.
+    :returns: Iterator of lines.
+    """
+    yield _csv_line(fields)
+    for row in rows:
+        yield _csv_line([row[field] for field in fields])
+
+
+def to_jsonlines(rows, fields=EXPORT_FIELDS):
+    """Serialize rows as JSON lines (one object per line).
+
+    :param rows: Iterable of dictionaries.
+    :param fields: Names of the exported keys.
+    :returns: Iterator of lines.
+    """
+    for row in rows:
+        yield json.dumps(dict(
+            (field, _value(row[field])) for field in fields
+        ), sort_keys=True) + '\n'
+
+
+FORMATS = {
+    'csv': ('text/csv', to_csv),
+    'jsonl': ('application/x-ndjson', to_jsonlines),
+}
+"""Export formats by name: mimetype and serializer."""
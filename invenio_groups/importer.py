@@ -0,0 +1,340 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2015 CERN.
+#
+# Invenio is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+
+"""Streaming bulk import of memberships (e.g. synchronisation from HR data).
+
+Rows have the keys ``group`` (group name), ``user`` (e-mail or user id),
+``state`` (optional :class:`~invenio_groups.models.MembershipState` code or
+one of ``active``, ``pending_admin``, ``pending_user``; default active) and
+``admin`` (optional boolean). They are read lazily with :func:`read_csv`
+or :func:`read_jsonlines` and applied by :func:`import_memberships` in
+batches:
+
+1. groups and users of the batch are resolved with one query per chunk of
+   names, e-mails and ids,
+2. existing memberships and admin rows of the batch are read,
+3. missing memberships are inserted and changed states are updated with
+   multi-row statements, missing admins are inserted, counters are
+   adjusted, and the batch is committed.
+
+Memberships which are not listed in the input are left untouched.
+"""
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import csv
+import json
+import time
+from itertools import islice
+
+from invenio.ext.sqlalchemy import db
+from invenio.modules.accounts.models import User
+
+from six import PY2, integer_types, string_types
+
+from .models import ChangeType, EffectiveMembership, Group, GroupAdmin, \
+    GroupChange, Membership, MembershipState, _chunks, _state_counter, \
+    _update_counters
+from .signals import group_admin_added, memberships_accepted, \
+    memberships_added, memberships_removed
+
+STATE_NAMES = {
+    'active': MembershipState.ACTIVE,
+    'pending_admin': MembershipState.PENDING_ADMIN,
+    'pending_user': MembershipState.PENDING_USER,
+}
+"""Accepted readable names of membership states."""
+
+STATS = ('rows', 'created', 'updated', 'unchanged', 'admins_added',
+         'invalid', 'unknown_groups', 'unknown_users')
+"""Counters reported by :func:`import_memberships`."""
+
+
+def read_csv(lines):
+    """Read rows from CSV with a header line.
+
+    :param lines: Iterable of lines (byte strings on Python 2).
+    :returns: Iterator of dictionaries.
+    """
+    for row in csv.DictReader(lines):
+        if PY2:
+            row = dict((k.decode('utf-8'),
+                        v.decode('utf-8') if v is not None else None)
+                       for k, v in row.items())
+        yield row
+
+
+def read_jsonlines(lines):
+    """Read rows from JSON lines (one object per line).
+
+    :param lines: Iterable of lines.
+    :returns: Iterator of dictionaries.
+    """
+    for line in lines:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+READERS = {
+    'csv': read_csv,
+    'jsonl': read_jsonlines,
+}
+"""Row readers by format name."""
+
+
+def _parse_bool(value):
+    if isinstance(value, string_types):
+        return value.strip().lower() in ('1', 'true', 'yes', 'y')
+    return bool(value)
+
+
+def _parse_row(row):
+    """Normalize a row to ``(group_name, email, user_id, state, admin)``.
+
+    :raises ValueError: If the row is invalid.
+    """
+    group = (row.get('group') or '').strip()
+    user = row.get('user')
+    if isinstance(user, string_types):
+        user = user.strip()
+    if not group or not user:
+        raise ValueError('Missing group or user.')
+
+    email, user_id = None, None
+    if isinstance(user, integer_types) or user.isdigit():
+        user_id = int(user)
+    else:
+        email = user
+
+    state = (row.get('state') or MembershipState.ACTIVE).strip()
+    state = STATE_NAMES.get(state.lower(), state)
+    if not MembershipState.validate(state):
+        raise ValueError('Invalid state {0!r}.'.format(state))
+
+    return group, email, user_id, state, _parse_bool(row.get('admin'))
+
+
+def _resolve_groups(names, cache):
+    """Resolve group names to ids, remembering them across batches."""
+    missing = [name for name in set(names) if name not in cache]
+    for chunk in _chunks(missing):
+        cache.update(Group.query_by_names(chunk).with_entities(
+            Group.name, Group.id))
+    for name in missing:
+        cache.setdefault(name, None)
+
+
+def _resolve_users(emails, user_ids):
+    """Get mapping of lower case e-mails and ids of users to user ids."""
+    resolved = {}
+    for chunk in _chunks(list(set(emails))):
+        resolved.update(
+            (email.lower(), uid) for email, uid in User.query.filter(
+                User.email.in_(chunk)).with_entities(User.email, User.id))
+    for chunk in _chunks(list(set(user_ids))):
+        resolved.update((uid, uid) for (uid, ) in User.query.filter(
+            User.id.in_(chunk)).with_entities(User.id))
+    return resolved
+
+
+def _import_batch(batch, groups, stats, dry_run):
+    """Apply one batch of rows and update ``stats``."""
+    parsed = []
+    for row in batch:
+        try:
+            parsed.append(_parse_row(row))
+        except (AttributeError, ValueError):
+            stats['invalid'] += 1
+
+    _resolve_groups([p[0] for p in parsed], groups)
+    users = _resolve_users([p[1] for p in parsed if p[1] is not None],
+                           [p[2] for p in parsed if p[2] is not None])
+
+    desired, admins = {}, set()
+    for name, email, user_id, state, admin in parsed:
+        id_group = groups[name]
+        id_user = users.get(email.lower() if email is not None else user_id)
+        if id_group is None:
+            stats['unknown_groups'] += 1
+        elif id_user is None:
+            stats['unknown_users'] += 1
+        else:
+            desired[(id_user, id_group)] = state
+            if admin:
+                admins.add((id_user, id_group))
+    if not desired:
+        return
+
+    group_ids = list(set(key[1] for key in desired))
+    user_ids = list(set(key[0] for key in desired))
+    existing, existing_admins = {}, set()
+    for chunk in _chunks(user_ids):
+        existing.update(
+            ((id_user, id_group), state)
+            for id_user, id_group, state in Membership.query.filter(
+                Membership.id_group.in_(group_ids),
+                Membership.id_user.in_(chunk),
+            ).with_entities(Membership.id_user, Membership.id_group,
+                            Membership.state)
+        )
+        existing_admins.update(GroupAdmin.query.filter(
+            GroupAdmin.admin_type == 'User',
+            GroupAdmin.admin_id.in_(chunk),
+            GroupAdmin.group_id.in_(group_ids),
+        ).with_entities(GroupAdmin.admin_id, GroupAdmin.group_id))
+
+    inserts, updates, deltas = [], {}, {}
+    for (id_user, id_group), state in desired.items():
+        old = existing.get((id_user, id_group))
+        old = getattr(old, 'code', old)
+        group_deltas = deltas.setdefault(id_group, {})
+        if old is None:
+            inserts.append(dict(id_user=id_user, id_group=id_group,
+                                state=state))
+        elif old != state:
+            updates.setdefault((id_group, old, state), []).append(id_user)
+            name = _state_counter(old)
+            group_deltas[name] = group_deltas.get(name, 0) - 1
+        else:
+            stats['unchanged'] += 1
+            continue
+        name = _state_counter(state)
+        group_deltas[name] = group_deltas.get(name, 0) + 1
+    new_admins = sorted(admins - existing_admins)
+    for id_user, id_group in new_admins:
+        deltas.setdefault(id_group, {})
+        deltas[id_group]['admins_count'] = \
+            deltas[id_group].get('admins_count', 0) + 1
+
+    stats['created'] += len(inserts)
+    stats['updated'] += sum(len(v) for v in updates.values())
+    stats['admins_added'] += len(new_admins)
+    if dry_run:
+        return
+
+    try:
+        if inserts:
+            db.session.execute(Membership.__table__.insert(), inserts)
+        for (id_group, old, state), ids in updates.items():
+            for chunk in _chunks(ids):
+                Membership.query.filter(
+                    Membership.id_group == id_group,
+                    Membership.id_user.in_(chunk),
+                ).update({Membership.state: state}, synchronize_session=False)
+        if new_admins:
+            db.session.execute(GroupAdmin.__table__.insert(), [
+                dict(group_id=id_group, admin_type='User', admin_id=id_user)
+                for id_user, id_group in new_admins
+            ])
+        for id_group, group_deltas in deltas.items():
+            _update_counters([id_group], **group_deltas)
+        _update_effective(inserts, updates)
+        GroupChange.log(ChangeType.MEMBER_ADDED, inserts)
+        GroupChange.log(ChangeType.MEMBER_UPDATED, [
+            dict(id_group=id_group, id_user=id_user, state=state)
+            for (id_group, old, state), ids in updates.items()
+            for id_user in ids
+        ])
+        GroupChange.log(ChangeType.ADMIN_ADDED, [
+            dict(id_group=id_group, admin_type='User', admin_id=id_user)
+            for id_user, id_group in new_admins
+        ])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    _send_signals(inserts, updates, new_admins)
+
+
+def _update_effective(inserts, updates):
+    """Maintain effective memberships of a flushed batch."""
+    added, removed = {}, {}
+    for row in inserts:
+        if row['state'] == MembershipState.ACTIVE:
+            added.setdefault(row['id_group'], []).append(row['id_user'])
+    for (id_group, old, state), ids in updates.items():
+        if state == MembershipState.ACTIVE:
+            added.setdefault(id_group, []).extend(ids)
+        elif old == MembershipState.ACTIVE:
+            removed.setdefault(id_group, []).extend(ids)
+    for id_group, ids in added.items():
+        EffectiveMembership.add(id_group, ids)
+    for id_group, ids in removed.items():
+        EffectiveMembership.refresh_users(id_group, ids)
+
+
+def _send_signals(inserts, updates, new_admins):
+    """Send membership and admin signals of an applied batch."""
+    touched = set(row['id_group'] for row in inserts)
+    touched.update(key[0] for key in updates)
+    touched.update(id_group for dummy, id_group in new_admins)
+    objects = dict((g.id, g) for g in Group.query.filter(
+        Group.id.in_(list(touched))))
+
+    added = {}
+    for row in inserts:
+        added.setdefault((row['id_group'], row['state']), []).append(
+            row['id_user'])
+    accepted = []
+    for (id_group, old, state), ids in updates.items():
+        if state == MembershipState.ACTIVE:
+            accepted.extend((id_user, id_group) for id_user in ids)
+        else:
+            # Membership replaced by one in another (pending) state.
+            memberships_removed.send(Membership, group=objects[id_group],
+                                     user_ids=ids)
+            added.setdefault((id_group, state), []).extend(ids)
+
+    for (id_group, state), ids in added.items():
+        memberships_added.send(Membership, group=objects[id_group],
+                               user_ids=ids, state=state)
+    if accepted:
+        memberships_accepted.send(Membership, keys=accepted)
+    for id_user, id_group in new_admins:
+        group_admin_added.send(GroupAdmin, group=objects[id_group],
+                               admin_type='User', admin_id=id_user)
+
+
+def import_memberships(rows, batch_size=1000, dry_run=False, progress=None):
+    """Create or update memberships and admins from a stream of rows.
+
+    :param rows: Iterable of dictionaries (see module documentation).
+    :param int batch_size: Number of rows resolved and applied at once
+        (one transaction per batch).
+    :param bool dry_run: Only compute the changes.
+    :param progress: Function called with the statistics after each batch.
+    :returns: Dictionary with counters :data:`STATS` and ``seconds``.
+    """
+    stats = dict.fromkeys(STATS, 0)
+    stats['seconds'] = 0.0
+    groups = {}
+    start = time.time()
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            break
+        stats['rows'] += len(batch)
+        _import_batch(batch, groups, stats, dry_run)
+        stats['seconds'] = time.time() - start
+        if progress is not None:
+            progress(stats)
+    return stats
@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2015 CERN.
+#
+# Invenio is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+
+"""Online conversion of groups tables from MyISAM to InnoDB (MySQL only).
+
+Each table is converted without holding long locks:
+
+1. An empty InnoDB copy ``_<table>_new`` is created with the missing
+   foreign key indexes and constraints.
+2. Triggers mirror every insert, update and delete on the original table to
+   the copy.
+3. Rows are copied in ranges of ``chunk_size`` key values with
+   ``INSERT IGNORE`` (rows written by the triggers win).
+4. Tables are swapped with one atomic ``RENAME TABLE`` and the old table
+   (together with its triggers) is dropped.
+
+If anything fails before the swap, the triggers and the copy are dropped
+again and the original table is left as it was. Tables which are already
+InnoDB only get the foreign key constraints they are missing.
+
+:data:`TABLES` lists every groups table. The upgrade recipes create the
+tables added after the initial release with ``mysql_engine='InnoDB'``, but
+tables created by ``db.create_all()`` on a server defaulting to MyISAM are
+converted too.
+"""
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import math
+import time
+
+from invenio.ext.sqlalchemy import db
+
+from sqlalchemy import text
+
+ESTIMATED_ROWS_PER_SECOND = 20000
+"""Copy throughput assumed by the dry-run time estimate."""
+
+TABLES = [
+    # (table, chunking column, [(column, referenced table, column)])
+    ('group', 'id', []),
+    ('groupMEMBER', 'id_user', [('id_group', 'group', 'id'),
+                                ('id_user', 'user', 'id')]),
+    ('groupADMIN', 'id', [('group_id', 'group', 'id')]),
+    ('groupADMINCLOSURE', 'ancestor_id', [('ancestor_id', 'group', 'id'),
+                                          ('descendant_id', 'group', 'id')]),
+    ('groupNAMENGRAM', 'group_id', [('group_id', 'group', 'id')]),
+    ('groupJOB', 'id', [('id_user', 'user', 'id')]),
+    ('groupCHANGE', 'seq', []),
+    ('groupDELIVERY', 'seq', []),
+    ('groupMEMBERGROUP', 'id_group', [('id_group', 'group', 'id'),
+                                      ('id_member_group', 'group', 'id')]),
+    ('groupMEMBERCLOSURE', 'ancestor_id', [('ancestor_id', 'group', 'id'),
+                                           ('descendant_id', 'group', 'id')]),
+    ('groupEFFECTIVEMEMBER', 'id_user', [('id_group', 'group', 'id'),
+                                         ('id_user', 'user', 'id')]),
+]
+"""Tables converted in order (referenced tables first)."""
+
+
+def _scalar(conn, sql, **params):
+    return conn.execute(text(sql), **params).scalar()
+
+
+def _engine(conn, table):
+    return _scalar(
+        conn, 'SELECT ENGINE FROM information_schema.TABLES '
+        'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :t', t=table)
+
+
+def _columns(conn, table):
+    return [c for (c, ) in conn.execute(text(
+        'SELECT COLUMN_NAME FROM information_schema.COLUMNS '
+        'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :t '
+        'ORDER BY ORDINAL_POSITION'), t=table)]
+
+
+def _primary_key(conn, table):
+    return [c for (c, ) in conn.execute(text(
+        'SELECT COLUMN_NAME FROM information_schema.KEY_COLUMN_USAGE '
+        'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :t '
+        'AND CONSTRAINT_NAME = \'PRIMARY\' ORDER BY ORDINAL_POSITION'),
+        t=table)]
+
+
+def _has_leading_index(conn, table, column):
+    return bool(_scalar(
+        conn, 'SELECT COUNT(*) FROM information_schema.STATISTICS '
+        'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :t '
+        'AND COLUMN_NAME = :c AND SEQ_IN_INDEX = 1', t=table, c=column))
+
+
+def _has_foreign_key(conn, table, column):
+    return bool(_scalar(
+        conn, 'SELECT COUNT(*) FROM information_schema.KEY_COLUMN_USAGE '
+        'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :t '
+        'AND COLUMN_NAME = :c AND REFERENCED_TABLE_NAME IS NOT NULL',
+        t=table, c=column))
+
+
+def _quote(names, prefix=''):
+    return ', '.join('{0}`{1}`'.format(prefix, n) for n in names)
+
+
+def estimate(conn, table, column, chunk_size):
+    """Estimate rows, chunks and duration of the conversion of a table."""
+    info = conn.execute(text(
+        'SELECT ENGINE, TABLE_ROWS FROM information_schema.TABLES '
+        'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :t'),
+        t=table).first()
+    if info is None:
+        return None
+    low, high = conn.execute(text(
+        'SELECT MIN(`{0}`), MAX(`{0}`) FROM `{1}`'.format(column, table)
+    )).first()
+    rows = info[1] or 0
+    chunks = 0 if low is None else int(
+        math.ceil((high - low + 1) / float(chunk_size)))
+    return dict(
+        table=table, engine=info[0], rows=rows, chunks=chunks,
+        seconds=rows / float(ESTIMATED_ROWS_PER_SECOND),
+    )
+
+
+def add_foreign_keys(conn, table, references):
+    """Add missing constraints to a table which is already InnoDB.
+
+    Tables created as InnoDB while a referenced table was still MyISAM
+    could not get their foreign keys at creation time.
+    """
+    for col, ref_table, ref_col in references:
+        if _engine(conn, ref_table) == 'InnoDB' and \
+                not _has_foreign_key(conn, table, col):
+            conn.execute(
+                'ALTER TABLE `{0}` ADD CONSTRAINT `fk_{0}_{1}` FOREIGN KEY '
+                '(`{1}`) REFERENCES `{2}` (`{3}`)'.format(
+                    table, col, ref_table, ref_col))
+
+
+def _drop_copy(conn, table, new, triggers):
+    """Drop triggers and copy of a table whose conversion failed."""
+    for suffix, dummy_event, dummy_body in triggers:
+        conn.execute('DROP TRIGGER IF EXISTS `_{0}_{1}`'.format(
+            table, suffix))
+    conn.execute('DROP TABLE IF EXISTS `{0}`'.format(new))
+
+
+def convert_table(conn, table, column, references, chunk_size=10000,
+                  pause=0, log=print):
+    """Convert one table to InnoDB using a trigger-synchronized copy.
+
+    On failure before the swap, the copy and the triggers are dropped and
+    the error is raised again.
+    """
+    new, old = '_{0}_new'.format(table), '_{0}_old'.format(table)
+    columns = _columns(conn, table)
+    pk = _primary_key(conn, table)
+
+    where_old = ' AND '.join('`{0}` = OLD.`{0}`'.format(c) for c in pk)
+    replace = 'REPLACE INTO `{0}` ({1}) VALUES ({2})'.format(
+        new, _quote(columns), _quote(columns, 'NEW.'))
+    delete = 'DELETE FROM `{0}` WHERE {1}'.format(new, where_old)
+    triggers = [
+        ('ins', 'INSERT', replace),
+        ('upd', 'UPDATE', 'BEGIN {0}; {1}; END'.format(delete, replace)),
+        ('del', 'DELETE', delete),
+    ]
+
+    _drop_copy(conn, table, new, triggers)
+    try:
+        conn.execute('CREATE TABLE `{0}` LIKE `{1}`'.format(new, table))
+        conn.execute('ALTER TABLE `{0}` ENGINE=InnoDB'.format(new))
+        for col, ref_table, ref_col in references:
+            if not _has_leading_index(conn, new, col):
+                conn.execute(
+                    'ALTER TABLE `{0}` ADD INDEX `ix_{1}_{2}` (`{2}`)'.format(
+                        new, table, col))
+            if _engine(conn, ref_table) == 'InnoDB':
+                conn.execute(
+                    'ALTER TABLE `{0}` ADD CONSTRAINT `fk_{1}_{2}` FOREIGN '
+                    'KEY (`{2}`) REFERENCES `{3}` (`{4}`)'.format(
+                        new, table, col, ref_table, ref_col))
+
+        for suffix, event, body in triggers:
+            conn.execute(
+                'CREATE TRIGGER `_{0}_{1}` AFTER {2} ON `{0}` FOR EACH ROW '
+                '{3}'.format(table, suffix, event, body))
+
+        conn.execute('SET foreign_key_checks = 0')
+        try:
+            low, high = conn.execute(
+                'SELECT MIN(`{0}`), MAX(`{0}`) FROM `{1}`'.format(
+                    column, table)
+            ).first()
+            copy = text(
+                'INSERT IGNORE INTO `{0}` ({1}) SELECT {1} FROM `{2}` '
+                'WHERE `{3}` >= :low AND `{3}` < :high'.format(
+                    new, _quote(columns), table, column))
+            start = low
+            while low is not None and start <= high:
+                conn.execute(copy, low=start, high=start + chunk_size)
+                start += chunk_size
+                log('{0}: copied up to {1} of {2}'.format(table, start, high))
+                if pause:
+                    time.sleep(pause)
+        finally:
+            conn.execute('SET foreign_key_checks = 1')
+
+        conn.execute('RENAME TABLE `{0}` TO `{1}`, `{2}` TO `{0}`'.format(
+            table, old, new))
+    except Exception:
+        log('{0}: conversion failed, dropping {1}'.format(table, new))
+        _drop_copy(conn, table, new, triggers)
+        raise
+
+    for suffix, dummy_event, dummy_body in triggers:
+        conn.execute('DROP TRIGGER IF EXISTS `_{0}_{1}`'.format(
+            table, suffix))
+    conn.execute('DROP TABLE `{0}`'.format(old))
+
+
+def convert_to_innodb(dry_run=False, chunk_size=10000, pause=0, log=print):
+    """Convert all groups tables stored with another engine to InnoDB.
+
+    :param bool dry_run: Only report estimated row counts and time.
+    :param int chunk_size: Width of the primary key range copied at once.
+    :param float pause: Seconds to sleep between chunks.
+    :param log: Function used to report progress.
+    :returns: List of estimates (dictionaries with keys ``table``,
+        ``engine``, ``rows``, ``chunks`` and ``seconds``) of the tables
+        which need conversion.
+    """
+    engine = db.engine
+    if engine.dialect.name != 'mysql':
+        log('Nothing to do: not a MySQL database.')
+        return []
+
+    report = []
+    with engine.connect() as conn:
+        for table, column, references in TABLES:
+            info = estimate(conn, table, column, chunk_size)
+            if info is None:
+                continue
+            if info['engine'] == 'InnoDB':
+                if not dry_run:
+                    add_foreign_keys(conn, table, references)
+                continue
+            report.append(info)
+            log('{table}: {engine}, ~{rows} rows, {chunks} chunks, '
+                '~{seconds:.0f}s'.format(**info))
+            if not dry_run:
+                convert_table(conn, table, column, references,
+                              chunk_size=chunk_size, pause=pause, log=log)
+    return report
@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2015 CERN.
+#
+# Invenio is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+
+"""SQL query counting and timing of groups operations.
+
+Public methods of the data models are wrapped with :func:`instrumented`.
+While a profile is active (see :func:`profile`, or any request to the
+settings views when ``GROUPS_INSTRUMENTATION_ENABLED`` is set), every SQL
+statement is attributed to all instrumented methods currently running in
+the thread. Queries executed later by a returned query object are
+attributed to the caller.
+
+Results are sent with the ``operation_profiled`` and ``request_profiled``
+signals, and for requests also as a response header and a log line.
+"""
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import current_app
+
+from sqlalchemy import event
+
+from .signals import operation_profiled, request_profiled
+
+_local = threading.local()
+
+
+class Frame(object):
+
+    """Statistics of one running operation."""
+
+    def __init__(self, name):
+        """Start measuring an operation.
+
+        :param name: Name of the operation.
+        """
+        self.name = name
+        self.queries = 0
+        self.query_time = 0.0
+        self.duration = 0.0
+        self.operations = {}
+        self.start = time.time()
+
+    def stop(self):
+        """Stop measuring."""
+        self.duration = time.time() - self.start
+
+    def add_operation(self, frame):
+        """Aggregate statistics of a finished nested operation by name."""
+        stats = self.operations.setdefault(
+            frame.name, dict(calls=0, queries=0, query_time=0.0,
+                             duration=0.0))
+        stats['calls'] += 1
+        stats['queries'] += frame.queries
+        stats['query_time'] += frame.query_time
+        stats['duration'] += frame.duration
+
+    def summary(self):
+        """Format statistics as ``key=value`` pairs."""
+        operations = ','.join(
+            '{0}:{1}/{2}/{3:.1f}'.format(
+                name, s['calls'], s['queries'], s['query_time'] * 1000)
+            for name, s in sorted(self.operations.items()))
+        return 'queries={0}; sql_ms={1:.1f}; total_ms={2:.1f}{3}'.format(
+            self.queries, self.query_time * 1000, self.duration * 1000,
+            '; ops=' + operations if operations else '')
+
+
+def _stack():
+    return getattr(_local, 'stack', None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context,
+                           executemany):
+    # The start is kept on the execution context, which is discarded when
+    # the statement fails, so nothing is left behind on the connection.
+    if _stack() and context is not None:
+        context._groups_query_start = time.time()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context,
+                          executemany):
+    stack = _stack()
+    start = getattr(context, '_groups_query_start', None)
+    if not stack or start is None:
+        return
+    elapsed = time.time() - start
+    for frame in stack:
+        frame.queries += 1
+        frame.query_time += elapsed
+
+
+def install(engine):
+    """Attach query listeners to an engine (once)."""
+    if not event.contains(engine, 'before_cursor_execute',
+                          _before_cursor_execute):
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+def instrumented(name):
+    """Decorate a function to be measured as operation ``name``.
+
+    Without an active profile the overhead is a thread-local lookup.
+    """
+    def decorator(f):
+        @wraps(f)
+        def inner(*args, **kwargs):
+            stack = _stack()
+            if not stack:
+                return f(*args, **kwargs)
+            frame = Frame(name)
+            stack.append(frame)
+            try:
+                return f(*args, **kwargs)
+            finally:
+                stack.pop()
+                frame.stop()
+                stack[0].add_operation(frame)
+                operation_profiled.send(
+                    name, queries=frame.queries,
+                    query_time=frame.query_time, duration=frame.duration)
+        return inner
+    return decorator
+
+
+def instrument_class(cls):
+    """Wrap public methods and class methods of a model class."""
+    for attr, value in list(vars(cls).items()):
+        if attr.startswith('_'):
+            continue
+        name = '{0}.{1}'.format(cls.__name__, attr)
+        if isinstance(value, classmethod):
+            setattr(cls, attr, classmethod(instrumented(name)(
+                value.__func__)))
+        elif isinstance(value, staticmethod):
+            setattr(cls, attr, staticmethod(instrumented(name)(
+                value.__func__)))
+        elif callable(value) and hasattr(value, '__code__'):
+            setattr(cls, attr, instrumented(name)(value))
+    return cls
+
+
+def start(name):
+    """Start a profile in the current thread.
+
+    :param name: Name of the profiled unit (e.g. view endpoint).
+    :returns: Root Frame, or the running one if a profile is active.
+    """
+    from invenio.ext.sqlalchemy import db
+
+    stack = _stack()
+    if stack:
+        return stack[0]
+    install(db.engine)
+    frame = Frame(name)
+    _local.stack = [frame]
+    return frame
+
+
+def stop():
+    """Stop the profile of the current thread.
+
+    :returns: Root Frame or None if no profile was active.
+    """
+    stack = _stack()
+    _local.stack = None
+    if stack:
+        stack[0].stop()
+        return stack[0]
+
+
+@contextmanager
+def profile(name):
+    """Profile a block of code, e.g. a maintenance command.
+
+    :param name: Name of the profiled unit.
+    :returns: Root Frame (statistics are complete after the block).
+    """
+    nested = bool(_stack())
+    frame = start(name)
+    try:
+        yield frame
+    finally:
+        if not nested:
+            stop()
+
+
+def start_request(endpoint):
+    """Start profiling a request if instrumentation is enabled."""
+    if current_app.config.get('GROUPS_INSTRUMENTATION_ENABLED', False):
+        start(endpoint)
+
+
+def finish_request(response):
+    """Finish the profile of a request, report and annotate the response."""
+    frame = stop()
+    if frame is None:
+        return response
+
+    request_profiled.send(
+        current_app._get_current_object(), endpoint=frame.name,
+        queries=frame.queries, query_time=frame.query_time,
+        duration=frame.duration, operations=frame.operations)
+
+    summary = frame.summary()
+    header = current_app.config.get('GROUPS_INSTRUMENTATION_HEADER',
+                                    'X-Groups-Profile')
+    if header:
+        response.headers[header] = summary
+    if current_app.config.get('GROUPS_INSTRUMENTATION_LOG', True):
+        current_app.logger.info(
+            'groups-profile endpoint={0}; {1}'.format(frame.name, summary))
+    return response
+
+
+def teardown_request(exc=None):
+    """Discard the profile of a failed request."""
+    stop()
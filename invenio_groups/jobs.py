@@ -0,0 +1,318 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2015 CERN.
+#
+# Invenio is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+
+"""Background jobs for heavy group operations.
+
+A job is a row of :class:`invenio_groups.models.GroupJob` naming a task
+registered with :func:`task` and its keyword arguments. :func:`enqueue`
+stores the job and hands its id to the backend configured by
+``GROUPS_JOBS_BACKEND``:
+
+* :class:`ThreadPoolBackend` runs jobs in worker threads of the web
+  process (no external services).
+* :class:`CeleryBackend` sends jobs to the Celery workers.
+
+Workers execute :func:`run_job`, which records status, progress and result
+on the job row, so the state can be read from any process. Every update
+of a job refreshes its ``modified`` timestamp, which serves as heartbeat:
+:func:`fail_stale_jobs` marks running jobs without an update for
+``GROUPS_JOBS_STALE_TIMEOUT`` seconds as failed, since the worker running
+them died.
+"""
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import threading
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from invenio.ext.sqlalchemy import db
+
+from six import string_types
+from six.moves import queue
+
+from werkzeug.utils import import_string
+
+from .models import Group, GroupJob, InvitationStatus, JobStatus, _chunks
+
+TASKS = {}
+"""Registered tasks by name."""
+
+
+class JobError(Exception):
+
+    """Expected failure of a job, recorded without a traceback."""
+
+
+def task(name):
+    """Register a function as task ``name``.
+
+    The function is called with the job keyword arguments, the id of the
+    user who submitted the job as ``user_id`` (or ``None``) and a
+    ``progress(done, total=None)`` function.
+    """
+    def decorator(f):
+        TASKS[name] = f
+        return f
+    return decorator
+
+
+class JobBackend(object):
+
+    """Job backend interface."""
+
+    def submit(self, job_id):
+        """Schedule execution of a stored job."""
+        raise NotImplementedError()
+
+    @classmethod
+    def from_app(cls, app):
+        """Create backend from application configuration."""
+        return cls()
+
+
+class ThreadPoolBackend(JobBackend):
+
+    """Run jobs in a pool of daemon threads of the current process."""
+
+    def __init__(self, app, workers=2):
+        """Initialize backend; threads are started on first submit.
+
+        :param app: Flask application used by the workers.
+        :param workers: Number of worker threads.
+        """
+        self.app = app
+        self.workers = workers
+        self.queue = queue.Queue()
+        self.threads = []
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_app(cls, app):
+        """Create backend using ``GROUPS_JOBS_WORKERS``."""
+        return cls(app, workers=app.config.get('GROUPS_JOBS_WORKERS', 2))
+
+    def _work(self):
+        while True:
+            job_id = self.queue.get()
+            try:
+                with self.app.app_context():
+                    try:
+                        run_job(job_id)
+                    except Exception:
+                        db.session.rollback()
+                        current_app.logger.exception(
+                            'Group job {0} crashed.'.format(job_id))
+            except Exception:
+                self.app.logger.exception(
+                    'Group job {0} could not be started.'.format(job_id))
+            finally:
+                self.queue.task_done()
+
+    def submit(self, job_id):
+        """Queue a job for the worker threads."""
+        with self.lock:
+            while len(self.threads) < self.workers:
+                thread = threading.Thread(
+                    target=self._work,
+                    name='invenio-groups-jobs-{0}'.format(len(self.threads)))
+                thread.daemon = True
+                thread.start()
+                self.threads.append(thread)
+        self.queue.put(job_id)
+
+    def wait(self):
+        """Block until all queued jobs are finished."""
+        self.queue.join()
+
+
+class CeleryBackend(JobBackend):
+
+    """Run jobs on Celery workers (see :mod:`invenio_groups.tasks`)."""
+
+    def submit(self, job_id):
+        """Send a job to the Celery queue."""
+        from .tasks import run_job_task
+        run_job_task.delay(job_id)
+
+
+def get_backend():
+    """Get job backend of current application."""
+    backend = current_app.extensions.get('invenio-groups-jobs')
+    if backend is None:
+        cls = current_app.config.get('GROUPS_JOBS_BACKEND',
+                                     ThreadPoolBackend)
+        if isinstance(cls, string_types):
+            cls = import_string(cls)
+        backend = cls.from_app(current_app._get_current_object())
+        current_app.extensions['invenio-groups-jobs'] = backend
+        fail_stale_jobs()
+    return backend
+
+
+def enqueue(name, user=None, **kwargs):
+    """Store a job and schedule its execution.
+
+    :param name: Name of a registered task.
+    :param user: User submitting the job.
+    :param kwargs: JSON serializable task arguments.
+    :returns: GroupJob object.
+    """
+    assert name in TASKS
+    try:
+        job = GroupJob(name=name, kwargs=kwargs,
+                       id_user=user.get_id() if user else None)
+        db.session.add(job)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    get_backend().submit(job.id)
+    return job
+
+
+def _update(job_id, **values):
+    values['modified'] = datetime.now()
+    GroupJob.query.filter_by(id=job_id).update(
+        values, synchronize_session=False)
+    db.session.commit()
+
+
+def run_job(job_id):
+    """Execute a stored job and record its progress and result.
+
+    The job is claimed with a conditional update from ``PENDING`` to
+    ``RUNNING``, so a job submitted twice (or picked up by two workers)
+    runs only once. Tasks should report progress more often than every
+    ``GROUPS_JOBS_STALE_TIMEOUT`` seconds, otherwise the job is taken for
+    stale by :func:`fail_stale_jobs`.
+
+    :param job_id: Id of a GroupJob.
+    """
+    try:
+        claimed = GroupJob.query.filter_by(
+            id=job_id, status=JobStatus.PENDING
+        ).update(dict(status=JobStatus.RUNNING, modified=datetime.now()),
+                 synchronize_session=False)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    if claimed != 1:
+        return
+    job = GroupJob.query.get(job_id)
+    name, kwargs, user_id = job.name, dict(job.kwargs), job.id_user
+
+    def progress(done, total=None):
+        values = dict(progress=done)
+        if total is not None:
+            values['total'] = total
+        _update(job_id, **values)
+
+    try:
+        result = TASKS[name](progress=progress, user_id=user_id, **kwargs)
+    except JobError as e:
+        db.session.rollback()
+        _update(job_id, status=JobStatus.FAILED, error=str(e))
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.exception('Group job {0} failed.'.format(job_id))
+        _update(job_id, status=JobStatus.FAILED, error=str(e))
+    else:
+        _update(job_id, status=JobStatus.DONE, result=result)
+
+
+def fail_stale_jobs(timeout=None):
+    """Mark running jobs whose worker stopped updating them as failed.
+
+    :param timeout: Seconds since the last update of a job after which it
+        is considered stale. Default: ``GROUPS_JOBS_STALE_TIMEOUT``.
+    :returns: Number of failed jobs.
+    """
+    if timeout is None:
+        timeout = current_app.config.get('GROUPS_JOBS_STALE_TIMEOUT', 3600)
+    cutoff = datetime.now() - timedelta(seconds=timeout)
+    try:
+        count = GroupJob.query.filter(
+            GroupJob.status == JobStatus.RUNNING,
+            GroupJob.modified < cutoff,
+        ).update(dict(status=JobStatus.FAILED,
+                      error='Job stopped responding.',
+                      modified=datetime.now()),
+                 synchronize_session=False)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return count
+
+
+def _administered_group(group_id, user_id):
+    """Get a group which the submitter of a job may still administer.
+
+    :raises: JobError if the group was deleted or the user is no longer
+        an admin of it.
+    """
+    from invenio.modules.accounts.models import User
+
+    group = Group.query.get(group_id)
+    if group is None:
+        raise JobError('Group {0} does not exist.'.format(group_id))
+    if user_id is not None:
+        user = User.query.get(user_id)
+        if user is None or not Group.query_administered_by(user).filter(
+                Group.id == group_id).count():
+            raise JobError('User {0} cannot administer group {1}.'.format(
+                user_id, group_id))
+    return group
+
+
+#
+# Tasks
+#
+
+@task('invite_by_emails')
+def invite_by_emails(group_id, emails, progress, user_id=None,
+                     chunk_size=500):
+    """Invite users to a group by emails.
+
+    :returns: Dictionary with lists of emails per ``InvitationStatus``.
+    """
+    group = _administered_group(group_id, user_id)
+    result = dict((s, []) for s in (InvitationStatus.INVITED,
+                                    InvitationStatus.ALREADY_MEMBER,
+                                    InvitationStatus.UNKNOWN))
+    progress(0, len(emails))
+    for i, chunk in enumerate(_chunks(list(emails), chunk_size)):
+        for email, status in group.invite_by_emails(chunk).items():
+            result[status].append(email)
+        progress(min(len(emails), (i + 1) * chunk_size))
+    return result
+
+
+@task('delete_group')
+def delete_group(group_id, progress, user_id=None, chunk_size=1000):
+    """Delete a group in chunks of memberships."""
+    group = _administered_group(group_id, user_id)
+    name = group.name
+    progress(0, group.active_count + group.pending_admin_count +
+             group.pending_user_count)
+    group.delete(chunk_size=chunk_size, progress=progress)
+    return dict(name=name)
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2015 CERN.
+#
+# Invenio is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+
+"""Groups maintenance commands."""
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+from invenio.ext.script import Manager
+
+manager = Manager(usage=__doc__)
+
+
+@manager.option('--dry-run', action='store_true', dest='dry_run',
+                default=False, help='Only report estimated rows and time.')
+@manager.option('--chunk-size', dest='chunk_size', type=int, default=10000,
+                help='Width of primary key ranges copied at once.')
+@manager.option('--pause', dest='pause', type=float, default=0,
+                help='Seconds to sleep between chunks.')
+def innodb(dry_run=False, chunk_size=10000, pause=0):
+    """Convert groups tables from MyISAM to InnoDB without long locks."""
+    from .innodb import convert_to_innodb
+    report = convert_to_innodb(dry_run=dry_run, chunk_size=chunk_size,
+                               pause=pause)
+    print('Total: ~{0} rows, ~{1:.0f}s'.format(
+        sum(r['rows'] for r in report),
+        sum(r['seconds'] for r in report)))
+
+
+@manager.option('group_ids', nargs='*', type=int, metavar='GROUP_ID',
+                help='Groups to check. Default: all groups.')
+def recount(group_ids=None):
+    """Repair denormalized membership and admin counters of groups."""
+    from .models import Group
+    repaired = Group.recount(group_ids or None)
+    print('Repaired counters of {0} group(s){1}'.format(
+        len(repaired), ': ' + ', '.join(str(i) for i in repaired)
+        if repaired else '.'))
+
+
+@manager.option('group_id', type=int, metavar='GROUP_ID')
+@manager.option('--chunk-size', dest='chunk_size', type=int, default=1000,
+                help='Number of memberships deleted per transaction.')
+@manager.option('--pause', dest='pause', type=float, default=0,
+                help='Seconds to sleep between chunks.')
+def delete(group_id, chunk_size=1000, pause=0):
+    """Delete a (huge) group removing memberships in short transactions."""
+    from .models import Group
+    group = Group.query.get(group_id)
+    if group is None:
+        print('Group {0} does not exist.'.format(group_id))
+        return
+    name = group.name
+    group.delete(chunk_size=chunk_size, pause=pause)
+    print('Deleted group {0} ({1}).'.format(group_id, name))
+
+
+@manager.option('source', metavar='FILE',
+                help='CSV or JSON lines file ("-" reads standard input).')
+@manager.option('--format', dest='format', choices=['csv', 'jsonl'],
+                default=None, help='Default: guessed from file extension.')
+@manager.option('--batch-size', dest='batch_size', type=int, default=1000,
+                help='Number of rows applied per transaction.')
+@manager.option('--dry-run', action='store_true', dest='dry_run',
+                default=False, help='Only report the changes.')
+def load(source, format=None, batch_size=1000, dry_run=False):
+    """Create or update memberships and admins from a CSV or JSON lines file.
+
+    Rows have the fields ``group``, ``user`` (e-mail or id), ``state`` and
+    ``admin``.
+    """
+    import io
+    import sys
+
+    from six import PY2
+
+    from .importer import READERS, STATS, import_memberships
+
+    if format is None:
+        format = 'jsonl' if source.endswith(('.jsonl', '.json')) else 'csv'
+
+    def report(stats):
+        print('{0} {1} ({2:.0f} rows/s)'.format(
+            'Would apply:' if dry_run else 'Applied:',
+            ', '.join('{0}={1}'.format(key, stats[key]) for key in STATS),
+            stats['rows'] / stats['seconds'] if stats['seconds'] else 0))
+
+    if source == '-':
+        lines = sys.stdin
+    elif PY2:
+        lines = open(source, 'rb')
+    else:
+        lines = io.open(source, encoding='utf-8', newline='')
+    try:
+        stats = import_memberships(READERS[format](lines),
+                                   batch_size=batch_size, dry_run=dry_run,
+                                   progress=report)
+    finally:
+        if lines is not sys.stdin:
+            lines.close()
+    print('Done in {0:.1f}s.'.format(stats['seconds']))
+
+
+@manager.option('--forever', action='store_true', dest='forever',
+                default=False, help='Keep polling for new changes.')
+@manager.option('--interval', dest='interval', type=float, default=5,
+                help='Seconds between polls with --forever.')
+def deliver(forever=False, interval=5):
+    """Push the change log to GROUPS_OUTBOX_ENDPOINTS."""
+    import time
+
+    from .outbox import deliver_all
+    while True:
+        for url, count in sorted(deliver_all().items()):
+            if count:
+                print('Delivered {0} change(s) to {1}.'.format(count, url))
+        if not forever:
+            break
+        time.sleep(interval)
+
+
+def main():
+    """Run manager."""
+    from invenio.base.factory import create_app
+    app = create_app()
+    manager.app = app
+    manager.run()
+
+
+if __name__ == '__main__':
+    main()
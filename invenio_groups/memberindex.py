@@ -0,0 +1,486 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2015 CERN.
+#
+# Invenio is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+
+"""In-memory index of active group members for fast set operations.
+
+The index keeps the ids of active members of each group, including the
+members of nested member groups
+(:class:`invenio_groups.models.EffectiveMembership`), in a compact set
+(:class:`SortedIntSet`, a sorted ``array`` of integers, or any class with
+the same interface such as ``pyroaring.BitMap``, see
+``GROUPS_MEMBER_INDEX_SET``). Groups are loaded lazily, or in bulk with
+:meth:`MemberIndex.load`, and are kept current by the membership signals
+defined in :mod:`invenio_groups.signals`.
+
+The index is process-local: changes made by other processes are only seen
+after an entry expires (``GROUPS_MEMBER_INDEX_TTL``).
+
+Example::
+
+    index = get_member_index()
+    index.difference(index.intersection(a.id, b.id), c.id)
+    are_members(x, user_ids)
+"""
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import threading
+import time
+from array import array
+from bisect import bisect_left
+
+from flask import current_app
+
+from six import string_types
+
+from werkzeug.utils import import_string
+
+from .signals import group_deleted, member_group_added, \
+    member_group_removed, memberships_accepted, memberships_added, \
+    memberships_removed
+
+
+class SortedIntSet(object):
+
+    """Set of non-negative integers stored as a sorted ``array``.
+
+    Uses 4 bytes per element (instead of about 70 for a ``frozenset``).
+    Set operations merge both arrays in linear time, or look the elements
+    of a much smaller set up by binary search.
+    """
+
+    __slots__ = ('_data', )
+
+    typecode = str('I')
+
+    def __init__(self, values=(), presorted=False):
+        """Initialize set.
+
+        :param values: Iterable of integers.
+        :param presorted: ``values`` are already sorted and unique.
+        """
+        if isinstance(values, SortedIntSet):
+            self._data = array(self.typecode, values._data)
+        elif presorted:
+            self._data = array(self.typecode, values)
+        else:
+            self._data = array(self.typecode, sorted(set(values)))
+
+    @classmethod
+    def _wrap(cls, data):
+        obj = cls.__new__(cls)
+        obj._data = data
+        return obj
+
+    def __len__(self):
+        """Number of elements."""
+        return len(self._data)
+
+    def __iter__(self):
+        """Iterate over elements in ascending order."""
+        return iter(self._data)
+
+    def __contains__(self, value):
+        """Test membership by binary search."""
+        data = self._data
+        i = bisect_left(data, value)
+        return i < len(data) and data[i] == value
+
+    def __eq__(self, other):
+        """Compare elements with another set (or iterable of integers)."""
+        if isinstance(other, SortedIntSet):
+            return self._data == other._data
+        return set(self._data) == set(other)
+
+    def __ne__(self, other):
+        """Compare elements with another set."""
+        return not self == other
+
+    def __repr__(self):
+        """Represent set."""
+        return 'SortedIntSet({0!r})'.format(list(self._data))
+
+    def add(self, value):
+        """Add an element (linear time, use ``|`` to add many)."""
+        data = self._data
+        i = bisect_left(data, value)
+        if i == len(data) or data[i] != value:
+            data.insert(i, value)
+
+    def discard(self, value):
+        """Remove an element if present (linear time, use ``-`` for many)."""
+        data = self._data
+        i = bisect_left(data, value)
+        if i < len(data) and data[i] == value:
+            del data[i]
+
+    def contains_many(self, values):
+        """Test membership of many values at once.
+
+        Values are looked up in ascending order by binary search, each
+        search starting at the position of the previous one, so ``k``
+        values cost ``O(k log n)`` instead of a walk over all ``n``
+        elements.
+
+        :param values: Iterable of integers.
+        :returns: List of booleans in the order of ``values``.
+        """
+        values = list(values)
+        result = [False] * len(values)
+        data, n, j = self._data, len(self._data), 0
+        for i in sorted(range(len(values)), key=values.__getitem__):
+            value = values[i]
+            j = bisect_left(data, value, j)
+            if j == n:
+                break
+            result[i] = data[j] == value
+        return result
+
+    def _small_large(self, other):
+        if len(self._data) <= len(other._data):
+            return self._data, other._data
+        return other._data, self._data
+
+    def __and__(self, other):
+        """Intersection."""
+        other = _as_sorted(other)
+        small, large = self._small_large(other)
+        if len(small) * 16 < len(large):
+            found = SortedIntSet._wrap(large).contains_many(small)
+            return self._wrap(array(self.typecode, (
+                v for v, f in zip(small, found) if f)))
+        result, i, j = array(self.typecode), 0, 0
+        while i < len(small) and j < len(large):
+            a, b = small[i], large[j]
+            if a == b:
+                result.append(a)
+                i += 1
+                j += 1
+            elif a < b:
+                i += 1
+            else:
+                j += 1
+        return self._wrap(result)
+
+    def __or__(self, other):
+        """Union."""
+        other = _as_sorted(other)
+        a, b = self._data, other._data
+        result, i, j = array(self.typecode), 0, 0
+        while i < len(a) and j < len(b):
+            if a[i] == b[j]:
+                result.append(a[i])
+                i += 1
+                j += 1
+            elif a[i] < b[j]:
+                result.append(a[i])
+                i += 1
+            else:
+                result.append(b[j])
+                j += 1
+        result.extend(a[i:])
+        result.extend(b[j:])
+        return self._wrap(result)
+
+    def __sub__(self, other):
+        """Difference."""
+        other = _as_sorted(other)
+        a, b = self._data, other._data
+        result, i, j = array(self.typecode), 0, 0
+        while i < len(a):
+            while j < len(b) and b[j] < a[i]:
+                j += 1
+            if j == len(b) or b[j] != a[i]:
+                result.append(a[i])
+            i += 1
+        return self._wrap(result)
+
+
+def _as_sorted(values):
+    return values if isinstance(values, SortedIntSet) else \
+        SortedIntSet(values)
+
+
+def _contains_many(members, values):
+    if hasattr(members, 'contains_many'):
+        return members.contains_many(values)
+    return [value in members for value in values]
+
+
+def _group_id(group_or_id):
+    return getattr(group_or_id, 'id', group_or_id)
+
+
+class MemberIndex(object):
+
+    """Index of active member ids per group."""
+
+    def __init__(self, set_class=SortedIntSet, ttl=None, timer=time.time):
+        """Initialize index.
+
+        :param set_class: Class of member sets. It must accept an iterable
+            of integers (including another set, which is copied) and
+            support ``in``, ``len``, iteration, ``&``, ``|`` and ``-``
+            returning new sets.
+        :param ttl: Number of seconds after which a group is reloaded.
+            ``None`` means never.
+        :param timer: Function returning current time in seconds.
+        """
+        self.set_class = set_class
+        self.ttl = ttl
+        self.timer = timer
+        self._groups = {}
+        self._lock = threading.Lock()
+
+    def _expires(self):
+        return self.timer() + self.ttl if self.ttl is not None else None
+
+    def _query(self, group_ids=None):
+        from .models import EffectiveMembership
+
+        query = EffectiveMembership.query.with_entities(
+            EffectiveMembership.id_group, EffectiveMembership.id_user)
+        if group_ids is not None:
+            query = query.filter(
+                EffectiveMembership.id_group.in_(list(group_ids)))
+        return query.order_by(EffectiveMembership.id_group,
+                              EffectiveMembership.id_user)
+
+    def _build(self, ids):
+        if self.set_class is SortedIntSet:
+            return SortedIntSet(ids, presorted=True)
+        return self.set_class(ids)
+
+    def load(self, group_ids=None, batch=10000):
+        """Bulk load member sets with a single streamed query.
+
+        :param group_ids: Ids of groups to load. ``None`` loads all groups.
+        :param batch: Number of rows fetched per round trip.
+        :returns: Number of loaded groups.
+        """
+        if group_ids is not None:
+            group_ids = list(group_ids)
+        loaded, current, ids = {}, None, []
+        for id_group, id_user in self._query(group_ids).yield_per(batch):
+            if id_group != current:
+                if current is not None:
+                    loaded[current] = self._build(ids)
+                current, ids = id_group, []
+            ids.append(id_user)
+        if current is not None:
+            loaded[current] = self._build(ids)
+        for id_group in group_ids or ():
+            loaded.setdefault(id_group, self.set_class())
+
+        expires = self._expires()
+        with self._lock:
+            if group_ids is None:
+                self._groups.clear()
+            for id_group, members in loaded.items():
+                self._groups[id_group] = (members, expires)
+        return len(loaded)
+
+    def _members(self, group_or_id):
+        """Get the stored member set of a group, which must not be changed.
+
+        Stored sets are never modified; updates replace them (see
+        :meth:`add`), so a set can be read without holding the lock.
+        """
+        id_group = _group_id(group_or_id)
+        entry = self._groups.get(id_group)
+        if entry is None or (entry[1] is not None and
+                             entry[1] <= self.timer()):
+            self.load([id_group])
+            entry = self._groups[id_group]
+        return entry[0]
+
+    def members(self, group_or_id):
+        """Get a copy of the active member ids of a group.
+
+        Groups are loaded on demand.
+        """
+        return self.set_class(self._members(group_or_id))
+
+    def intersection(self, *groups):
+        """Ids of users who are active members of all given groups."""
+        assert groups
+        sets = sorted((self._members(g) for g in groups), key=len)
+        if len(sets) == 1:
+            return self.set_class(sets[0])
+        result = sets[0] & sets[1]
+        for members in sets[2:]:
+            result = result & members
+        return result
+
+    def union(self, *groups):
+        """Ids of users who are active members of any of the given groups."""
+        result = self.set_class()
+        for group in groups:
+            result = result | self._members(group)
+        return result
+
+    def difference(self, group, *others):
+        """Ids of active members of a group who are in none of the others.
+
+        :param group: Group, group id or a set returned by another operation.
+        :param others: Groups or group ids to exclude.
+        """
+        if isinstance(group, self.set_class):
+            result = group
+        elif others:
+            result = self._members(group)
+        else:
+            return self.members(group)
+        for other in others:
+            result = result - self._members(other)
+        return result
+
+    def are_members(self, group_or_id, user_ids):
+        """Test which users are active members of a group.
+
+        :param group_or_id: Group or group id.
+        :param user_ids: Iterable of user ids.
+        :returns: List of booleans in the order of ``user_ids``.
+        """
+        return _contains_many(self._members(group_or_id), user_ids)
+
+    def add(self, id_group, user_ids):
+        """Add users to a loaded group.
+
+        The stored set is replaced by its union with the sorted batch, which
+        is computed in a single merge.
+        """
+        batch = self.set_class(user_ids)
+        with self._lock:
+            entry = self._groups.get(id_group)
+            if entry is not None:
+                self._groups[id_group] = (entry[0] | batch, entry[1])
+
+    def remove(self, id_group, user_ids):
+        """Remove users from a loaded group (replacing its stored set)."""
+        batch = self.set_class(user_ids)
+        with self._lock:
+            entry = self._groups.get(id_group)
+            if entry is not None:
+                self._groups[id_group] = (entry[0] - batch, entry[1])
+
+    def drop(self, id_group):
+        """Forget a group."""
+        with self._lock:
+            self._groups.pop(id_group, None)
+
+    def clear(self):
+        """Forget all groups."""
+        with self._lock:
+            self._groups.clear()
+
+
+def get_member_index():
+    """Get member index of current application.
+
+    :returns: MemberIndex configured by ``GROUPS_MEMBER_INDEX_SET`` and
+        ``GROUPS_MEMBER_INDEX_TTL``.
+    """
+    index = current_app.extensions.get('invenio-groups-member-index')
+    if index is None:
+        set_class = current_app.config.get('GROUPS_MEMBER_INDEX_SET',
+                                           SortedIntSet)
+        if isinstance(set_class, string_types):
+            set_class = import_string(set_class)
+        index = MemberIndex(
+            set_class=set_class,
+            ttl=current_app.config.get('GROUPS_MEMBER_INDEX_TTL', 300),
+        )
+        current_app.extensions['invenio-groups-member-index'] = index
+    return index
+
+
+def are_members(group_or_id, user_ids):
+    """Test which users are active members of a group.
+
+    :param group_or_id: Group or group id.
+    :param user_ids: Iterable of user ids.
+    :returns: List of booleans in the order of ``user_ids``.
+    """
+    return get_member_index().are_members(group_or_id, user_ids)
+
+
+#
+# Signal receivers
+#
+
+def _current_index():
+    if current_app:
+        return current_app.extensions.get('invenio-groups-member-index')
+
+
+def _with_ancestors(group_ids):
+    """Get ids of groups and of all groups containing them."""
+    from .models import GroupMemberClosure
+
+    return set(group_ids) | set(GroupMemberClosure.ancestor_ids(group_ids))
+
+
+@memberships_added.connect
+def _on_memberships_added(sender, group=None, user_ids=None, state=None,
+                          **kwargs):
+    from .models import MembershipState
+
+    index = _current_index()
+    if index is not None and state == MembershipState.ACTIVE:
+        for id_group in _with_ancestors([group.id]):
+            index.add(id_group, user_ids or [])
+
+
+@memberships_removed.connect
+def _on_memberships_removed(sender, group=None, **kwargs):
+    # Users may still be members through nested groups, so reload.
+    index = _current_index()
+    if index is not None:
+        for id_group in _with_ancestors([group.id]):
+            index.drop(id_group)
+
+
+@memberships_accepted.connect
+def _on_memberships_accepted(sender, keys=None, **kwargs):
+    index = _current_index()
+    if index is not None:
+        by_group = {}
+        for id_user, id_group in keys or []:
+            by_group.setdefault(id_group, []).append(id_user)
+        for id_group, user_ids in by_group.items():
+            for target in _with_ancestors([id_group]):
+                index.add(target, user_ids)
+
+
+@member_group_added.connect
+@member_group_removed.connect
+def _on_member_group_changed(sender, group=None, **kwargs):
+    index = _current_index()
+    if index is not None:
+        for id_group in _with_ancestors([group.id]):
+            index.drop(id_group)
+
+
+@group_deleted.connect
+def _on_group_deleted(sender, group=None, **kwargs):
+    # Groups containing the deleted group are unknown once it is deleted.
+    index = _current_index()
+    if index is not None:
+        index.clear()
@@ -21,6 +21,7 @@
 
 from __future__ import absolute_import, print_function, unicode_literals
 
+import time
 from datetime import datetime
 
 from flask_login import current_user
@@ -30,7 +31,8 @@ from invenio.ext.login.legacy_user import UserInfo
 from invenio.ext.sqlalchemy import db
 from invenio.modules.accounts.models import User
 
-from sqlalchemy import func
+from sqlalchemy import case, func
+from sqlalchemy.dialects import mysql
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import joinedload
 from sqlalchemy.orm.exc import NoResultFound
@@ -38,9 +40,16 @@ from sqlalchemy.sql.expression import asc, desc
 
 from sqlalchemy_utils import generic_relationship
 from sqlalchemy_utils.types.choice import ChoiceType
+from sqlalchemy_utils.types.json import JSONType
 
+from .cache import get_cache
+from .instrumentation import instrument_class
+from .pagination import KeysetQuery
+from .search import get_search_engine, ngrams
 from .widgets import RadioGroupWidget
-from .signals import group_created, group_deleted
+from .signals import group_admin_added, group_admin_removed, \
+    group_created, group_deleted, member_group_added, member_group_removed, \
+    memberships_accepted, memberships_added, memberships_removed
 
 
 class SubscriptionPolicy(object):
@@ -132,12 +141,86 @@ class MembershipState(object):
         return state in [cls.ACTIVE, cls.PENDING_ADMIN, cls.PENDING_USER]
 
 
+class JobStatus(object):
+
+    """Background job states."""
+
+    PENDING = 'P'
+    """Job is waiting for a worker."""
+
+    RUNNING = 'R'
+    """Job is running."""
+
+    DONE = 'D'
+    """Job finished successfully."""
+
+    FAILED = 'F'
+    """Job raised an exception."""
+
+
+EXPORT_FIELDS = ('id_user', 'nickname', 'email', 'state', 'created',
+                 'modified')
+"""Fields of exported memberships (see :meth:`Membership.stream_by_group`)."""
+
+
+class ChangeType(object):
+
+    """Kinds of entries of the change log (see :class:`GroupChange`)."""
+
+    GROUP_CREATED = 'GC'
+    """Group was created."""
+
+    GROUP_UPDATED = 'GU'
+    """Group attributes (e.g. privacy policy) were updated."""
+
+    GROUP_DELETED = 'GD'
+    """Group was deleted."""
+
+    MEMBER_ADDED = 'MA'
+    """Membership was created (``state`` is the new state)."""
+
+    MEMBER_UPDATED = 'MU'
+    """Membership state changed (``state`` is the new state)."""
+
+    MEMBER_REMOVED = 'MR'
+    """Membership was removed (``state`` is the last state)."""
+
+    ADMIN_ADDED = 'AA'
+    """Admin was added."""
+
+    ADMIN_REMOVED = 'AR'
+    """Admin was removed."""
+
+    MEMBER_GROUP_ADDED = 'NA'
+    """Group became a member of the group (``id_member_group``)."""
+
+    MEMBER_GROUP_REMOVED = 'NR'
+    """Group stopped being a member of the group (``id_member_group``)."""
+
+
+class InvitationStatus(object):
+
+    """Outcome of an invitation by email."""
+
+    INVITED = 'invited'
+    """User was invited."""
+
+    ALREADY_MEMBER = 'already_member'
+    """User already has a membership (in any state)."""
+
+    UNKNOWN = 'unknown'
+    """No user with given email exists."""
+
+
+@instrument_class
 class Group(db.Model):
 
     """Group data model."""
 
     __tablename__ = 'group'
 
+    query_class = KeysetQuery
+
     PRIVACY_POLICIES = [
         (PrivacyPolicy.PUBLIC, _('Public')),
         (PrivacyPolicy.MEMBERS, _('Group members')),
@@ -203,6 +286,27 @@ class Group(db.Model):
                          onupdate=datetime.now)
     """Modification timestamp."""
 
+    active_count = db.Column(db.Integer, nullable=False, default=0,
+                             server_default='0')
+    """Number of active memberships."""
+
+    pending_admin_count = db.Column(db.Integer, nullable=False, default=0,
+                                    server_default='0')
+    """Number of memberships pending admin approval."""
+
+    pending_user_count = db.Column(db.Integer, nullable=False, default=0,
+                                   server_default='0')
+    """Number of memberships pending user approval."""
+
+    admins_count = db.Column(db.Integer, nullable=False, default=0,
+                             server_default='0')
+    """Number of group admins."""
+
+    version = db.Column(db.Integer, nullable=False, default=0,
+                        server_default='0')
+    """Version stamp incremented by every logged change of the group, its
+    memberships or admins (see :meth:`GroupChange.log`)."""
+
     def get_id(self):
         """Get group id.
 
@@ -239,6 +343,7 @@ class Group(db.Model):
                 privacy_policy=privacy_policy,
                 subscription_policy=subscription_policy,
                 is_managed=is_managed,
+                admins_count=len(admins or []),
             )
             db.session.add(obj)
 
@@ -247,6 +352,18 @@ class Group(db.Model):
                     group=obj, admin_id=a.get_id(),
                     admin_type=resolve_admin_type(a)))
 
+            db.session.flush()
+            GroupNameNGram.index(obj)
+            for a in admins or []:
+                if resolve_admin_type(a) == 'Group':
+                    GroupAdminClosure.add_edge(a.get_id(), obj.id)
+            GroupChange.log(ChangeType.GROUP_CREATED, [dict(id_group=obj.id)])
+            GroupChange.log(ChangeType.ADMIN_ADDED, [
+                dict(id_group=obj.id, admin_type=resolve_admin_type(a),
+                     admin_id=a.get_id())
+                for a in admins or []
+            ])
+
             db.session.commit()
 
             group_created.send(cls, group=obj)
@@ -256,24 +373,114 @@ class Group(db.Model):
             db.session.rollback()
             raise
 
-    def delete(self):
+    def delete(self, chunk_size=None, pause=0, progress=None):
         """Delete a group and all associated memberships.
 
+        Memberships in any state and admin entries (of the group and where
+        the group is an admin) are removed with set-based statements, without
+        loading them into the session.
+
+        With ``chunk_size`` the memberships are first removed in separate
+        transactions of at most ``chunk_size`` rows, so that deleting a huge
+        group does not hold locks for a long time.
+
         If the group is successfully deleted, the ``group_deleted`` signal will
-        be sent.
+        be sent with the ids of its effective members and user admins as
+        ``user_ids``. Memberships removed in separate transactions are
+        signalled with ``memberships_removed`` after each chunk.
+
+        :param int chunk_size: Number of memberships deleted per transaction.
+            Default: all in one transaction.
+        :param float pause: Seconds to sleep between chunks.
+        :param progress: Function called with the number of memberships
+            deleted so far after each chunk.
         """
+        group_id = self.id
+        deleted = 0
+        while chunk_size:
+            try:
+                user_ids = [uid for (uid, ) in Membership.query.filter_by(
+                    id_group=group_id
+                ).with_entities(Membership.id_user).limit(chunk_size)]
+                if not user_ids:
+                    break
+                query = Membership.query.filter(
+                    Membership.id_group == group_id,
+                    Membership.id_user.in_(user_ids),
+                )
+                _apply_state_counts(_count_states(query), -1)
+                GroupChange.log_query(ChangeType.MEMBER_REMOVED, query)
+                deleted += query.delete(synchronize_session=False)
+                EffectiveMembership.refresh_users(group_id, user_ids)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            memberships_removed.send(Membership, group=self,
+                                     user_ids=user_ids)
+            if progress is not None:
+                progress(deleted)
+            if pause:
+                time.sleep(pause)
+
         try:
-            Membership.query_by_group(self).delete()
-            GroupAdmin.query_by_group(self).delete()
-            GroupAdmin.query_by_admin(self).delete()
+            affected = set(uid for (uid, ) in EffectiveMembership.query.filter(
+                EffectiveMembership.id_group == group_id
+            ).with_entities(EffectiveMembership.id_user))
+            affected.update(uid for (uid, ) in GroupAdmin.query.filter_by(
+                group_id=group_id, admin_type='User'
+            ).with_entities(GroupAdmin.admin_id))
+            members = Membership.query.filter_by(id_group=group_id)
+            GroupChange.log_query(ChangeType.MEMBER_REMOVED, members)
+            members.delete(synchronize_session=False)
+            admins = GroupAdmin.query.filter_by(group_id=group_id)
+            GroupChange.log_query(ChangeType.ADMIN_REMOVED, admins)
+            admins.delete(synchronize_session=False)
+            administered = [gid for (gid, ) in GroupAdmin.query_by_admin(
+                self).with_entities(GroupAdmin.group_id)]
+            GroupChange.log_query(ChangeType.ADMIN_REMOVED,
+                                  GroupAdmin.query_by_admin(self))
+            GroupAdmin.query_by_admin(self).delete(synchronize_session=False)
+            for chunk in _chunks(administered):
+                _update_counters(chunk, admins_count=-1)
+            GroupAdminClosure.refresh([group_id])
+            self._delete_member_groups()
+            GroupNameNGram.query.filter_by(group_id=group_id).delete()
+            GroupChange.log(ChangeType.GROUP_DELETED,
+                            [dict(id_group=group_id)])
+            db.session.expire(self, ['members', 'admins'])
             db.session.delete(self)
             db.session.commit()
 
-            group_deleted.send(self.__class__, group=self)
+            group_deleted.send(self.__class__, group=self,
+                               user_ids=sorted(affected))
         except Exception:
             db.session.rollback()
             raise
 
+    def _delete_member_groups(self):
+        """Remove nested group links of the group being deleted.
+
+        Memberships of the group must be deleted. Not committed.
+        """
+        ancestors = GroupMemberClosure.ancestor_ids([self.id])
+        links = GroupMemberGroup.query.filter(db.or_(
+            GroupMemberGroup.id_group == self.id,
+            GroupMemberGroup.id_member_group == self.id,
+        ))
+        rows = [dict(id_group=g, id_member_group=m) for g, m in
+                links.with_entities(GroupMemberGroup.id_group,
+                                    GroupMemberGroup.id_member_group)]
+        links.delete(synchronize_session=False)
+        GroupChange.log(ChangeType.MEMBER_GROUP_REMOVED, rows)
+
+        GroupMemberClosure.refresh([self.id] + [
+            row['id_member_group'] for row in rows
+            if row['id_group'] == self.id])
+        EffectiveMembership.query.filter_by(id_group=self.id).delete(
+            synchronize_session=False)
+        EffectiveMembership.refresh_groups(ancestors)
+
     def update(self, name=None, description=None, privacy_policy=None,
                subscription_policy=None, is_managed=None):
         """Update group.
@@ -284,7 +491,8 @@ class Group(db.Model):
         :param subscription_policy: SubscriptionPolicy
         :returns: Updated group
         """
-        if name is not None:
+        renamed = name is not None and name != self.name
+        if renamed:
             self.name = name
         if description is not None:
             self.description = description
@@ -301,7 +509,17 @@ class Group(db.Model):
         if is_managed is not None:
             self.is_managed = is_managed
 
-        db.session.commit()
+        try:
+            # check before reindexing, which autoflushes the changes
+            if db.session.is_modified(self):
+                GroupChange.log(ChangeType.GROUP_UPDATED,
+                                [dict(id_group=self.id)])
+            if renamed:
+                GroupNameNGram.index(self)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
 
         return self
 
@@ -331,35 +549,103 @@ class Group(db.Model):
     def query_by_user(cls, user, with_pending=False, eager=False):
         """Query group by user.
 
+        The query supports keyset pagination, e.g.
+        ``query.keyset_paginate([Group.name, Group.id], cursor=cursor)``.
+
+        Active memberships include memberships through nested groups (see
+        :class:`EffectiveMembership`).
+
         :param user: User object.
         :param bool with_pending: Whether to include pending users.
         :param bool eager: Eagerly fetch group members.
         :returns: Query object.
         """
-        q1 = Group.query.join(Membership).filter_by(id_user=user.get_id())
-        if not with_pending:
-            q1 = q1.filter_by(state=MembershipState.ACTIVE)
-        if eager:
-            q1 = q1.options(joinedload(Group.members))
+        cache = get_cache()
+        if cache is not None and not with_pending:
+            ids = _cached_member_group_ids(cache, user) | \
+                _cached_admin_group_ids(cache, user)
+            query = Group.query.filter(Group.id.in_(list(ids)))
+        else:
+            q1 = Group.query.join(
+                EffectiveMembership, EffectiveMembership.id_group == Group.id
+            ).filter(EffectiveMembership.id_user == user.get_id())
+            if with_pending:
+                q1 = q1.union(Group.query.join(Membership).filter(
+                    Membership.id_user == user.get_id()))
+            q2 = Group.query.join(GroupAdmin).filter_by(
+                admin_id=user.get_id(), admin_type=resolve_admin_type(user))
+            query = Group.query.filter(Group.id.in_(
+                q1.union(q2).with_entities(Group.id)))
 
-        q2 = Group.query.join(GroupAdmin).filter_by(
-            admin_id=user.get_id(), admin_type=resolve_admin_type(user))
         if eager:
-            q2 = q2.options(joinedload(Group.members))
+            query = query.options(joinedload(Group.members))
+        return query
+
+    @classmethod
+    def query_administered_by(cls, user):
+        """Query groups administered by a user at any depth.
+
+        A user administers a group if he is a direct admin of it, or if he
+        is a direct admin or an (effective) active member of a group which
+        (directly or through other groups) administers it.
+
+        :param user: User object.
+        :returns: Query object.
+        """
+        admin_of = GroupAdmin.query_by_admin(user).with_entities(
+            GroupAdmin.group_id)
+        member_of = EffectiveMembership.query.filter_by(
+            id_user=user.get_id()
+        ).with_entities(EffectiveMembership.id_group)
+        nested = GroupAdminClosure.query.filter(db.or_(
+            GroupAdminClosure.ancestor_id.in_(admin_of),
+            GroupAdminClosure.ancestor_id.in_(member_of),
+        )).with_entities(GroupAdminClosure.descendant_id)
+
+        return cls.query.filter(db.or_(
+            cls.id.in_(admin_of),
+            cls.id.in_(nested),
+        ))
 
-        query = q1.union(q2).with_entities(Group.id)
+    def query_effective_admins(self):
+        """Query users administering the group at any depth.
 
-        return Group.query.filter(Group.id.in_(query))
+        See :meth:`query_administered_by` for the definition of an admin.
+
+        :returns: Query object.
+        """
+        ancestors = GroupAdminClosure.query.filter_by(
+            descendant_id=self.id
+        ).with_entities(GroupAdminClosure.ancestor_id)
+        direct = GroupAdmin.query.filter(
+            GroupAdmin.admin_type == 'User',
+            db.or_(
+                GroupAdmin.group_id == self.id,
+                GroupAdmin.group_id.in_(ancestors),
+            )
+        ).with_entities(GroupAdmin.admin_id)
+        members = EffectiveMembership.query.filter(
+            EffectiveMembership.id_group.in_(ancestors),
+        ).with_entities(EffectiveMembership.id_user)
+
+        return User.query.filter(db.or_(
+            User.id.in_(direct),
+            User.id.in_(members),
+        ))
 
     @classmethod
-    def search(cls, query, q):
+    def search(cls, query, q, rank=True):
         """Modify query as so include only specific group names.
 
+        Matching and ranking depend on ``GROUPS_SEARCH_ENGINE``.
+
         :param query: Query object.
         :param str q: Search string.
+        :param bool rank: Order the query by relevance. Pass ``False`` when
+            the query is ordered by the caller (e.g. keyset pagination).
         :returs: Query object.
         """
-        return query.filter(Group.name.like("%"+q+"%"))
+        return get_search_engine().search_groups(query, q, rank=rank)
 
     def add_admin(self, admin):
         """Invite an admin to a group.
@@ -369,6 +655,21 @@ class Group(db.Model):
         """
         return GroupAdmin.create(self, admin)
 
+    def add_member_group(self, group):
+        """Add all active members of another group as members.
+
+        :param group: Group object to be nested in this group.
+        :returns: GroupMemberGroup object.
+        """
+        return GroupMemberGroup.create(self, group)
+
+    def remove_member_group(self, group):
+        """Remove a nested member group.
+
+        :param group: Group object nested in this group.
+        """
+        return GroupMemberGroup.delete(self, group)
+
     def remove_admin(self, admin):
         """Remove an admin from group (independent of membership state).
 
@@ -392,6 +693,26 @@ class Group(db.Model):
         """
         return Membership.delete(self, user)
 
+    def add_members(self, users, state=MembershipState.ACTIVE):
+        """Add many users to a group in a single transaction.
+
+        Users which already have a membership are skipped.
+
+        :param users: List of User objects.
+        :param state: MembershipState. Default: MembershipState.ACTIVE.
+        :returns: List of ids of users which were added.
+        """
+        return Membership.create_many(
+            self, [u.get_id() for u in users], state=state)
+
+    def remove_members(self, users):
+        """Remove many users from a group in a single transaction.
+
+        :param users: List of User objects.
+        :returns: Number of removed memberships.
+        """
+        return Membership.delete_many(self, [u.get_id() for u in users])
+
     def invite(self, user, admin=None):
         """Invite a user to a group (should be done by admins).
 
@@ -409,17 +730,39 @@ class Group(db.Model):
     def invite_by_emails(self, emails):
         """Invite a users to a group by emails.
 
+        Users are resolved with set based queries and all missing memberships
+        are inserted in a single transaction (see
+        :meth:`Membership.create_many`). Emails are matched as the database
+        compares them (case-insensitively with the default MySQL collation).
+
         :param list emails: Emails of users that shall be invited.
-        :returns: Newly created Membership or None.
+        :returns: Dictionary mapping each email to one of
+            ``InvitationStatus`` values.
         """
         assert emails is None or isinstance(emails, list)
+        emails = list(set(emails or []))
 
+        users = {}
+        for chunk in _chunks(emails):
+            for (id_user, email) in User.query.filter(
+                User.email.in_(chunk)
+            ).with_entities(User.id, User.email):
+                users.setdefault(email.lower(), id_user)
+
+        invited = set(Membership.create_many(
+            self, list(users.values()), state=MembershipState.PENDING_USER))
+
+        report = {}
         for email in emails:
-            try:
-                user = User.query.filter_by(email=email).one()
-                return self.invite(user)
-            except Exception:
-                return None
+            id_user = users.get(email.lower())
+            if id_user is None:
+                report[email] = InvitationStatus.UNKNOWN
+            elif id_user in invited:
+                report[email] = InvitationStatus.INVITED
+            else:
+                report[email] = InvitationStatus.ALREADY_MEMBER
+
+        return report
 
     def subscribe(self, user):
         """Subscribe a user to a group (done by users).
@@ -442,6 +785,10 @@ class Group(db.Model):
         :param admin: Admin to be checked.
         :returns: True or False.
         """
+        cache = get_cache()
+        if cache is not None and resolve_admin_type(admin) == 'User':
+            return self.id in _cached_admin_group_ids(cache, admin)
+
         is_admin = False
         ga = GroupAdmin.get(self, admin)
         if ga is not None:
@@ -451,18 +798,20 @@ class Group(db.Model):
     def is_member(self, user, with_pending=False):
         """Verify if given user is a group member.
 
+        Active members of nested member groups are members too (see
+        :class:`EffectiveMembership`).
+
         :param user: User to be checked.
         :param bool with_pending: Whether to include pending users or not.
         :returns: True or False.
         """
-        is_member = False
-        m = Membership.get(self, user)
-        if m is not None:
-            if with_pending:
-                is_member = True
-            elif m.state == MembershipState.ACTIVE:
-                is_member = True
-        return is_member
+        cache = get_cache()
+        if cache is not None and not with_pending:
+            return self.id in _cached_member_group_ids(cache, user)
+
+        if EffectiveMembership.query.get((user.get_id(), self.id)):
+            return True
+        return with_pending and Membership.get(self, user) is not None
 
     def can_see_members(self, user):
         """Determine if given user can see other group members.
@@ -480,11 +829,155 @@ class Group(db.Model):
     def members_count(self):
         """Determine members count.
 
-        :returns: Number of memberships.
+        Read from the ``active_count`` counter (see :meth:`recount`).
+
+        :returns: Number of active memberships.
         """
-        return Membership.query_by_group(self).count()
+        return self.active_count
 
+    @classmethod
+    def recount(cls, group_ids=None):
+        """Repair membership and admin counters and commit.
+
+        Counters which differ from the actual number of rows are updated.
+
+        :param list group_ids: Ids of groups to check. Default: all groups.
+        :returns: List of ids of groups whose counters were repaired.
+        """
+        def _count(model, *criteria):
+            return db.select([func.count()]).select_from(
+                model.__table__).where(db.and_(*criteria)).as_scalar()
+
+        actual = dict(
+            (name, _count(Membership, Membership.id_group == cls.id,
+                          Membership.state == state))
+            for state, name in _STATE_COUNTERS.items()
+        )
+        actual['admins_count'] = _count(GroupAdmin,
+                                        GroupAdmin.group_id == cls.id)
+
+        query = cls.query.filter(db.or_(*[
+            getattr(cls, name) != value for name, value in actual.items()
+        ]))
+        if group_ids is not None:
+            query = query.filter(cls.id.in_(group_ids))
 
+        drifted = [gid for (gid, ) in query.with_entities(cls.id)]
+        try:
+            for chunk in _chunks(drifted):
+                cls.query.filter(cls.id.in_(chunk)).update(
+                    dict((getattr(cls, name), value)
+                         for name, value in actual.items()),
+                    synchronize_session=False)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return drifted
+
+    @classmethod
+    def _query_user_flags(cls, user, group_ids):
+        """Query privacy policy, admin flag and membership state of a user.
+
+        Admin flag, membership state and effective membership flag are
+        correlated subqueries, so one query is issued per chunk of groups.
+
+        :returns: Iterator of
+            ``(id, privacy_policy, is_admin, state, is_effective_member)``.
+        """
+        is_admin = db.exists().where(db.and_(
+            GroupAdmin.group_id == cls.id,
+            GroupAdmin.admin_type == resolve_admin_type(user),
+            GroupAdmin.admin_id == user.get_id(),
+        )).label('is_admin')
+        state = db.select([Membership.state]).where(db.and_(
+            Membership.id_group == cls.id,
+            Membership.id_user == user.get_id(),
+        )).as_scalar().label('state')
+        is_effective = db.exists().where(db.and_(
+            EffectiveMembership.id_group == cls.id,
+            EffectiveMembership.id_user == user.get_id(),
+        )).label('is_effective')
+
+        for chunk in _chunks(list(set(group_ids))):
+            for row in cls.query.filter(cls.id.in_(chunk)).with_entities(
+                    cls.id, cls.privacy_policy, is_admin, state,
+                    is_effective):
+                yield row[0], row[1], bool(row[2]), row[3], bool(row[4])
+
+    @classmethod
+    def version_stamp(cls, *queries):
+        """Get number, id sum and version sum of the groups of each query.
+
+        Computed with a single aggregate query. Versions only increase, so
+        the version sum changes with every change of the groups, and the
+        number and id sum change with the set of groups. Stamps of users
+        are computed this way from the groups they belong to or administer
+        when they are read, instead of being incremented on every change.
+
+        :param queries: Group queries.
+        :returns: List of lists ``[count, id sum, version sum]``.
+        """
+        conditions = [cls.id.in_(query.with_entities(cls.id))
+                      for query in queries]
+        row = db.session.query(*[
+            func.sum(case([(condition, value)], else_=0))
+            for condition in conditions
+            for value in (1, cls.id, cls.version)
+        ]).filter(db.or_(*conditions)).one()
+        return [[int(value or 0) for value in row[i:i + 3]]
+                for i in range(0, len(row), 3)]
+
+    @classmethod
+    def visible_member_lists(cls, user, group_ids):
+        """Determine for many groups if a user can see their members.
+
+        Batch version of :meth:`can_see_members` issuing a single query
+        (per chunk of groups).
+
+        :param user: User object.
+        :param group_ids: Iterable of group ids.
+        :returns: Dictionary mapping existing group ids to True or False.
+        """
+        return dict(
+            (gid, _can_see_members(policy, is_admin, is_effective))
+            for gid, policy, is_admin, state, is_effective
+            in cls._query_user_flags(user, group_ids)
+        )
+
+    @classmethod
+    def annotate_for_user(cls, groups, user):
+        """Compute permissions of a user for a list of groups at once.
+
+        Admin flags and membership states are fetched with a single query
+        (see :meth:`visible_member_lists`), independent of the number of
+        groups. Member counts are read from the group counters.
+
+        :param groups: List of Group objects.
+        :param user: User object.
+        :returns: Dictionary mapping group ids to dictionaries with keys
+            ``is_admin``, ``is_member`` (direct active membership),
+            ``state``, ``can_see_members`` and ``members_count``.
+        """
+        groups = dict((g.id, g) for g in groups)
+        if not groups:
+            return {}
+
+        result = {}
+        for gid, policy, is_admin, state, is_effective in \
+                cls._query_user_flags(user, groups):
+            result[gid] = dict(
+                is_admin=is_admin,
+                is_member=state == MembershipState.ACTIVE,
+                state=state,
+                can_see_members=_can_see_members(policy, is_admin,
+                                                 is_effective),
+                members_count=groups[gid].active_count,
+            )
+        return result
+
+
+@instrument_class
 class Membership(db.Model):
 
     """Represent a users membership of a group."""
@@ -498,6 +991,13 @@ class Membership(db.Model):
 
     __tablename__ = 'groupMEMBER'
 
+    query_class = KeysetQuery
+
+    __table_args__ = (
+        db.Index('ix_groupMEMBER_id_group_state', 'id_group', 'state'),
+        db.Model.__table_args__
+    )
+
     id_user = db.Column(db.Integer(15, unsigned=True), db.ForeignKey(User.id),
                         nullable=False, primary_key=True)
     """User for membership."""
@@ -527,7 +1027,7 @@ class Membership(db.Model):
     """User relaionship."""
 
     group = db.relationship(Group, backref=db.backref(
-        'members', cascade="all, delete-orphan"))
+        'members', cascade="all, delete-orphan", passive_deletes=True))
     """Group relationship."""
 
     @classmethod
@@ -563,6 +1063,34 @@ class Membership(db.Model):
             **kwargs
         )
 
+    @classmethod
+    def stream_by_group(cls, group_or_id, state=None, batch_size=1000):
+        """Stream members of a group with constant memory.
+
+        Rows are read with a server-side cursor in batches of
+        ``batch_size`` and ordered by user id; no ORM objects are loaded.
+
+        :param group_or_id: Group object or group id.
+        :param state: MembershipState to filter on. Default: all states.
+        :param int batch_size: Number of rows fetched per round trip.
+        :returns: Iterator of dictionaries with keys :data:`EXPORT_FIELDS`.
+        """
+        assert state is None or MembershipState.validate(state)
+        query = cls.query.filter(
+            cls.id_group == getattr(group_or_id, 'id', group_or_id)
+        )
+        if state is not None:
+            query = query.filter(cls.state == state)
+        query = query.join(User).with_entities(
+            cls.id_user, User.nickname, User.email, cls.state, cls.created,
+            cls.modified,
+        ).order_by(cls.id_user).yield_per(batch_size)
+
+        for row in query:
+            row = dict(zip(EXPORT_FIELDS, row))
+            row['state'] = getattr(row['state'], 'code', row['state'])
+            yield row
+
     @classmethod
     def query_invitations(cls, user, eager=False):
         """Get all invitations for given user."""
@@ -573,33 +1101,30 @@ class Membership(db.Model):
 
     @classmethod
     def query_requests(cls, admin, eager=False):
-        """Get all pending group requests."""
-        # get direct pending request
-        q1 = GroupAdmin.query_by_admin(admin).with_entities(
-            GroupAdmin.group_id)
-        q2 = Membership.query.filter(
-            Membership.state == MembershipState.PENDING_ADMIN,
-            Membership.id_group.in_(q1),
-        )
+        """Get all pending group requests.
 
-        # get request from admin groups your are member of
-        q3 = Membership.query_by_user(
-            user=admin, state=MembershipState.ACTIVE
-        ).with_entities(Membership.id_group)
-        q4 = GroupAdmin.query.filter(
-            GroupAdmin.admin_type == 'Group', GroupAdmin.admin_id.in_(q3)
-        ).with_entities(GroupAdmin.group_id)
-        q5 = Membership.query.filter(
+        Includes requests for groups administered through any depth of
+        nested admin groups (see :meth:`Group.query_administered_by`).
+        """
+        query = Membership.query.filter(
             Membership.state == MembershipState.PENDING_ADMIN,
-            Membership.id_group.in_(q4))
-
-        query = q2.union(q5)
+            Membership.id_group.in_(
+                Group.query_administered_by(admin).with_entities(Group.id)),
+        )
+        if eager:
+            query = query.options(joinedload(Membership.user),
+                                  joinedload(Membership.group))
 
         return query
 
     @classmethod
     def query_by_group(cls, group_or_id, with_invitations=False, **kwargs):
-        """Get a group's members."""
+        """Get a group's members.
+
+        The query supports keyset pagination, e.g.
+        ``query.keyset_paginate([Membership.modified, Membership.id_user],
+        cursor=cursor)``.
+        """
         if isinstance(group_or_id, Group):
             id_group = group_or_id.id
         else:
@@ -623,17 +1148,13 @@ class Membership(db.Model):
     def search(cls, query, q):
         """Modify query as so include only specific members.
 
+        Matching depends on ``GROUPS_SEARCH_ENGINE``.
+
         :param query: Query object.
         :param str q: Search string.
         :returs: Query object.
         """
-        query = query.join(User).filter(
-            db.or_(
-                User.nickname.like("%"+q+"%"),
-                User.email.like("%"+q+"%")
-            )
-        )
-        return query
+        return get_search_engine().search_members(query, q)
 
     @classmethod
     def order(cls, query, field, s):
@@ -659,37 +1180,292 @@ class Membership(db.Model):
                 state=state,
             )
             db.session.add(membership)
+            _update_counters([group.id], **{_state_counter(state): 1})
+            GroupChange.log(ChangeType.MEMBER_ADDED, [dict(
+                id_group=group.id, id_user=user.get_id(), state=state)])
+            if state == MembershipState.ACTIVE:
+                EffectiveMembership.add(group.id, [user.get_id()])
             db.session.commit()
-
-            return membership
         except IntegrityError:
             db.session.rollback()
             raise
 
+        memberships_added.send(cls, group=group, user_ids=[user.get_id()],
+                               state=state)
+        return membership
+
+    @classmethod
+    def create_many(cls, group, user_ids, state=MembershipState.ACTIVE):
+        """Create memberships for many users in a single transaction.
+
+        Existing memberships are detected with one query per chunk of users
+        and the missing ones are inserted with one multi-row ``INSERT``. The
+        ``memberships_added`` signal is sent once for all new memberships.
+
+        :param group: Group object.
+        :param list user_ids: Ids of users to be added.
+        :param state: MembershipState. Default: MembershipState.ACTIVE.
+        :returns: List of ids of users for which a membership was created.
+        """
+        assert MembershipState.validate(state)
+        user_ids = list(set(user_ids))
+
+        existing = set()
+        for chunk in _chunks(user_ids):
+            existing.update(
+                id_user for (id_user, ) in cls.query.filter(
+                    cls.id_group == group.id,
+                    cls.id_user.in_(chunk),
+                ).with_entities(cls.id_user)
+            )
+
+        created = [id_user for id_user in user_ids if id_user not in existing]
+        if not created:
+            return created
+
+        try:
+            db.session.execute(cls.__table__.insert(), [
+                dict(id_user=id_user, id_group=group.id, state=state)
+                for id_user in created
+            ])
+            _update_counters([group.id],
+                             **{_state_counter(state): len(created)})
+            GroupChange.log(ChangeType.MEMBER_ADDED, [
+                dict(id_group=group.id, id_user=id_user, state=state)
+                for id_user in created
+            ])
+            if state == MembershipState.ACTIVE:
+                EffectiveMembership.add(group.id, created)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        memberships_added.send(cls, group=group, user_ids=created,
+                               state=state)
+        return created
+
     @classmethod
     def delete(cls, group, user):
         """Delete membership."""
         try:
-            cls.query.filter_by(group=group, id_user=user.get_id()).delete()
+            query = cls.query.filter_by(group=group, id_user=user.get_id())
+            _apply_state_counts(_count_states(query), -1)
+            GroupChange.log_query(ChangeType.MEMBER_REMOVED, query)
+            count = query.delete()
+            if count:
+                EffectiveMembership.refresh_users(group.id, [user.get_id()])
             db.session.commit()
         except Exception:
             db.session.rollback()
             raise
 
+        if count:
+            memberships_removed.send(cls, group=group,
+                                     user_ids=[user.get_id()])
+
+    @classmethod
+    def delete_many(cls, group, user_ids):
+        """Delete memberships of many users in a single transaction.
+
+        The ``memberships_removed`` signal is sent once with the ids of the
+        users whose membership was deleted.
+
+        :param group: Group object.
+        :param list user_ids: Ids of users to be removed.
+        :returns: Number of deleted memberships.
+        """
+        count, removed = 0, []
+        try:
+            for chunk in _chunks(list(set(user_ids))):
+                members = [uid for (uid, ) in cls.query.filter(
+                    cls.id_group == group.id,
+                    cls.id_user.in_(chunk),
+                ).with_entities(cls.id_user).with_for_update()]
+                if not members:
+                    continue
+                query = cls.query.filter(
+                    cls.id_group == group.id,
+                    cls.id_user.in_(members),
+                )
+                _apply_state_counts(_count_states(query), -1)
+                GroupChange.log_query(ChangeType.MEMBER_REMOVED, query)
+                count += query.delete(synchronize_session=False)
+                removed.extend(members)
+            if removed:
+                EffectiveMembership.refresh_users(group.id, removed)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        if removed:
+            memberships_removed.send(cls, group=group, user_ids=removed)
+        return count
+
+    @classmethod
+    def accept_many(cls, keys):
+        """Activate many pending memberships in a single transaction.
+
+        One ``UPDATE`` is issued per group (and chunk of users). The
+        ``memberships_accepted`` signal is sent once with the keys of the
+        activated memberships.
+
+        :param keys: List of ``(id_user, id_group)`` primary keys.
+        :returns: Number of activated memberships.
+        """
+        by_group = {}
+        for id_user, id_group in keys:
+            by_group.setdefault(id_group, set()).add(id_user)
+
+        count, accepted = 0, []
+        try:
+            for id_group, user_ids in by_group.items():
+                for chunk in _chunks(list(user_ids)):
+                    query = cls.query.filter(
+                        cls.id_group == id_group,
+                        cls.id_user.in_(chunk),
+                        cls.state != MembershipState.ACTIVE,
+                    )
+                    pending = [uid for (uid, ) in query.with_entities(
+                        cls.id_user).with_for_update()]
+                    if not pending:
+                        continue
+                    query = cls.query.filter(
+                        cls.id_group == id_group,
+                        cls.id_user.in_(pending),
+                        cls.state != MembershipState.ACTIVE,
+                    )
+                    counts = _count_states(query)
+                    _apply_state_counts(counts, -1)
+                    _update_counters([id_group],
+                                     active_count=sum(counts.values()))
+                    GroupChange.log_query(ChangeType.MEMBER_UPDATED, query,
+                                          state=MembershipState.ACTIVE)
+                    count += query.update(
+                        {cls.state: MembershipState.ACTIVE},
+                        synchronize_session=False)
+                    EffectiveMembership.add(id_group, pending)
+                    accepted.extend((uid, id_group) for uid in pending)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        if accepted:
+            memberships_accepted.send(cls, keys=accepted)
+        return count
+
+    @classmethod
+    def reject_many(cls, keys):
+        """Delete many pending memberships in a single transaction.
+
+        One ``DELETE`` is issued per group (and chunk of users); active
+        memberships are left untouched. The ``memberships_removed`` signal is
+        sent once per group with the ids of the users whose membership was
+        deleted.
+
+        :param keys: List of ``(id_user, id_group)`` primary keys.
+        :returns: Number of deleted memberships.
+        """
+        by_group = {}
+        for id_user, id_group in keys:
+            by_group.setdefault(id_group, set()).add(id_user)
+
+        count, removed = 0, {}
+        try:
+            for id_group, user_ids in by_group.items():
+                for chunk in _chunks(list(user_ids)):
+                    pending = [uid for (uid, ) in cls.query.filter(
+                        cls.id_group == id_group,
+                        cls.id_user.in_(chunk),
+                        cls.state != MembershipState.ACTIVE,
+                    ).with_entities(cls.id_user).with_for_update()]
+                    if not pending:
+                        continue
+                    query = cls.query.filter(
+                        cls.id_group == id_group,
+                        cls.id_user.in_(pending),
+                        cls.state != MembershipState.ACTIVE,
+                    )
+                    _apply_state_counts(_count_states(query), -1)
+                    GroupChange.log_query(ChangeType.MEMBER_REMOVED, query)
+                    count += query.delete(synchronize_session=False)
+                    removed.setdefault(id_group, []).extend(pending)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        if removed:
+            for group in Group.query.filter(Group.id.in_(list(removed))):
+                memberships_removed.send(cls, group=group,
+                                         user_ids=removed[group.id])
+        return count
+
+    @classmethod
+    def accept_all(cls, query):
+        """Activate all memberships matched by a query.
+
+        Only primary keys are read (in batches) and the memberships are
+        updated with :meth:`accept_many`, so no ORM objects are loaded.
+
+        :param query: Membership query, e.g. :meth:`query_requests`.
+        :returns: Number of activated memberships.
+        """
+        return cls.accept_many(_query_keys(query))
+
+    @classmethod
+    def reject_all(cls, query):
+        """Delete all pending memberships matched by a query.
+
+        :param query: Membership query, e.g. :meth:`query_requests`.
+        :returns: Number of deleted memberships.
+        """
+        return cls.reject_many(_query_keys(query))
+
     def accept(self):
         """Activate membership."""
-        self.state = MembershipState.ACTIVE
-        db.session.commit()
+        old_state = self.state
+        try:
+            self.state = MembershipState.ACTIVE
+            if old_state != MembershipState.ACTIVE:
+                _update_counters([self.id_group], active_count=1, **{
+                    _state_counter(old_state): -1})
+                GroupChange.log(ChangeType.MEMBER_UPDATED, [dict(
+                    id_group=self.id_group, id_user=self.id_user,
+                    state=MembershipState.ACTIVE)])
+                EffectiveMembership.add(self.id_group, [self.id_user])
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        memberships_accepted.send(self.__class__,
+                                  keys=[(self.id_user, self.id_group)])
 
     def reject(self):
         """Remove membership."""
+        group, id_user = self.group, self.id_user
         try:
+            _update_counters([self.id_group], **{
+                _state_counter(self.state): -1})
+            GroupChange.log(ChangeType.MEMBER_REMOVED, [dict(
+                id_group=self.id_group, id_user=self.id_user,
+                state=getattr(self.state, 'code', self.state))])
+            was_active = self.is_active()
             db.session.delete(self)
+            if was_active:
+                db.session.flush()
+                EffectiveMembership.refresh_users(group.id, [id_user])
             db.session.commit()
         except Exception:
             db.session.rollback()
             raise
 
+        memberships_removed.send(self.__class__, group=group,
+                                 user_ids=[id_user])
+
     def is_active(self):
         """Check if membership is in an active state."""
         return self.state == MembershipState.ACTIVE
@@ -698,6 +1474,7 @@ class Membership(db.Model):
 # NOTE: Below database model should be refactored once the ACL system have been
 # rewritten to allow efficient list queries (i.e. list me all groups i have
 # permissions to)
+@instrument_class
 class GroupAdmin(db.Model):
 
     """Represent an administrator of a group."""
@@ -706,6 +1483,7 @@ class GroupAdmin(db.Model):
 
     __table_args__ = (
         db.UniqueConstraint('group_id', 'admin_type', 'admin_id'),
+        db.Index('ix_groupADMIN_admin', 'admin_type', 'admin_id', 'group_id'),
         db.Model.__table_args__
     )
 
@@ -729,7 +1507,7 @@ class GroupAdmin(db.Model):
     #
 
     group = db.relationship(Group, backref=db.backref(
-        'admins', cascade="all, delete-orphan"))
+        'admins', cascade="all, delete-orphan", passive_deletes=True))
     """Group relationship."""
 
     admin = generic_relationship(admin_type, admin_id)
@@ -750,13 +1528,23 @@ class GroupAdmin(db.Model):
                 admin=admin,
             )
             db.session.add(obj)
+            _update_counters([group.id], admins_count=1)
+            GroupChange.log(ChangeType.ADMIN_ADDED, [dict(
+                id_group=group.id, admin_type=resolve_admin_type(admin),
+                admin_id=admin.get_id())])
+
+            if obj.admin_type == 'Group':
+                GroupAdminClosure.add_edge(obj.admin_id, group.id)
 
             db.session.commit()
-            return obj
         except IntegrityError:
             db.session.rollback()
             raise
 
+        group_admin_added.send(cls, group=group, admin_type=obj.admin_type,
+                               admin_id=obj.admin_id)
+        return obj
+
     @classmethod
     def get(cls, group, admin):
         """Get specific GroupAdmin object."""
@@ -778,12 +1566,25 @@ class GroupAdmin(db.Model):
         try:
             obj = cls.query.filter(
                 cls.admin == admin, cls.group == group).one()
+            admin_type, admin_id = obj.admin_type, obj.admin_id
             db.session.delete(obj)
+            _update_counters([group.id], admins_count=-1)
+            GroupChange.log(ChangeType.ADMIN_REMOVED, [dict(
+                id_group=group.id, admin_type=admin_type,
+                admin_id=admin_id)])
+
+            if admin_type == 'Group':
+                db.session.flush()
+                GroupAdminClosure.refresh([group.id])
+
             db.session.commit()
         except Exception:
             db.session.rollback()
             raise
 
+        group_admin_removed.send(cls, group=group, admin_type=admin_type,
+                                 admin_id=admin_id)
+
     @classmethod
     def query_by_group(cls, group):
         """Get all admins for a specific group."""
@@ -797,15 +1598,17 @@ class GroupAdmin(db.Model):
 
     @classmethod
     def query_admins_by_group_ids(cls, groups_ids=None):
-        """Get count of admins per group."""
+        """Get count of admins per group.
+
+        Counts are read from ``Group.admins_count``; groups without admins
+        are omitted.
+        """
         assert groups_ids is None or isinstance(groups_ids, list)
 
         query = db.session.query(
-            Group.id, func.count(GroupAdmin.id)
-        ).join(
-            GroupAdmin
-        ).group_by(
-            Group.id
+            Group.id, Group.admins_count
+        ).filter(
+            Group.admins_count > 0
         )
 
         if groups_ids:
@@ -814,14 +1617,825 @@ class GroupAdmin(db.Model):
         return query
 
 
+class _ClosureMixin(object):
+
+    """Maintenance of a transitive closure table of a graph of groups.
+
+    Subclasses define the columns ``ancestor_id``, ``descendant_id`` and
+    ``depth`` and load the edges in :meth:`_graph`.
+    """
+
+    @classmethod
+    def _graph(cls):
+        """Load mapping of group ids to ids of their direct ancestors."""
+        raise NotImplementedError()
+
+    @classmethod
+    def add_edge(cls, ancestor_id, descendant_id):
+        """Register a new edge between two groups.
+
+        All ancestors of the ancestor group become ancestors of all
+        descendants of the descendant group. Changes are not committed.
+
+        :param ancestor_id: Id of the ancestor group.
+        :param descendant_id: Id of the descendant group.
+        """
+        ancestors = {ancestor_id: 0}
+        ancestors.update(cls.query.filter_by(
+            descendant_id=ancestor_id
+        ).with_entities(cls.ancestor_id, cls.depth))
+        descendants = {descendant_id: 0}
+        descendants.update(cls.query.filter_by(
+            ancestor_id=descendant_id
+        ).with_entities(cls.descendant_id, cls.depth))
+
+        pairs = {}
+        for a, a_depth in ancestors.items():
+            for d, d_depth in descendants.items():
+                if a != d:
+                    depth = a_depth + 1 + d_depth
+                    pairs[(a, d)] = min(depth, pairs.get((a, d), depth))
+
+        existing = dict(
+            ((a, d), depth) for (a, d, depth) in cls.query.filter(
+                cls.ancestor_id.in_(list(ancestors)),
+                cls.descendant_id.in_(list(descendants)),
+            ).with_entities(cls.ancestor_id, cls.descendant_id, cls.depth)
+        )
+
+        inserts = []
+        for (a, d), depth in pairs.items():
+            if (a, d) not in existing:
+                inserts.append(dict(ancestor_id=a, descendant_id=d,
+                                    depth=depth))
+            elif depth < existing[(a, d)]:
+                cls.query.filter_by(ancestor_id=a, descendant_id=d).update(
+                    {cls.depth: depth}, synchronize_session=False)
+        if inserts:
+            db.session.execute(cls.__table__.insert(), inserts)
+
+    @classmethod
+    def refresh(cls, group_ids):
+        """Recompute ancestors of groups and of all their descendants.
+
+        Needed after edges were removed, because other chains may still
+        connect two groups. Edge changes must be flushed. Changes are not
+        committed.
+
+        :param list group_ids: Ids of groups whose direct ancestors changed.
+        """
+        affected = set(group_ids)
+        affected.update(
+            d for (d, ) in cls.query.filter(
+                cls.ancestor_id.in_(list(group_ids))
+            ).with_entities(cls.descendant_id)
+        )
+        for chunk in _chunks(list(affected)):
+            cls.query.filter(cls.descendant_id.in_(chunk)).delete(
+                synchronize_session=False)
+
+        graph = cls._graph()
+        inserts = []
+        for d in affected:
+            for a, depth in _walk(graph, d).items():
+                inserts.append(dict(ancestor_id=a, descendant_id=d,
+                                    depth=depth))
+        if inserts:
+            db.session.execute(cls.__table__.insert(), inserts)
+
+    @classmethod
+    def rebuild(cls):
+        """Recompute the whole table from the edges and commit."""
+        try:
+            cls.query.delete()
+            graph = cls._graph()
+            inserts = []
+            for d in graph:
+                for a, depth in _walk(graph, d).items():
+                    inserts.append(dict(ancestor_id=a, descendant_id=d,
+                                        depth=depth))
+            if inserts:
+                db.session.execute(cls.__table__.insert(), inserts)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+
+class GroupAdminClosure(_ClosureMixin, db.Model):
+
+    """Transitive closure of groups administering other groups.
+
+    A row ``(ancestor_id, descendant_id, depth)`` means that the ancestor
+    group administers the descendant group through a chain of ``depth``
+    ``GroupAdmin`` entries of type ``Group``. The table is maintained by
+    ``GroupAdmin.create``/``GroupAdmin.delete`` and ``Group.delete``.
+    """
+
+    __tablename__ = 'groupADMINCLOSURE'
+
+    ancestor_id = db.Column(
+        db.Integer(15, unsigned=True), db.ForeignKey(Group.id),
+        nullable=False, primary_key=True)
+    """Administering group."""
+
+    descendant_id = db.Column(
+        db.Integer(15, unsigned=True), db.ForeignKey(Group.id),
+        nullable=False, primary_key=True, index=True)
+    """Administered group."""
+
+    depth = db.Column(db.Integer, nullable=False)
+    """Length of the shortest administration chain."""
+
+    @classmethod
+    def _graph(cls):
+        """Load mapping of group ids to ids of their direct admin groups."""
+        return _group_admin_graph()
+
+
+class GroupMemberGroup(db.Model):
+
+    """Represent a group being a member of another group.
+
+    Active members of the member group are effective members of the
+    containing group (see :class:`EffectiveMembership`).
+    """
+
+    __tablename__ = 'groupMEMBERGROUP'
+
+    id_group = db.Column(
+        db.Integer(15, unsigned=True), db.ForeignKey(Group.id),
+        nullable=False, primary_key=True)
+    """Containing group."""
+
+    id_member_group = db.Column(
+        db.Integer(15, unsigned=True), db.ForeignKey(Group.id),
+        nullable=False, primary_key=True, index=True)
+    """Member group."""
+
+    created = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    """Creation timestamp."""
+
+    @classmethod
+    def create(cls, group, member):
+        """Add a group as a member of another group.
+
+        :param group: Containing Group object.
+        :param member: Member Group object.
+        :returns: Newly created GroupMemberGroup object.
+        :raises: ValueError if the membership would create a cycle.
+        :raises: IntegrityError if the membership already exists.
+        """
+        if group.id == member.id or GroupMemberClosure.query.filter_by(
+                ancestor_id=member.id, descendant_id=group.id).count():
+            raise ValueError('Group {0} is already (indirectly) a member of '
+                             'group {1}.'.format(group.id, member.id))
+        try:
+            obj = cls(id_group=group.id, id_member_group=member.id)
+            db.session.add(obj)
+            db.session.flush()
+            GroupMemberClosure.add_edge(group.id, member.id)
+            EffectiveMembership.refresh_groups(
+                [group.id] + GroupMemberClosure.ancestor_ids([group.id]))
+            GroupChange.log(ChangeType.MEMBER_GROUP_ADDED, [dict(
+                id_group=group.id, id_member_group=member.id)])
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        member_group_added.send(cls, group=group, member=member)
+        return obj
+
+    @classmethod
+    def delete(cls, group, member):
+        """Remove a group from the members of another group.
+
+        :param group: Containing Group object.
+        :param member: Member Group object.
+        """
+        try:
+            affected = [group.id] + GroupMemberClosure.ancestor_ids(
+                [group.id])
+            count = cls.query.filter_by(
+                id_group=group.id, id_member_group=member.id
+            ).delete(synchronize_session=False)
+            if count:
+                GroupMemberClosure.refresh([member.id])
+                EffectiveMembership.refresh_groups(affected)
+                GroupChange.log(ChangeType.MEMBER_GROUP_REMOVED, [dict(
+                    id_group=group.id, id_member_group=member.id)])
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        if count:
+            member_group_removed.send(cls, group=group, member=member)
+
+    @classmethod
+    def query_by_group(cls, group):
+        """Get groups which are direct members of a group."""
+        return Group.query.filter(Group.id.in_(cls.query.filter_by(
+            id_group=group.id).with_entities(cls.id_member_group)))
+
+
+class GroupMemberClosure(_ClosureMixin, db.Model):
+
+    """Transitive closure of groups being members of other groups.
+
+    A row ``(ancestor_id, descendant_id, depth)`` means that the descendant
+    group is a member of the ancestor group through a chain of ``depth``
+    :class:`GroupMemberGroup` entries.
+    """
+
+    __tablename__ = 'groupMEMBERCLOSURE'
+
+    ancestor_id = db.Column(
+        db.Integer(15, unsigned=True), db.ForeignKey(Group.id),
+        nullable=False, primary_key=True)
+    """Containing group."""
+
+    descendant_id = db.Column(
+        db.Integer(15, unsigned=True), db.ForeignKey(Group.id),
+        nullable=False, primary_key=True, index=True)
+    """Member group."""
+
+    depth = db.Column(db.Integer, nullable=False)
+    """Length of the shortest membership chain."""
+
+    @classmethod
+    def _graph(cls):
+        """Load mapping of group ids to ids of their direct containers."""
+        graph = {}
+        for (id_member, id_group) in GroupMemberGroup.query.with_entities(
+                GroupMemberGroup.id_member_group, GroupMemberGroup.id_group):
+            graph.setdefault(id_member, set()).add(id_group)
+        return graph
+
+    @classmethod
+    def ancestor_ids(cls, group_ids):
+        """Get ids of groups containing any of the groups at any depth."""
+        result = set()
+        for chunk in _chunks(list(group_ids)):
+            result.update(a for (a, ) in cls.query.filter(
+                cls.descendant_id.in_(chunk)).with_entities(cls.ancestor_id))
+        return list(result)
+
+    @classmethod
+    def descendant_ids(cls, group_id):
+        """Get ids of groups contained in a group at any depth."""
+        return [d for (d, ) in cls.query.filter_by(
+            ancestor_id=group_id).with_entities(cls.descendant_id)]
+
+
+class EffectiveMembership(db.Model):
+
+    """Materialized active memberships including nested groups.
+
+    A row ``(id_user, id_group)`` exists if the user is an active member of
+    the group or of any group which is (at any depth) a member of it. The
+    table is maintained incrementally by the mutators of
+    :class:`Membership`, :class:`GroupMemberGroup` and :class:`Group`, so
+    membership checks are a single primary key lookup regardless of the
+    nesting depth.
+    """
+
+    __tablename__ = 'groupEFFECTIVEMEMBER'
+
+    id_user = db.Column(db.Integer(15, unsigned=True), db.ForeignKey(User.id),
+                        nullable=False, primary_key=True)
+    """User."""
+
+    id_group = db.Column(db.Integer(15, unsigned=True),
+                         db.ForeignKey(Group.id), nullable=False,
+                         primary_key=True, index=True)
+    """Group."""
+
+    @classmethod
+    def add(cls, id_group, user_ids):
+        """Register new active members of a group. Not committed.
+
+        :param id_group: Id of the group.
+        :param user_ids: Ids of the new active members.
+        """
+        targets = [id_group] + GroupMemberClosure.ancestor_ids([id_group])
+        for chunk in _chunks(list(set(user_ids))):
+            existing = set(cls.query.filter(
+                cls.id_user.in_(chunk), cls.id_group.in_(targets),
+            ).with_entities(cls.id_user, cls.id_group))
+            inserts = [dict(id_user=u, id_group=g)
+                       for u in chunk for g in targets
+                       if (u, g) not in existing]
+            if inserts:
+                db.session.execute(cls.__table__.insert(), inserts)
+
+    @classmethod
+    def refresh_users(cls, id_group, user_ids):
+        """Recompute memberships of users after they left a group.
+
+        Membership changes must be flushed. Not committed.
+
+        :param id_group: Id of the group the users left.
+        :param user_ids: Ids of the users.
+        """
+        affected = set([id_group] + GroupMemberClosure.ancestor_ids(
+            [id_group]))
+        for chunk in _chunks(list(set(user_ids))):
+            cls.query.filter(
+                cls.id_user.in_(chunk), cls.id_group.in_(list(affected)),
+            ).delete(synchronize_session=False)
+
+            direct = set(Membership.query.filter(
+                Membership.id_user.in_(chunk),
+                Membership.state == MembershipState.ACTIVE,
+            ).with_entities(Membership.id_user, Membership.id_group))
+            ancestors = {}
+            for sources in _chunks(list(set(g for dummy, g in direct))):
+                for (a, d) in GroupMemberClosure.query.filter(
+                    GroupMemberClosure.descendant_id.in_(sources),
+                    GroupMemberClosure.ancestor_id.in_(list(affected)),
+                ).with_entities(GroupMemberClosure.ancestor_id,
+                                GroupMemberClosure.descendant_id):
+                    ancestors.setdefault(d, set()).add(a)
+
+            rows = set()
+            for (u, g) in direct:
+                if g in affected:
+                    rows.add((u, g))
+                rows.update((u, a) for a in ancestors.get(g, ()))
+            if rows:
+                db.session.execute(cls.__table__.insert(), [
+                    dict(id_user=u, id_group=g) for (u, g) in rows])
+
+    @classmethod
+    def refresh_groups(cls, group_ids):
+        """Recompute all effective members of groups.
+
+        Issues one ``DELETE`` and one ``INSERT ... SELECT`` per group.
+        Membership and closure changes must be flushed. Not committed.
+
+        :param group_ids: Ids of groups.
+        """
+        for id_group in set(group_ids):
+            cls.query.filter_by(id_group=id_group).delete(
+                synchronize_session=False)
+            sources = [id_group] + GroupMemberClosure.descendant_ids(
+                id_group)
+            select = db.select([
+                Membership.id_user, db.literal(id_group),
+            ]).where(db.and_(
+                Membership.state == MembershipState.ACTIVE,
+                Membership.id_group.in_(sources),
+            )).distinct()
+            db.session.execute(cls.__table__.insert().from_select(
+                ['id_user', 'id_group'], select))
+
+    @classmethod
+    def rebuild(cls):
+        """Recompute the whole table and commit."""
+        try:
+            cls.query.delete()
+            db.session.flush()
+            cls.refresh_groups(
+                [gid for (gid, ) in Group.query.with_entities(Group.id)])
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+
+class GroupNameNGram(db.Model):
+
+    """Inverted n-gram index of group names.
+
+    Used by :class:`invenio_groups.search.NGramEngine`. The index is
+    maintained by ``Group.create``, ``Group.update`` and ``Group.delete``.
+    """
+
+    __tablename__ = 'groupNAMENGRAM'
+
+    ngram = db.Column(
+        db.String(3).with_variant(
+            mysql.VARCHAR(3, charset='utf8', collation='utf8_bin'), 'mysql'),
+        nullable=False, primary_key=True)
+    """Lower case n-gram of a group name."""
+
+    group_id = db.Column(
+        db.Integer(15, unsigned=True), db.ForeignKey(Group.id),
+        nullable=False, primary_key=True, index=True)
+    """Group."""
+
+    @classmethod
+    def index(cls, group):
+        """Replace n-grams of a group name. Changes are not committed.
+
+        :param group: Group object with an id.
+        """
+        cls.query.filter_by(group_id=group.id).delete()
+        grams = ngrams(group.name)
+        if grams:
+            db.session.execute(cls.__table__.insert(), [
+                dict(ngram=gram, group_id=group.id) for gram in grams
+            ])
+
+    @classmethod
+    def rebuild(cls, batch=1000):
+        """Recompute the whole index from group names and commit."""
+        try:
+            cls.query.delete()
+            inserts = []
+            for group_id, name in Group.query.with_entities(
+                    Group.id, Group.name).all():
+                inserts.extend(dict(ngram=gram, group_id=group_id)
+                               for gram in ngrams(name))
+                if len(inserts) >= batch:
+                    db.session.execute(cls.__table__.insert(), inserts)
+                    inserts = []
+            if inserts:
+                db.session.execute(cls.__table__.insert(), inserts)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+
+class GroupJob(db.Model):
+
+    """Background job working on groups (see :mod:`invenio_groups.jobs`)."""
+
+    __tablename__ = 'groupJOB'
+
+    JOB_STATUS = {
+        JobStatus.PENDING: _("Pending"),
+        JobStatus.RUNNING: _("Running"),
+        JobStatus.DONE: _("Done"),
+        JobStatus.FAILED: _("Failed"),
+    }
+    """Job status choices."""
+
+    id = db.Column(db.Integer(15, unsigned=True), nullable=False,
+                   primary_key=True, autoincrement=True)
+    """Job identifier."""
+
+    name = db.Column(db.String(64), nullable=False)
+    """Name of the registered task."""
+
+    id_user = db.Column(db.Integer(15, unsigned=True), db.ForeignKey(User.id),
+                        nullable=True, index=True)
+    """User who submitted the job."""
+
+    status = db.Column(ChoiceType(JOB_STATUS, impl=db.String(1)),
+                       nullable=False, default=JobStatus.PENDING)
+    """Job status."""
+
+    kwargs = db.Column(JSONType, nullable=False, default=dict)
+    """Keyword arguments of the task."""
+
+    progress = db.Column(db.Integer, nullable=False, default=0)
+    """Number of processed items."""
+
+    total = db.Column(db.Integer, nullable=True)
+    """Number of items to process, if known."""
+
+    result = db.Column(JSONType, nullable=True)
+    """Value returned by the task."""
+
+    error = db.Column(db.Text, nullable=True)
+    """Error message of a failed job."""
+
+    created = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    """Creation timestamp."""
+
+    modified = db.Column(db.DateTime, nullable=False, default=datetime.now,
+                         onupdate=datetime.now)
+    """Modification timestamp."""
+
+    def to_dict(self):
+        """Get job state as a dictionary."""
+        return dict(
+            id=self.id,
+            name=self.name,
+            status=getattr(self.status, 'code', self.status),
+            progress=self.progress,
+            total=self.total,
+            result=self.result,
+            error=self.error,
+        )
+
+
+class GroupChange(db.Model):
+
+    """Append-only log of changes to groups, memberships and admins.
+
+    Entries are written in the same transaction as the change by the
+    mutators of :class:`Group`, :class:`Membership` and :class:`GroupAdmin`.
+    Consumers poll :meth:`changes_since` with the last sequence number they
+    have processed.
+
+    Sequence numbers are allocated when rows are inserted, not when their
+    transaction commits, so with concurrent writers a lower number may
+    become visible after a higher one has been read. Sequence numbers also
+    have gaps (values reserved by bulk inserts or used by rolled back
+    transactions). Consumers which cannot tolerate missed entries should
+    wait a bounded time at gaps (see :mod:`invenio_groups.outbox`).
+    """
+
+    __tablename__ = 'groupCHANGE'
+
+    seq = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'),
+                    nullable=False, primary_key=True, autoincrement=True)
+    """Monotonic sequence number."""
+
+    change = db.Column(db.String(2), nullable=False)
+    """ChangeType."""
+
+    id_group = db.Column(db.Integer(15, unsigned=True), nullable=False)
+    """Changed group (no foreign key, deleted groups are logged)."""
+
+    id_user = db.Column(db.Integer(15, unsigned=True), nullable=True)
+    """Member of membership changes."""
+
+    state = db.Column(db.String(1), nullable=True)
+    """MembershipState of membership changes."""
+
+    admin_type = db.Column(db.Unicode(255), nullable=True)
+    """Admin type of admin changes."""
+
+    admin_id = db.Column(db.Integer, nullable=True)
+    """Admin id of admin changes."""
+
+    id_member_group = db.Column(db.Integer(15, unsigned=True), nullable=True)
+    """Member group of nested group changes."""
+
+    created = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    """Creation timestamp."""
+
+    @classmethod
+    def log(cls, change, rows):
+        """Add entries in the current transaction. Not committed.
+
+        Versions of the groups concerned are incremented too (see
+        :func:`_bump_versions`).
+
+        :param change: ChangeType.
+        :param rows: List of dictionaries with column values.
+        """
+        if rows:
+            now = datetime.now()
+            db.session.execute(cls.__table__.insert(), [
+                dict(row, change=change, created=now) for row in rows
+            ])
+            _bump_versions([row['id_group'] for row in rows])
+
+    @classmethod
+    def log_query(cls, change, query, state=None):
+        """Add an entry per membership or admin matched by a query.
+
+        Entries are copied with a single ``INSERT ... SELECT``, so call it
+        before deleting or updating the rows. Not committed.
+
+        :param change: ChangeType.
+        :param query: Membership or GroupAdmin query.
+        :param state: New MembershipState. Default: current state.
+        """
+        entity = query.column_descriptions[0]['entity']
+        if entity is GroupAdmin:
+            names = ['id_group', 'admin_type', 'admin_id']
+            columns = [GroupAdmin.group_id, GroupAdmin.admin_type,
+                       GroupAdmin.admin_id]
+        else:
+            names = ['id_group', 'id_user', 'state']
+            columns = [Membership.id_group, Membership.id_user,
+                       db.literal(state) if state else Membership.state]
+        select = query.with_entities(
+            *(columns + [db.literal(change), db.literal(datetime.now())])
+        ).statement
+        db.session.execute(cls.__table__.insert().from_select(
+            names + ['change', 'created'], select))
+        _bump_versions(query.with_entities(columns[0]))
+
+    @classmethod
+    def changes_since(cls, seq=0, limit=1000):
+        """Get entries following a sequence number (primary key seek).
+
+        :param seq: Last processed sequence number.
+        :param limit: Maximum number of entries.
+        :returns: List of GroupChange objects ordered by sequence number.
+        """
+        return cls.query.filter(cls.seq > seq).order_by(
+            cls.seq).limit(limit).all()
+
+    @classmethod
+    def last_seq(cls):
+        """Get highest sequence number (0 if the log is empty)."""
+        return db.session.query(func.max(cls.seq)).scalar() or 0
+
+    @classmethod
+    def prune(cls, seq):
+        """Delete entries up to a sequence number and commit.
+
+        :param seq: Highest sequence number to delete.
+        :returns: Number of deleted entries.
+        """
+        try:
+            count = cls.query.filter(cls.seq <= seq).delete(
+                synchronize_session=False)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return count
+
+    def to_dict(self):
+        """Get entry as a dictionary."""
+        return dict(
+            seq=self.seq,
+            change=self.change,
+            id_group=self.id_group,
+            id_user=self.id_user,
+            state=self.state,
+            admin_type=self.admin_type,
+            admin_id=self.admin_id,
+            id_member_group=self.id_member_group,
+            created=self.created.isoformat(),
+        )
+
+
+class GroupDelivery(db.Model):
+
+    """Delivery position of the change log per push endpoint.
+
+    See :mod:`invenio_groups.outbox`.
+    """
+
+    __tablename__ = 'groupDELIVERY'
+
+    url = db.Column(db.String(255), nullable=False, primary_key=True)
+    """Endpoint URL."""
+
+    seq = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'),
+                    nullable=False, default=0)
+    """Sequence number of the last delivered GroupChange."""
+
+    failures = db.Column(db.Integer, nullable=False, default=0)
+    """Number of consecutive failed deliveries."""
+
+    next_attempt = db.Column(db.DateTime, nullable=True)
+    """Earliest time of the next attempt after a failure."""
+
+    last_error = db.Column(db.Text, nullable=True)
+    """Error of the last failed delivery."""
+
+    modified = db.Column(db.DateTime, nullable=False, default=datetime.now,
+                         onupdate=datetime.now)
+    """Modification timestamp."""
+
+
 #
 # Helpers
 #
 
 
+_STATE_COUNTERS = {
+    MembershipState.ACTIVE: 'active_count',
+    MembershipState.PENDING_ADMIN: 'pending_admin_count',
+    MembershipState.PENDING_USER: 'pending_user_count',
+}
+"""Group counter column of each membership state."""
+
+
+def _state_counter(state):
+    """Get name of the group counter of a membership state."""
+    return _STATE_COUNTERS[getattr(state, 'code', state)]
+
+
+def _update_counters(group_ids, **deltas):
+    """Increment counters of groups in the database. Not committed.
+
+    :param list group_ids: Ids of groups.
+    :param deltas: Mapping of counter names to increments.
+    """
+    values = dict((getattr(Group, name), getattr(Group, name) + delta)
+                  for name, delta in deltas.items() if delta)
+    if values and group_ids:
+        Group.query.filter(Group.id.in_(group_ids)).update(
+            values, synchronize_session=False)
+
+
+def _bump_versions(group_ids):
+    """Increment version stamps of groups. Not committed.
+
+    :param group_ids: List of group ids or a query of group ids.
+    """
+    if isinstance(group_ids, list):
+        for chunk in _chunks(sorted(set(group_ids))):
+            Group.query.filter(Group.id.in_(chunk)).update(
+                {Group.version: Group.version + 1}, synchronize_session=False)
+    else:
+        Group.query.filter(Group.id.in_(group_ids)).update(
+            {Group.version: Group.version + 1}, synchronize_session=False)
+
+
+def _count_states(query):
+    """Count memberships of a query by group and state.
+
+    :returns: Dictionary mapping ``(id_group, state)`` to counts.
+    """
+    return dict(
+        ((id_group, getattr(state, 'code', state)), count)
+        for id_group, state, count in query.with_entities(
+            Membership.id_group, Membership.state, func.count()
+        ).group_by(Membership.id_group, Membership.state)
+    )
+
+
+def _apply_state_counts(counts, sign):
+    """Add (or subtract) result of :func:`_count_states` to group counters."""
+    deltas = {}
+    for (id_group, state), count in counts.items():
+        group_deltas = deltas.setdefault(id_group, {})
+        name = _state_counter(state)
+        group_deltas[name] = group_deltas.get(name, 0) + sign * count
+    for id_group, group_deltas in deltas.items():
+        _update_counters([id_group], **group_deltas)
+
+
+def _can_see_members(privacy_policy, is_admin, is_member):
+    """Evaluate a privacy policy (see :meth:`Group.can_see_members`)."""
+    if privacy_policy == PrivacyPolicy.PUBLIC:
+        return True
+    elif privacy_policy == PrivacyPolicy.MEMBERS:
+        return is_member
+    return is_admin
+
+
 def resolve_admin_type(admin):
     """Determine admin type."""
     if admin is current_user or isinstance(admin, UserInfo):
         return "User"
     else:
         return admin.__class__.__name__
+
+
+def _cached_member_group_ids(cache, user):
+    """Get cached ids of groups where user is an (effective) active member."""
+    return cache.member_group_ids(user.get_id(), lambda: [
+        gid for (gid, ) in EffectiveMembership.query.filter_by(
+            id_user=user.get_id()
+        ).with_entities(EffectiveMembership.id_group)
+    ])
+
+
+def _cached_admin_group_ids(cache, user):
+    """Get cached ids of groups directly administered by user."""
+    return cache.admin_group_ids(user.get_id(), lambda: [
+        gid for (gid, ) in GroupAdmin.query.filter_by(
+            admin_type='User', admin_id=user.get_id()
+        ).with_entities(GroupAdmin.group_id)
+    ])
+
+
+def _cached_group_member_ids(cache, group):
+    """Get cached ids of active members of a group."""
+    return cache.group_member_ids(group.id, lambda: [
+        uid for (uid, ) in Membership.query_by_group(
+            group).with_entities(Membership.id_user)
+    ])
+
+
+def _group_admin_graph():
+    """Load mapping of group ids to ids of groups directly admining them."""
+    graph = {}
+    for (group_id, admin_id) in GroupAdmin.query.filter_by(
+        admin_type='Group'
+    ).with_entities(GroupAdmin.group_id, GroupAdmin.admin_id):
+        graph.setdefault(group_id, set()).add(admin_id)
+    return graph
+
+
+def _walk(graph, start):
+    """Breadth-first search returning reachable nodes and their depth."""
+    depths = {}
+    level, depth = set(graph.get(start, ())), 1
+    while level:
+        for node in level:
+            depths[node] = depth
+        level = set(
+            n for node in level for n in graph.get(node, ())
+            if n not in depths and n != start
+        )
+        depth += 1
+    return depths
+
+
+def _query_keys(query, batch=1000):
+    """Read ``(id_user, id_group)`` keys of a membership query in batches."""
+    return list(query.order_by(None).with_entities(
+        Membership.id_user, Membership.id_group).yield_per(batch))
+
+
+def _chunks(values, size=500):
+    """Split a list into chunks usable in ``IN`` clauses."""
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
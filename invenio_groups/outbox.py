@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2015 CERN.
+#
+# Invenio is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+
+"""Push delivery of the change log to HTTP endpoints.
+
+The change log (:class:`invenio_groups.models.GroupChange`) is the outbox:
+its entries are written in the same transaction as the model changes, so
+requests never wait for remote systems. A delivery worker (the ``deliver``
+command, or :func:`invenio_groups.tasks.deliver_changes_task`) reads the
+entries following the position stored for each endpoint in
+:class:`invenio_groups.models.GroupDelivery` and POSTs them in batches as
+gzip compressed JSON::
+
+    {"changes": [{"seq": 1, "change": "MA", "id_group": 1, ...}, ...]}
+
+An endpoint must answer with a 2xx status; otherwise the batch is retried
+with exponential backoff. Delivery is at least once, in sequence order.
+
+Entries younger than ``GROUPS_OUTBOX_SETTLE`` seconds are held back, so
+that bursts of changes are delivered together. Sequence numbers are
+assigned when entries are inserted, not when their transaction commits, so
+a gap in the sequence numbers may be filled later by a transaction still
+in progress. Writers are not serialized; instead delivery stops at a gap
+until the entry following it is ``GROUPS_OUTBOX_GAP_TIMEOUT`` seconds old
+and then skips it. Most gaps are auto-increment values reserved by bulk
+inserts or used by rolled back transactions, which only delay delivery by
+this timeout.
+"""
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import gzip
+import json
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from invenio.ext.sqlalchemy import db
+
+from six import BytesIO
+from six.moves.urllib.request import Request, urlopen
+
+from .models import GroupChange, GroupDelivery
+
+
+def encode_batch(changes):
+    """Serialize entries to a gzip compressed JSON document.
+
+    :param changes: List of GroupChange objects.
+    :returns: Compressed bytes.
+    """
+    buf = BytesIO()
+    with gzip.GzipFile(fileobj=buf, mode='wb') as f:
+        f.write(json.dumps(
+            dict(changes=[c.to_dict() for c in changes])).encode('utf-8'))
+    return buf.getvalue()
+
+
+def post_batch(url, changes, timeout=10):
+    """POST a batch of entries to an endpoint.
+
+    :param url: Endpoint URL.
+    :param changes: List of GroupChange objects.
+    :param timeout: Socket timeout in seconds.
+    :raises: Exception if the endpoint is unreachable or answers with an
+        error status.
+    """
+    request = Request(url, data=encode_batch(changes), headers={
+        'Content-Type': 'application/json',
+        'Content-Encoding': 'gzip',
+    })
+    response = urlopen(request, timeout=timeout)
+    try:
+        response.read()
+    finally:
+        response.close()
+
+
+def backoff(failures, base=2, maximum=600):
+    """Get seconds to wait after a number of consecutive failures."""
+    return min(maximum, base * 2 ** (failures - 1))
+
+
+def _settled(changes, seq, now, settle, gap_timeout):
+    """Get the leading entries old enough to be delivered after ``seq``.
+
+    Entries following a gap must be ``gap_timeout`` seconds old, others
+    ``settle`` seconds.
+    """
+    limit = now - timedelta(seconds=settle)
+    gap_limit = now - timedelta(seconds=gap_timeout)
+    for i, change in enumerate(changes):
+        gap = seq and change.seq != seq + 1
+        if change.created > (gap_limit if gap else limit):
+            return changes[:i]
+        seq = change.seq
+    return changes
+
+
+def deliver(url, batch_size=None, settle=None, now=None, gap_timeout=None):
+    """Deliver the next batch of entries to an endpoint.
+
+    :param url: Endpoint URL.
+    :param batch_size: Maximum number of entries per POST. Default:
+        ``GROUPS_OUTBOX_BATCH_SIZE``.
+    :param settle: Minimal age of delivered entries in seconds. Default:
+        ``GROUPS_OUTBOX_SETTLE``.
+    :param now: Current time (for tests).
+    :param gap_timeout: Minimal age in seconds of an entry following a gap
+        in the sequence numbers. Default: ``GROUPS_OUTBOX_GAP_TIMEOUT``.
+    :returns: Number of delivered entries, or ``None`` if delivery failed
+        or is postponed because of earlier failures.
+    """
+    config = current_app.config
+    if batch_size is None:
+        batch_size = config.get('GROUPS_OUTBOX_BATCH_SIZE', 500)
+    if settle is None:
+        settle = config.get('GROUPS_OUTBOX_SETTLE', 5)
+    if gap_timeout is None:
+        gap_timeout = config.get('GROUPS_OUTBOX_GAP_TIMEOUT', 60)
+    now = now or datetime.now()
+
+    position = GroupDelivery.query.get(url)
+    if position is None:
+        position = GroupDelivery(url=url, seq=0, failures=0)
+        db.session.add(position)
+    if position.next_attempt is not None and position.next_attempt > now:
+        return None
+
+    changes = _settled(GroupChange.changes_since(position.seq, batch_size),
+                       position.seq, now, settle, gap_timeout)
+    if not changes:
+        db.session.commit()
+        return 0
+
+    try:
+        post_batch(url, changes,
+                   timeout=config.get('GROUPS_OUTBOX_TIMEOUT', 10))
+    except Exception as e:
+        position.failures += 1
+        position.next_attempt = now + timedelta(seconds=backoff(
+            position.failures,
+            base=config.get('GROUPS_OUTBOX_BACKOFF', 2),
+            maximum=config.get('GROUPS_OUTBOX_BACKOFF_MAX', 600)))
+        position.last_error = '{0}: {1}'.format(type(e).__name__, e)
+        db.session.commit()
+        current_app.logger.warning('Delivery of group changes to {0} '
+                                   'failed: {1}'.format(url, e))
+        return None
+
+    position.seq = changes[-1].seq
+    position.failures = 0
+    position.next_attempt = None
+    position.last_error = None
+    db.session.commit()
+    return len(changes)
+
+
+def deliver_all(urls=None, **kwargs):
+    """Deliver all pending entries to each endpoint.
+
+    Delivery to an endpoint stops at its first failure.
+
+    :param urls: Endpoint URLs. Default: ``GROUPS_OUTBOX_ENDPOINTS``.
+    :param kwargs: Arguments passed to :func:`deliver`.
+    :returns: Dictionary mapping URLs to numbers of delivered entries.
+    """
+    if urls is None:
+        urls = current_app.config.get('GROUPS_OUTBOX_ENDPOINTS', [])
+    result = {}
+    for url in urls:
+        result[url] = 0
+        while True:
+            count = deliver(url, **kwargs)
+            if not count:
+                break
+            result[url] += count
+    return result
+
+
+def delivered_seq(urls=None):
+    """Get the sequence number delivered to all endpoints.
+
+    Entries up to this number can be pruned with
+    :meth:`invenio_groups.models.GroupChange.prune`.
+
+    :param urls: Endpoint URLs. Default: ``GROUPS_OUTBOX_ENDPOINTS``.
+    """
+    if urls is None:
+        urls = current_app.config.get('GROUPS_OUTBOX_ENDPOINTS', [])
+    if not urls:
+        return GroupChange.last_seq()
+    positions = dict(GroupDelivery.query.filter(
+        GroupDelivery.url.in_(list(urls))
+    ).with_entities(GroupDelivery.url, GroupDelivery.seq))
+    return min(positions.get(url, 0) for url in urls)
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2015 CERN.
+#
+# Invenio is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+
+"""Keyset (seek) pagination.
+
+Instead of ``OFFSET`` the next page is selected with a condition on the
+values of the ordering keys of the last row of the current page, so every
+page costs the same index seek. Cursors are opaque URL safe strings.
+"""
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import base64
+import json
+from datetime import datetime
+
+from flask_sqlalchemy import BaseQuery
+
+from sqlalchemy import and_, or_
+
+_DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'dt': value.strftime(_DATETIME_FORMAT)}
+    return getattr(value, 'code', value)
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        return datetime.strptime(value['dt'], _DATETIME_FORMAT)
+    return value
+
+
+def encode_cursor(values, backwards=False):
+    """Encode key values into an opaque cursor.
+
+    :param values: List of key values.
+    :param bool backwards: Whether the cursor points to a previous page.
+    :returns: URL safe string.
+    """
+    data = json.dumps([[_encode_value(v) for v in values], int(backwards)],
+                      separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor.
+
+    :param cursor: String produced by :func:`encode_cursor`.
+    :returns: Tuple ``(values, backwards)``.
+    :raises ValueError: If the cursor is invalid.
+    """
+    try:
+        values, backwards = json.loads(base64.urlsafe_b64decode(
+            cursor.encode('ascii')).decode('utf-8'))
+        return [_decode_value(v) for v in values], bool(backwards)
+    except Exception:
+        raise ValueError('Invalid cursor.')
+
+
+def _seek(keys, values, descending):
+    """Build condition selecting rows strictly after the given values."""
+    clauses = []
+    for i, key in enumerate(keys):
+        equal = [k == v for k, v in zip(keys[:i], values[:i])]
+        step = key < values[i] if descending else key > values[i]
+        clauses.append(and_(*(equal + [step])))
+    return or_(*clauses)
+
+
+def estimate_count(query):
+    """Estimate number of rows of a query from the database query plan.
+
+    Supported on MySQL and PostgreSQL; other databases fall back to an exact
+    ``COUNT``.
+
+    :param query: Query object.
+    :returns: Estimated number of rows.
+    """
+    session = query.session
+    dialect = session.get_bind().dialect
+    query = query.order_by(None)
+    if dialect.name not in ('mysql', 'postgresql'):
+        return query.count()
+
+    try:
+        statement = str(query.statement.compile(
+            dialect=dialect, compile_kwargs={'literal_binds': True}))
+    except NotImplementedError:
+        return query.count()
+
+    # Plain strings go to the driver as they are; ``text()`` would parse
+    # ``:word`` inside the rendered literals as bind parameters.
+    connection = session.connection()
+    if dialect.name == 'mysql':
+        row = connection.execute('EXPLAIN ' + statement).first()
+        return int(dict(row.items()).get('rows') or 0)
+    row = connection.execute('EXPLAIN (FORMAT JSON) ' + statement).first()
+    plan = row[0] if isinstance(row[0], list) else json.loads(row[0])
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class KeysetPagination(object):
+
+    """One page of a keyset paginated query."""
+
+    def __init__(self, query, keys, cursor=None, per_page=20,
+                 descending=False, count=False):
+        """Fetch the page.
+
+        :param query: Query object.
+        :param keys: List of columns uniquely ordering the rows (the last
+            one is usually the primary key).
+        :param cursor: Cursor of the page. ``None`` for the first page.
+            Invalid cursors are treated as ``None``.
+        :param int per_page: Number of items per page.
+        :param bool descending: Order by the keys in descending order.
+        :param bool count: Whether to compute the exact ``total``.
+        """
+        self.query = query
+        self.keys = keys
+        self.per_page = per_page
+
+        values, backwards = None, False
+        if cursor:
+            try:
+                values, backwards = decode_cursor(cursor)
+            except ValueError:
+                pass
+            if values is not None and len(values) != len(keys):
+                values, backwards = None, False
+
+        order_desc = descending != backwards
+        q = query.order_by(None)
+        if values is not None:
+            q = q.filter(_seek(keys, values, order_desc))
+        q = q.order_by(*[k.desc() if order_desc else k.asc() for k in keys])
+
+        items = q.limit(per_page + 1).all()
+        more = len(items) > per_page
+        items = items[:per_page]
+        if backwards:
+            items.reverse()
+            self.has_prev, self.has_next = more, True
+        else:
+            self.has_prev, self.has_next = values is not None, more
+        self.items = items
+
+        self.total = query.order_by(None).count() if count else None
+        self._estimated_total = None
+
+    def _key_values(self, item):
+        return [getattr(item, k.key) for k in self.keys]
+
+    @property
+    def next_cursor(self):
+        """Cursor of the next page or ``None``."""
+        if self.has_next and self.items:
+            return encode_cursor(self._key_values(self.items[-1]))
+
+    @property
+    def prev_cursor(self):
+        """Cursor of the previous page or ``None``."""
+        if self.has_prev and self.items:
+            return encode_cursor(self._key_values(self.items[0]),
+                                 backwards=True)
+
+    @property
+    def estimated_total(self):
+        """Exact total if computed, otherwise an estimate."""
+        if self.total is not None:
+            return self.total
+        if self._estimated_total is None:
+            self._estimated_total = estimate_count(self.query)
+        return self._estimated_total
+
+
+class KeysetQuery(BaseQuery):
+
+    """Query class adding keyset pagination."""
+
+    def keyset_paginate(self, keys, cursor=None, per_page=20,
+                        descending=False, count=False):
+        """Return a :class:`KeysetPagination` of this query."""
+        return KeysetPagination(self, keys, cursor=cursor, per_page=per_page,
+                                descending=descending, count=count)
@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2015 CERN.
+#
+# Invenio is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+
+"""Search engines for group names and group members.
+
+The engine used by :meth:`invenio_groups.models.Group.search` and
+:meth:`invenio_groups.models.Membership.search` is selected with
+``GROUPS_SEARCH_ENGINE``:
+
+* :class:`SubstringEngine` (default) matches anywhere in the name
+  (``LIKE '%q%'``), which requires a full table scan.
+* :class:`PrefixEngine` matches the beginning of names and e-mails
+  (``LIKE 'q%'``) and uses their indexes.
+* :class:`NGramEngine` looks group names up in the trigram inverted index
+  ``groupNAMENGRAM`` and ranks them by the number of matching trigrams.
+
+Ranking is an ``ORDER BY`` on the returned query, so callers paginating
+with their own order (e.g. :meth:`~.pagination.KeysetQuery.keyset_paginate`)
+should pass ``rank=False``.
+"""
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+from flask import current_app
+
+from six import string_types
+
+from sqlalchemy import case, func
+
+from werkzeug.utils import import_string
+
+NGRAM_SIZE = 3
+"""Length of indexed n-grams."""
+
+
+def escape_like(q, escape='\\'):
+    """Escape ``LIKE`` wildcards in a search string.
+
+    :param q: Search string.
+    :param escape: Escape character passed as ``escape`` to ``like()``.
+    :returns: Escaped string.
+    """
+    return q.replace(escape, escape * 2).replace('%', escape + '%') \
+        .replace('_', escape + '_')
+
+
+def ngrams(value, size=NGRAM_SIZE):
+    """Get set of lower case n-grams of a string.
+
+    Strings shorter than ``size`` produce a single n-gram.
+
+    :param value: String.
+    :param size: Length of n-grams.
+    :returns: Set of n-grams.
+    """
+    value = (value or '').lower()
+    if len(value) <= size:
+        return set([value]) if value else set()
+    return set(value[i:i + size] for i in range(len(value) - size + 1))
+
+
+class SearchEngine(object):
+
+    """Search engine interface."""
+
+    def search_groups(self, query, q, rank=True):
+        """Restrict and rank a group query by a search string.
+
+        :param query: Group query.
+        :param q: Search string.
+        :param rank: Whether to order the query by relevance.
+        :returns: Query object.
+        """
+        raise NotImplementedError()
+
+    def search_members(self, query, q):
+        """Restrict a membership query by user nickname or e-mail.
+
+        :param query: Membership query.
+        :param q: Search string.
+        :returns: Query object.
+        """
+        raise NotImplementedError()
+
+    @classmethod
+    def from_app(cls, app):
+        """Create engine from application configuration."""
+        return cls()
+
+
+class SubstringEngine(SearchEngine):
+
+    """Match search string anywhere in names (full scan)."""
+
+    pattern = '%{0}%'
+
+    def _like(self, column, q):
+        return column.like(self.pattern.format(escape_like(q)), escape='\\')
+
+    def _rank(self, query, q):
+        from .models import Group
+
+        return query.order_by(
+            case([(func.lower(Group.name) == q.lower(), 0)], else_=1),
+            func.length(Group.name), Group.name)
+
+    def search_groups(self, query, q, rank=True):
+        """Restrict and rank a group query by a search string.
+
+        Exact matches come first, followed by shorter names.
+        """
+        from .models import Group
+
+        query = query.filter(self._like(Group.name, q))
+        return self._rank(query, q) if rank else query
+
+    def search_members(self, query, q):
+        """Restrict a membership query by user nickname or e-mail."""
+        from invenio.ext.sqlalchemy import db
+        from invenio.modules.accounts.models import User
+
+        return query.join(User).filter(db.or_(
+            self._like(User.nickname, q),
+            self._like(User.email, q),
+        ))
+
+
+class PrefixEngine(SubstringEngine):
+
+    """Match search string at the beginning of names (index range scan)."""
+
+    pattern = '{0}%'
+
+
+class NGramEngine(PrefixEngine):
+
+    """Search group names in the n-gram inverted index.
+
+    A group matches if it shares at least ``threshold`` of the n-grams of
+    the search string, so small typos are tolerated. Groups are ranked by
+    the number of shared n-grams. Search strings shorter than the n-gram
+    size, and member searches, use prefix matching.
+    """
+
+    def __init__(self, threshold=1.0):
+        """Initialize engine.
+
+        :param threshold: Minimal fraction of matching n-grams.
+        """
+        self.threshold = threshold
+
+    @classmethod
+    def from_app(cls, app):
+        """Create engine using ``GROUPS_SEARCH_NGRAM_THRESHOLD``."""
+        return cls(threshold=app.config.get(
+            'GROUPS_SEARCH_NGRAM_THRESHOLD', 1.0))
+
+    def search_groups(self, query, q, rank=True):
+        """Restrict and rank a group query by a search string."""
+        from invenio.ext.sqlalchemy import db
+        from .models import Group, GroupNameNGram
+
+        if len(q) < NGRAM_SIZE:
+            return super(NGramEngine, self).search_groups(query, q, rank)
+        grams = ngrams(q)
+
+        score = func.count(GroupNameNGram.ngram).label('score')
+        matches = db.session.query(
+            GroupNameNGram.group_id, score
+        ).filter(
+            GroupNameNGram.ngram.in_(list(grams))
+        ).group_by(
+            GroupNameNGram.group_id
+        ).having(
+            score >= max(1, int(round(len(grams) * self.threshold)))
+        ).subquery()
+
+        query = query.join(matches, Group.id == matches.c.group_id)
+        if not rank:
+            return query
+        return query.order_by(
+            matches.c.score.desc(), func.length(Group.name), Group.name)
+
+
+def get_search_engine():
+    """Get search engine of current application.
+
+    :returns: SearchEngine instance configured by ``GROUPS_SEARCH_ENGINE``.
+    """
+    engine = current_app.extensions.get('invenio-groups-search')
+    if engine is None:
+        cls = current_app.config.get('GROUPS_SEARCH_ENGINE', SubstringEngine)
+        if isinstance(cls, string_types):
+            cls = import_string(cls)
+        engine = cls.from_app(current_app)
+        current_app.extensions['invenio-groups-search'] = engine
+    return engine
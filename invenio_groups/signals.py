@@ -28,3 +28,21 @@ _signals = Namespace()
 group_created = _signals.signal('group_created')
 
 group_deleted = _signals.signal('group_deleted')
+
+memberships_added = _signals.signal('memberships_added')
+
+memberships_removed = _signals.signal('memberships_removed')
+
+memberships_accepted = _signals.signal('memberships_accepted')
+
+group_admin_added = _signals.signal('group_admin_added')
+
+group_admin_removed = _signals.signal('group_admin_removed')
+
+member_group_added = _signals.signal('member_group_added')
+
+member_group_removed = _signals.signal('member_group_removed')
+
+operation_profiled = _signals.signal('operation_profiled')
+
+request_profiled = _signals.signal('request_profiled')
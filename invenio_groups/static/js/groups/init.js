@@ -22,6 +22,31 @@ require([
 ], function () {
   'use strict';
 
+  // Poll status of a background job started by the previous request.
+  $('[data-job-status-url]').each(function () {
+    var $el = $(this),
+        url = $el.data('jobStatusUrl');
+
+    function poll() {
+      $.getJSON(url, function (job) {
+        var text = job.progress + (job.total !== null ? ' / ' + job.total : '');
+        $el.find('.job-progress').text(text);
+        if (job.status === 'D' || job.status === 'F') {
+          $el.toggleClass('alert-info', false)
+             .toggleClass(job.status === 'D' ? 'alert-success' : 'alert-danger', true);
+          var done = $el.data('doneText');
+          if (job.result && job.result.unknown && job.result.unknown.length) {
+            done += ' ' + $el.data('unknownText') + ' ' + job.result.unknown.join(', ');
+          }
+          $el.find('.job-done').text(job.status === 'D' ? done : job.error);
+        } else {
+          window.setTimeout(poll, 1000);
+        }
+      });
+    }
+    poll();
+  });
+
   $('.table tr').click(function (ev) {
     if (this.children.length > 0) {
       var data = this.children[0].dataset;
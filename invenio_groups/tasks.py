@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2015 CERN.
+#
+# Invenio is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+
+
+"""Celery tasks of groups module."""
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+from invenio.celery import celery
+
+
+@celery.task(ignore_result=True)
+def run_job_task(job_id):
+    """Execute a stored group job (see :mod:`invenio_groups.jobs`)."""
+    from .jobs import run_job
+    run_job(job_id)
+
+
+@celery.task(ignore_result=True)
+def deliver_changes_task():
+    """Push pending change log entries (see :mod:`invenio_groups.outbox`).
+
+    Meant to be scheduled periodically with Celery beat.
+    """
+    from .outbox import deliver_all
+    deliver_all()
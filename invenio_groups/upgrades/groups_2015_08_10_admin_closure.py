@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2015 CERN.
+#
+# Invenio is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+
+"""Add transitive closure of group administration."""
+
+from invenio.ext.sqlalchemy import db
+from invenio.modules.upgrader.api import op
+
+
+depends_on = ['groups_2015_04_16_initial']
+
+
+def info():
+    """One line upgrade description."""
+    return "Add groupADMINCLOSURE table."
+
+
+def do_upgrade():
+    """Perform upgrade."""
+    conn = op.get_bind()
+    # InnoDB cannot reference a MyISAM table: on such installations the
+    # foreign keys are added when ``group`` is converted to InnoDB.
+    constraints = []
+    if conn.dialect.name != 'mysql' or conn.execute(db.text(
+            'SELECT ENGINE FROM information_schema.TABLES '
+            'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = \'group\''
+    )).scalar() == 'InnoDB':
+        constraints = [
+            db.ForeignKeyConstraint(['ancestor_id'], [u'group.id'], ),
+            db.ForeignKeyConstraint(['descendant_id'], [u'group.id'], ),
+        ]
+    op.create_table(
+        'groupADMINCLOSURE',
+        db.Column('ancestor_id', db.Integer(15, unsigned=True),
+                  nullable=False),
+        db.Column('descendant_id', db.Integer(15, unsigned=True),
+                  nullable=False),
+        db.Column('depth', db.Integer, nullable=False),
+        db.PrimaryKeyConstraint('ancestor_id', 'descendant_id'),
+        *constraints,
+        mysql_charset='utf8',
+        mysql_engine='InnoDB'
+    )
+    op.create_index('ix_groupADMINCLOSURE_descendant_id',
+                    'groupADMINCLOSURE', ['descendant_id'])
+
+    # Backfill breadth-first: chains of length 1 come from groupADMIN, each
+    # further level extends the previous one by one edge, keeping only
+    # pairs not reached by a shorter chain.
+    conn.execute(db.text(
+        'INSERT INTO groupADMINCLOSURE (ancestor_id, descendant_id, depth) '
+        'SELECT DISTINCT admin_id, group_id, 1 FROM groupADMIN '
+        'WHERE admin_type = \'Group\''))
+    extend = db.text(
+        'INSERT INTO groupADMINCLOSURE (ancestor_id, descendant_id, depth) '
+        'SELECT DISTINCT e.admin_id, c.descendant_id, :depth + 1 '
+        'FROM groupADMINCLOSURE c JOIN groupADMIN e '
+        'ON e.group_id = c.ancestor_id AND e.admin_type = \'Group\' '
+        'WHERE c.depth = :depth AND e.admin_id != c.descendant_id '
+        'AND NOT EXISTS (SELECT 1 FROM groupADMINCLOSURE x '
+        'WHERE x.ancestor_id = e.admin_id '
+        'AND x.descendant_id = c.descendant_id)')
+    depth = 1
+    while conn.execute(extend, depth=depth).rowcount:
+        depth += 1
+
+
+def estimate():
+    """Estimate running time of upgrade in seconds (optional)."""
+    return 1
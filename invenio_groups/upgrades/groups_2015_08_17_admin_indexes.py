@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2015 CERN.
+#
+# Invenio is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+
+"""Add indexes for lookups of group admins and members by state."""
+
+from invenio.modules.upgrader.api import op
+
+
+depends_on = ['groups_2015_08_10_admin_closure']
+
+
+def info():
+    """One line upgrade description."""
+    return "Add indexes on groupADMIN admin and groupMEMBER state lookups."
+
+
+def do_upgrade():
+    """Perform upgrade."""
+    op.create_index('ix_groupADMIN_admin', 'groupADMIN',
+                    ['admin_type', 'admin_id', 'group_id'])
+    op.create_index('ix_groupMEMBER_id_group_state', 'groupMEMBER',
+                    ['id_group', 'state'])
+
+
+def estimate():
+    """Estimate running time of upgrade in seconds (optional)."""
+    return 60
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2015 CERN.
+#
+# Invenio is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+
+"""Convert groups tables from MyISAM to InnoDB.
+
+Run ``inveniomanage groups innodb --dry-run`` first to see the estimated
+number of rows and duration. Large installations can run
+``inveniomanage groups innodb`` (with ``--pause``) ahead of the upgrade, in
+which case this recipe has nothing left to do.
+"""
+
+from invenio_groups.innodb import convert_to_innodb
+
+
+depends_on = ['groups_2015_08_17_admin_indexes']
+
+
+def info():
+    """One line upgrade description."""
+    return "Convert groups tables to InnoDB."
+
+
+def do_upgrade():
+    """Perform upgrade."""
+    convert_to_innodb()
+
+
+def estimate():
+    """Estimate running time of upgrade in seconds (optional)."""
+    return int(sum(r['seconds'] for r in convert_to_innodb(dry_run=True,
+                                                           log=_silent)))
+
+
+def _silent(message):
+    pass
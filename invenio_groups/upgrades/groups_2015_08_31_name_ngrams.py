@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2015 CERN.
+#
+# Invenio is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+
+"""Add n-gram index of group names."""
+
+from invenio.ext.sqlalchemy import db
+from invenio.modules.upgrader.api import op
+
+from sqlalchemy.dialects import mysql
+
+
+depends_on = ['groups_2015_08_24_innodb']
+
+
+def info():
+    """One line upgrade description."""
+    return "Add groupNAMENGRAM table."
+
+
+def do_upgrade():
+    """Perform upgrade."""
+    op.create_table(
+        'groupNAMENGRAM',
+        db.Column('ngram', db.String(3).with_variant(
+            mysql.VARCHAR(3, charset='utf8', collation='utf8_bin'), 'mysql'),
+            nullable=False),
+        db.Column('group_id', db.Integer(15, unsigned=True), nullable=False),
+        db.ForeignKeyConstraint(['group_id'], [u'group.id'], ),
+        db.PrimaryKeyConstraint('ngram', 'group_id'),
+        mysql_charset='utf8',
+        mysql_engine='InnoDB'
+    )
+    op.create_index('ix_groupNAMENGRAM_group_id', 'groupNAMENGRAM',
+                    ['group_id'])
+
+    from invenio_groups.models import GroupNameNGram
+    GroupNameNGram.rebuild()
+
+
+def estimate():
+    """Estimate running time of upgrade in seconds (optional)."""
+    return 1
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2015 CERN.
+#
+# Invenio is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+
+"""Add denormalized membership and admin counters to groups."""
+
+from invenio.ext.sqlalchemy import db
+from invenio.modules.upgrader.api import op
+
+
+depends_on = ['groups_2015_08_31_name_ngrams']
+
+COUNTERS = ['active_count', 'pending_admin_count', 'pending_user_count',
+            'admins_count']
+
+
+def info():
+    """One line upgrade description."""
+    return "Add membership and admin counters to group table."
+
+
+def do_upgrade():
+    """Perform upgrade."""
+    for name in COUNTERS:
+        op.add_column('group', db.Column(name, db.Integer, nullable=False,
+                                         server_default='0'))
+
+    from invenio_groups.models import Group
+    Group.recount()
+
+
+def estimate():
+    """Estimate running time of upgrade in seconds (optional)."""
+    return 10
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2015 CERN.
+#
+# Invenio is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+
+"""Add table of background jobs."""
+
+from invenio.ext.sqlalchemy import db
+from invenio.modules.upgrader.api import op
+
+
+depends_on = ['groups_2015_09_07_group_counters']
+
+
+def info():
+    """One line upgrade description."""
+    return "Add groupJOB table."
+
+
+def do_upgrade():
+    """Perform upgrade."""
+    op.create_table(
+        'groupJOB',
+        db.Column('id', db.Integer(15, unsigned=True), nullable=False,
+                  autoincrement=True),
+        db.Column('name', db.String(length=64), nullable=False),
+        db.Column('id_user', db.Integer(15, unsigned=True), nullable=True),
+        db.Column('status', db.String(length=1), nullable=False),
+        db.Column('kwargs', db.Text(), nullable=False),
+        db.Column('progress', db.Integer(), nullable=False),
+        db.Column('total', db.Integer(), nullable=True),
+        db.Column('result', db.Text(), nullable=True),
+        db.Column('error', db.Text(), nullable=True),
+        db.Column('created', db.DateTime(), nullable=False),
+        db.Column('modified', db.DateTime(), nullable=False),
+        db.ForeignKeyConstraint(['id_user'], [u'user.id'], ),
+        db.PrimaryKeyConstraint('id'),
+        mysql_charset='utf8',
+        mysql_engine='InnoDB'
+    )
+    op.create_index('ix_groupJOB_id_user', 'groupJOB', ['id_user'])
+
+
+def estimate():
+    """Estimate running time of upgrade in seconds (optional)."""
+    return 1
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2015 CERN.
+#
+# Invenio is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+
+"""Add change log of groups, memberships and admins."""
+
+from invenio.ext.sqlalchemy import db
+from invenio.modules.upgrader.api import op
+
+
+depends_on = ['groups_2015_09_14_jobs']
+
+
+def info():
+    """One line upgrade description."""
+    return "Add groupCHANGE table."
+
+
+def do_upgrade():
+    """Perform upgrade."""
+    op.create_table(
+        'groupCHANGE',
+        db.Column('seq', db.BigInteger(), nullable=False, autoincrement=True),
+        db.Column('change', db.String(length=2), nullable=False),
+        db.Column('id_group', db.Integer(15, unsigned=True), nullable=False),
+        db.Column('id_user', db.Integer(15, unsigned=True), nullable=True),
+        db.Column('state', db.String(length=1), nullable=True),
+        db.Column('admin_type', db.Unicode(length=255), nullable=True),
+        db.Column('admin_id', db.Integer(), nullable=True),
+        db.Column('created', db.DateTime(), nullable=False),
+        db.PrimaryKeyConstraint('seq'),
+        mysql_charset='utf8',
+        mysql_engine='InnoDB'
+    )
+
+
+def estimate():
+    """Estimate running time of upgrade in seconds (optional)."""
+    return 1
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2015 CERN.
+#
+# Invenio is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+
+"""Add delivery positions of the change log."""
+
+from invenio.ext.sqlalchemy import db
+from invenio.modules.upgrader.api import op
+
+
+depends_on = ['groups_2015_09_21_changes']
+
+
+def info():
+    """One line upgrade description."""
+    return "Add groupDELIVERY table."
+
+
+def do_upgrade():
+    """Perform upgrade."""
+    op.create_table(
+        'groupDELIVERY',
+        db.Column('url', db.String(length=255), nullable=False),
+        db.Column('seq', db.BigInteger(), nullable=False),
+        db.Column('failures', db.Integer(), nullable=False),
+        db.Column('next_attempt', db.DateTime(), nullable=True),
+        db.Column('last_error', db.Text(), nullable=True),
+        db.Column('modified', db.DateTime(), nullable=False),
+        db.PrimaryKeyConstraint('url'),
+        mysql_charset='utf8',
+        mysql_engine='InnoDB'
+    )
+
+
+def estimate():
+    """Estimate running time of upgrade in seconds (optional)."""
+    return 1
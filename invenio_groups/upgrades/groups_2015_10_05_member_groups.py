@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2015 CERN.
+#
+# Invenio is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+
+"""Add nested member groups and effective memberships."""
+
+from invenio.ext.sqlalchemy import db
+from invenio.modules.upgrader.api import op
+
+
+depends_on = ['groups_2015_09_28_delivery']
+
+
+def info():
+    """One line upgrade description."""
+    return "Add groupMEMBERGROUP, groupMEMBERCLOSURE and " \
+        "groupEFFECTIVEMEMBER tables."
+
+
+def do_upgrade():
+    """Perform upgrade."""
+    op.create_table(
+        'groupMEMBERGROUP',
+        db.Column('id_group', db.Integer(15, unsigned=True), nullable=False),
+        db.Column('id_member_group', db.Integer(15, unsigned=True),
+                  nullable=False),
+        db.Column('created', db.DateTime(), nullable=False),
+        db.ForeignKeyConstraint(['id_group'], [u'group.id'], ),
+        db.ForeignKeyConstraint(['id_member_group'], [u'group.id'], ),
+        db.PrimaryKeyConstraint('id_group', 'id_member_group'),
+        mysql_charset='utf8',
+        mysql_engine='InnoDB'
+    )
+    op.create_index('ix_groupMEMBERGROUP_id_member_group',
+                    'groupMEMBERGROUP', ['id_member_group'])
+    op.create_table(
+        'groupMEMBERCLOSURE',
+        db.Column('ancestor_id', db.Integer(15, unsigned=True),
+                  nullable=False),
+        db.Column('descendant_id', db.Integer(15, unsigned=True),
+                  nullable=False),
+        db.Column('depth', db.Integer, nullable=False),
+        db.ForeignKeyConstraint(['ancestor_id'], [u'group.id'], ),
+        db.ForeignKeyConstraint(['descendant_id'], [u'group.id'], ),
+        db.PrimaryKeyConstraint('ancestor_id', 'descendant_id'),
+        mysql_charset='utf8',
+        mysql_engine='InnoDB'
+    )
+    op.create_index('ix_groupMEMBERCLOSURE_descendant_id',
+                    'groupMEMBERCLOSURE', ['descendant_id'])
+    op.create_table(
+        'groupEFFECTIVEMEMBER',
+        db.Column('id_user', db.Integer(15, unsigned=True), nullable=False),
+        db.Column('id_group', db.Integer(15, unsigned=True), nullable=False),
+        db.ForeignKeyConstraint(['id_group'], [u'group.id'], ),
+        db.ForeignKeyConstraint(['id_user'], [u'user.id'], ),
+        db.PrimaryKeyConstraint('id_user', 'id_group'),
+        mysql_charset='utf8',
+        mysql_engine='InnoDB'
+    )
+    op.create_index('ix_groupEFFECTIVEMEMBER_id_group',
+                    'groupEFFECTIVEMEMBER', ['id_group'])
+    op.add_column('groupCHANGE', db.Column(
+        'id_member_group', db.Integer(15, unsigned=True), nullable=True))
+
+    from invenio_groups.models import EffectiveMembership
+    EffectiveMembership.rebuild()
+
+
+def estimate():
+    """Estimate running time of upgrade in seconds (optional)."""
+    return 1
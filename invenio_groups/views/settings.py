@@ -21,9 +21,14 @@
 
 from __future__ import unicode_literals
 
+import hashlib
+import json
+from functools import wraps
 from urlparse import urlparse
 
-from flask import Blueprint, flash, redirect, render_template, request, url_for
+from flask import Blueprint, Response, abort, current_app, flash, g, \
+    jsonify, make_response, redirect, render_template, request, session, \
+    stream_with_context, url_for
 
 from flask_breadcrumbs import default_breadcrumb_root, register_breadcrumb
 
@@ -38,8 +43,13 @@ from invenio.modules.accounts.models import User
 
 from sqlalchemy.exc import IntegrityError
 
+from .. import instrumentation
+from ..export import FORMATS
 from ..forms import GroupForm, NewMemberForm
-from ..models import Group, Membership
+from ..jobs import enqueue, fail_stale_jobs
+from ..models import Group, GroupJob, JobStatus, Membership, \
+    MembershipState
+from ..version import __version__
 
 
 blueprint = Blueprint(
@@ -52,6 +62,87 @@ blueprint = Blueprint(
 default_breadcrumb_root(blueprint, '.settings.groups')
 
 
+@blueprint.before_request
+def start_profile():
+    """Profile SQL queries of the request if enabled."""
+    instrumentation.start_request(request.endpoint)
+
+
+@blueprint.after_request
+def finish_profile(response):
+    """Report SQL queries of the request."""
+    return instrumentation.finish_request(response)
+
+
+blueprint.teardown_request(instrumentation.teardown_request)
+
+
+def conditional(stamp):
+    """Answer ``If-None-Match`` with 304 before running a view.
+
+    The strong ETag is a hash of the URL, user, language and the value of
+    ``stamp(**view_args)``, which must change whenever the rendered page
+    changes (see :meth:`Group.version_stamp`). Pages with pending flashed
+    messages are always rendered.
+
+    :param stamp: Function returning a JSON serializable version stamp.
+    """
+    def decorator(f):
+        @wraps(f)
+        def inner(**kwargs):
+            if not current_app.config.get('GROUPS_SETTINGS_ETAGS', True) \
+                    or request.method != 'GET' or session.get('_flashes'):
+                return f(**kwargs)
+
+            etag = hashlib.sha1(json.dumps([
+                __version__, request.full_path, current_user.get_id(),
+                getattr(g, 'ln', None), stamp(**kwargs),
+            ]).encode('utf-8')).hexdigest()
+            if request.if_none_match.contains(etag):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(f(**kwargs))
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return inner
+    return decorator
+
+
+def _index_stamp():
+    """Stamp of the groups of the user, administered by or inviting him."""
+    return Group.version_stamp(
+        Group.query_by_user(current_user),
+        Group.query_administered_by(current_user),
+        _invitations_query())
+
+
+def _requests_stamp():
+    """Stamp of the groups administered by the user."""
+    return Group.version_stamp(Group.query_administered_by(current_user))
+
+
+def _invitations_query():
+    """Query groups inviting the current user."""
+    return Group.query.filter(
+        Group.id.in_(Membership.query_invitations(current_user)
+                     .with_entities(Membership.id_group)))
+
+
+def _invitations_stamp():
+    """Stamp of the groups inviting the user."""
+    return Group.version_stamp(_invitations_query())
+
+
+def _members_stamp(group_id):
+    """Stamp of a group and of the rights of the user on it."""
+    return Group.version_stamp(
+        Group.query.filter_by(id=group_id),
+        Group.query_by_user(current_user).filter(Group.id == group_id),
+        Group.query_administered_by(current_user).filter(
+            Group.id == group_id))
+
+
 def get_group_name(id_group):
     """Used for breadcrumb dynamic_list_constructor."""
     group = Group.query.get(id_group)
@@ -70,17 +161,22 @@ def get_group_name(id_group):
 @register_breadcrumb(blueprint, '.', _('Groups'))
 @login_required
 @permission_required('usegroups')
+@conditional(_index_stamp)
 @wash_arguments({
-    'page': (int, 1),
+    'cursor': (unicode, ''),
     'per_page': (int, 5),
     'q': (unicode, ''),
+    'count': (bool, False),
 })
-def index(page, per_page, q):
+def index(cursor, per_page, q, count):
     """List all user memberships."""
     groups = Group.query_by_user(current_user, eager=True)
     if q:
-        groups = Group.search(groups, q)
-    groups = groups.paginate(page, per_page=per_page)
+        groups = Group.search(groups, q, rank=False)
+    groups = groups.keyset_paginate(
+        [Group.name, Group.id], cursor=cursor, per_page=per_page,
+        count=count)
+    annotations = Group.annotate_for_user(groups.items, current_user)
 
     requests = Membership.query_requests(current_user).count()
     invitations = Membership.query_invitations(current_user).count()
@@ -88,51 +184,114 @@ def index(page, per_page, q):
     return render_template(
         'groups/settings.html',
         groups=groups,
+        annotations=annotations,
         requests=requests,
         invitations=invitations,
-        page=page,
         per_page=per_page,
         q=q
     )
 
 
+def _filter_requests(query, q, group_id):
+    """Filter pending requests by user and group."""
+    if group_id:
+        query = query.filter(Membership.id_group == group_id)
+    if q:
+        query = Membership.search(query, q)
+    return query
+
+
 @blueprint.route('/requests', methods=['GET'])
 @register_breadcrumb(blueprint, '.requests', _('Requests'))
 @login_required
 @permission_required('usegroups')
+@conditional(_requests_stamp)
 @wash_arguments({
-    'page': (int, 1),
+    'cursor': (unicode, ''),
     'per_page': (int, 5),
+    'q': (unicode, ''),
+    'group_id': (int, 0),
+    'count': (bool, False),
 })
-def requests(page, per_page):
+def requests(cursor, per_page, q, group_id, count):
     """List all user pending memberships."""
-    memberships = Membership.query_requests(current_user, eager=True).all()
+    memberships = _filter_requests(
+        Membership.query_requests(current_user, eager=True), q, group_id
+    ).keyset_paginate(
+        [Membership.modified, Membership.id_group, Membership.id_user],
+        cursor=cursor, per_page=per_page, count=count)
 
     return render_template(
         'groups/pending.html',
         memberships=memberships,
         requests=True,
-        page=page,
         per_page=per_page,
+        q=q,
+        group_id=group_id,
     )
 
 
+@blueprint.route('/requests/approve', methods=['POST'])
+@login_required
+@permission_required('usegroups')
+@wash_arguments({
+    'q': (unicode, ''),
+    'group_id': (int, 0),
+})
+def approve_all(q, group_id):
+    """Approve all pending requests matching the filter."""
+    try:
+        count = Membership.accept_all(_filter_requests(
+            Membership.query_requests(current_user), q, group_id))
+    except Exception as e:
+        flash(str(e), 'error')
+        return redirect(url_for('.requests', q=q, group_id=group_id))
+
+    flash(_('%(count)s requests approved.', count=count), 'success')
+    return redirect(url_for('.requests', q=q, group_id=group_id))
+
+
+@blueprint.route('/requests/reject', methods=['POST'])
+@login_required
+@permission_required('usegroups')
+@wash_arguments({
+    'q': (unicode, ''),
+    'group_id': (int, 0),
+})
+def reject_all(q, group_id):
+    """Reject all pending requests matching the filter."""
+    try:
+        count = Membership.reject_all(_filter_requests(
+            Membership.query_requests(current_user), q, group_id))
+    except Exception as e:
+        flash(str(e), 'error')
+        return redirect(url_for('.requests', q=q, group_id=group_id))
+
+    flash(_('%(count)s requests rejected.', count=count), 'success')
+    return redirect(url_for('.requests', q=q, group_id=group_id))
+
+
 @blueprint.route('/invitations', methods=['GET'])
 @register_breadcrumb(blueprint, '.Invitations', _('Invitations'))
 @login_required
 @permission_required('usegroups')
+@conditional(_invitations_stamp)
 @wash_arguments({
-    'page': (int, 1),
+    'cursor': (unicode, ''),
     'per_page': (int, 5),
+    'count': (bool, False),
 })
-def invitations(page, per_page):
+def invitations(cursor, per_page, count):
     """List all user pending memberships."""
-    memberships = Membership.query_invitations(current_user, eager=True).all()
+    memberships = Membership.query_invitations(
+        current_user, eager=True
+    ).keyset_paginate(
+        [Membership.modified, Membership.id_group, Membership.id_user],
+        cursor=cursor, per_page=per_page, count=count)
 
     return render_template(
         'groups/pending.html',
         memberships=memberships,
-        page=page,
         per_page=per_page,
     )
 
@@ -199,17 +358,19 @@ def manage(group_id):
 @login_required
 @permission_required('usegroups')
 def delete(group_id):
-    """Delete group."""
-    group = Group.query.get(group_id)
+    """Delete group in the background."""
+    group = Group.query.get_or_404(group_id)
     try:
-        group.delete()
+        job = enqueue('delete_group', user=current_user, group_id=group.id,
+                      chunk_size=current_app.config.get(
+                          'GROUPS_JOBS_CHUNK_SIZE', 1000))
     except Exception as e:
         flash(str(e), "error")
         return redirect(url_for(".index"))
 
-    flash(_('Successfully removed group "%(group_name)s"',
+    flash(_('Group "%(group_name)s" is being removed.',
             group_name=group.name), 'success')
-    return redirect(url_for(".index"))
+    return redirect(url_for(".index", job=job.id))
 
 
 @blueprint.route('/<int:group_id>/members', methods=['GET', 'POST'])
@@ -221,33 +382,63 @@ def delete(group_id):
          {'text': _('Members')}]
 )
 @permission_required('usegroups')
+@conditional(_members_stamp)
 @wash_arguments({
-    'page': (int, 1),
+    'cursor': (unicode, ''),
     'per_page': (int, 5),
     'q': (unicode, ''),
     's': (unicode, ''),
+    'count': (bool, False),
 })
-def members(group_id, page, per_page, q, s):
+def members(group_id, cursor, per_page, q, s, count):
     """List user group members."""
     group = Group.query.get(group_id)
     members = Membership.query_by_group(group_id, with_invitations=True)
     if q:
         members = Membership.search(members, q)
+    keys = [Membership.modified, Membership.id_user]
     if s:
-        members = Membership.order(members, Membership.state, s)
-    members = members.paginate(page, per_page=per_page)
+        keys.insert(0, Membership.state)
+    members = members.keyset_paginate(
+        keys, cursor=cursor, per_page=per_page, descending=(s == 'desc'),
+        count=count)
 
     return render_template(
         "groups/members.html",
         group=group,
         members=members,
-        page=page,
         per_page=per_page,
         q=q,
         s=s,
     )
 
 
+@blueprint.route('/<int:group_id>/members/export', methods=['GET'])
+@login_required
+@permission_required('usegroups')
+@wash_arguments({
+    'format': (unicode, 'csv'),
+    'state': (unicode, ''),
+})
+def export_members(group_id, format, state):
+    """Stream the member list of a group as CSV or JSON lines."""
+    group = Group.query.get_or_404(group_id)
+    if not group.can_see_members(current_user):
+        abort(403)
+    if format not in FORMATS or (state and
+                                 not MembershipState.validate(state)):
+        abort(400)
+
+    mimetype, serializer = FORMATS[format]
+    rows = Membership.stream_by_group(group.id, state=state or None)
+    response = Response(stream_with_context(serializer(rows)),
+                        mimetype=mimetype)
+    response.headers['Content-Disposition'] = \
+        'attachment; filename="group-{0}-members.{1}"'.format(
+            group.id, format)
+    return response
+
+
 @blueprint.route('/<int:group_id>/leave', methods=['POST'])
 @login_required
 @permission_required('usegroups')
@@ -359,12 +550,26 @@ def new_member(group_id):
 
     if form.validate_on_submit():
         emails = filter(None, form.data['emails'].splitlines())
-        group.invite_by_emails(emails)
-        flash(_('Requests sent!'), 'success')
-        return redirect(url_for('.members', group_id=group.id))
+        job = enqueue('invite_by_emails', user=current_user,
+                      group_id=group.id, emails=emails)
+        flash(_('Requests are being sent.'), 'success')
+        return redirect(url_for('.members', group_id=group.id, job=job.id))
 
     return render_template(
         "groups/new_member.html",
         group=group,
         form=form
     )
+
+
+@blueprint.route('/jobs/<int:job_id>', methods=['GET'])
+@login_required
+@permission_required('usegroups')
+def job_status(job_id):
+    """Get status and progress of a background job as JSON."""
+    job = GroupJob.query.get_or_404(job_id)
+    if job.id_user != current_user.get_id():
+        abort(404)
+    if job.status == JobStatus.RUNNING:
+        fail_stale_jobs()
+    return jsonify(job.to_dict())
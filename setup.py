@@ -45,7 +45,9 @@ requirements = [
 
 test_requirements = [
     'coverage>=3.7.1',
+    'fakeredis>=0.6.1',
     'Flask-Testing>=0.4.1',
+    'futures>=3.0.3; python_version<"3"',
     'pytest-cov>=1.8.1',
     'pytest-pep8>=1.0.6',
     'pytest>=2.7.0',
@@ -109,10 +111,16 @@ setup(
     platforms='any',
     install_requires=requirements,
     extras_require={
+        'async': [
+            'futures>=3.0.3; python_version<"3"',
+        ],
         'docs': [
             'Sphinx>=1.3',
             'sphinx_rtd_theme>=0.1.7',
         ],
+        'redis': [
+            'redis>=2.10.0',
+        ],
         'test': test_requirements,
     },
     classifiers=[
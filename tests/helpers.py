@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2015 CERN.
+#
+# Invenio is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+
+
+""" Test helpers. """
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+from invenio.ext.sqlalchemy import db
+from invenio.testsuite import InvenioTestCase
+
+
+class BaseTestCase(InvenioTestCase):
+    """Base test case starting from empty groups tables."""
+
+    def setUp(self):
+        """Clear tables."""
+        self.clear_tables()
+
+    def tearDown(self):
+        """Expunge session."""
+        db.session.expunge_all()
+
+    def clear_tables(self, users=True):
+        """Delete all rows of the groups tables.
+
+        :param users: Also delete all users.
+        """
+        from invenio_groups.models import EffectiveMembership, Group, \
+            GroupAdmin, GroupAdminClosure, GroupChange, GroupDelivery, \
+            GroupJob, GroupMemberClosure, GroupMemberGroup, GroupNameNGram, \
+            Membership
+        from invenio.modules.accounts.models import User
+
+        for model in (GroupDelivery, GroupJob, GroupChange,
+                      EffectiveMembership, GroupMemberClosure,
+                      GroupMemberGroup, GroupAdminClosure, GroupNameNGram,
+                      Group, Membership, GroupAdmin):
+            model.query.delete()
+        if users:
+            User.query.delete()
+        db.session.commit()
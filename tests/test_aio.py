@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2015 CERN.
+#
+# Invenio is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+
+
+""" Test non-blocking read API. """
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+from helpers import BaseTestCase
+
+from invenio.ext.sqlalchemy import db
+from invenio.testsuite import make_test_suite, run_test_suite
+
+from six import PY2
+
+from unittest import skipIf
+
+
+class GroupsReaderTestCase(BaseTestCase):
+    """Test GroupsReader with a thread pool."""
+
+    def setUp(self):
+        """Clear tables, create fixtures and a reader."""
+        from invenio_groups.aio import GroupsReader
+        from invenio_groups.models import Group, MembershipState
+        from invenio.modules.accounts.models import User
+
+        super(GroupsReaderTestCase, self).setUp()
+        self.u1 = User(email="test1@test1.test1", password="test1")
+        self.u2 = User(email="test2@test2.test2", password="test2")
+        db.session.add_all([self.u1, self.u2])
+        db.session.commit()
+        self.g1 = Group.create(name="test1", admins=[self.u1])
+        self.g2 = Group.create(name="test2")
+        self.g1.add_member(self.u2)
+        self.g2.add_member(self.u2, state=MembershipState.PENDING_ADMIN)
+        self.g1.add_member_group(self.g2)
+
+        self.reader = GroupsReader(self.app, workers=2)
+
+    def tearDown(self):
+        """Stop the reader and expunge session."""
+        self.reader.shutdown()
+        super(GroupsReaderTestCase, self).tearDown()
+
+    def test_checks(self):
+        """Test membership and admin checks."""
+        g1, g2, u1, u2 = self.g1.id, self.g2.id, self.u1.id, self.u2.id
+        self.assertTrue(self.reader.is_member(g1, u2).result())
+        self.assertFalse(self.reader.is_member(g2, u2).result())
+        self.assertTrue(self.reader.is_member(
+            g2, u2, with_pending=True).result())
+        self.assertTrue(self.reader.is_admin(g1, u1).result())
+        self.assertFalse(self.reader.is_admin(g1, u2).result())
+
+        self.assertEqual(self.reader.are_members(
+            [(g1, u1), (g1, u2), (g2, u1), (g2, u2)]).result(),
+            {(g1, u1): False, (g1, u2): True,
+             (g2, u1): False, (g2, u2): False})
+        self.assertEqual(self.reader.are_admins([(g1, u1), (g2, u1)]).result(),
+                         {(g1, u1): True, (g2, u1): False})
+
+    def test_lists(self):
+        """Test group, member and counter lookups."""
+        from invenio_groups.models import MembershipState
+
+        g1, g2, u1, u2 = self.g1.id, self.g2.id, self.u1.id, self.u2.id
+        futures = [
+            self.reader.groups_for_user(u1),
+            self.reader.groups_for_user(u2, with_pending=True),
+            self.reader.members_of(g1),
+            self.reader.members_of(g2, state=MembershipState.PENDING_ADMIN),
+            self.reader.pending_counts([g1, g2]),
+        ]
+        self.assertEqual([f.result() for f in futures], [
+            [g1],
+            sorted([g1, g2]),
+            [u2],
+            [u2],
+            {g1: dict(pending_admin=0, pending_user=0),
+             g2: dict(pending_admin=1, pending_user=0)},
+        ])
+        self.assertEqual(self.reader.groups_for_user(0).result(), [])
+
+    @skipIf(PY2, 'asyncio requires Python 3')
+    def test_asyncio(self):
+        """Test awaiting results in an event loop."""
+        import asyncio
+
+        loop = asyncio.new_event_loop()
+        reader = self.reader.for_asyncio(loop=loop)
+        try:
+            result = [
+                loop.run_until_complete(reader.is_member(
+                    self.g1.id, self.u2.id)),
+                loop.run_until_complete(reader.groups_for_user(self.u2.id)),
+            ]
+        finally:
+            loop.close()
+        self.assertEqual(result, [True, [self.g1.id]])
+
+
+TEST_SUITE = make_test_suite(GroupsReaderTestCase)
+
+if __name__ == "__main__":
+    run_test_suite(TEST_SUITE)
@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2015 CERN.
+#
+# Invenio is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+
+
+""" Test groups membership cache. """
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+from helpers import BaseTestCase
+
+from invenio.ext.sqlalchemy import db
+from invenio.testsuite import InvenioTestCase, make_test_suite, run_test_suite
+
+
+class LRUCacheTestCase(InvenioTestCase):
+    """Test LRUCache class."""
+
+    def test_eviction(self):
+        """Test least recently used entries are evicted."""
+        from invenio_groups.cache import LRUCache
+
+        c = LRUCache(maxsize=2)
+        c.set('a', 1)
+        c.set('b', 2)
+        self.assertEqual(c.get('a'), 1)
+        c.set('c', 3)
+        self.assertIsNone(c.get('b'))
+        self.assertEqual(c.get('a'), 1)
+        self.assertEqual(c.get('c'), 3)
+        self.assertEqual(c.stats(), dict(hits=3, misses=1, size=2))
+
+    def test_ttl(self):
+        """Test expiration of entries."""
+        from invenio_groups.cache import LRUCache
+
+        now = [0]
+        c = LRUCache(maxsize=2, ttl=10, timer=lambda: now[0])
+        c.set('a', 1)
+        now[0] = 5
+        self.assertEqual(c.get('a'), 1)
+        now[0] = 10
+        self.assertIsNone(c.get('a'))
+        self.assertEqual(c.misses, 1)
+
+
+class BackendTestCase(InvenioTestCase):
+    """Test cache backends."""
+
+    def _test_backend(self, backend):
+        from invenio_groups.cache import MembershipCache
+
+        c = MembershipCache(backend=backend, ttl=60)
+        self.assertEqual(c.member_group_ids(1, lambda: [1, 2]),
+                         frozenset([1, 2]))
+        self.assertEqual(c.member_group_ids(1, lambda: [3]),
+                         frozenset([1, 2]))
+        self.assertEqual(c.group_member_ids(1, lambda: [1]), frozenset([1]))
+        c.invalidate_user(1)
+        self.assertEqual(c.member_group_ids(1, lambda: [3]), frozenset([3]))
+        self.assertEqual(c.group_member_ids(1, lambda: [2]), frozenset([1]))
+        c.invalidate_group(1)
+        self.assertEqual(c.group_member_ids(1, lambda: [2]), frozenset([2]))
+        c.clear()
+        self.assertEqual(c.member_group_ids(1, lambda: []), frozenset())
+        self.assertEqual(c.stats(), dict(hits=2, misses=5))
+
+    def test_memory_backend(self):
+        """Test in-memory backend."""
+        from invenio_groups.cache import MemoryBackend
+
+        self._test_backend(MemoryBackend())
+
+    def test_memory_backend_counters(self):
+        """Test version counters of the in-memory backend are bounded."""
+        from invenio_groups.cache import MembershipCache, MemoryBackend
+
+        backend = MemoryBackend(maxsize=2)
+        c = MembershipCache(backend=backend, ttl=60)
+        for user_id in (1, 2, 3):
+            c.member_group_ids(user_id, lambda: [user_id])
+        for user_id in (1, 2, 3):
+            c.invalidate_user(user_id)
+        self.assertEqual(len(backend._counters), 2)
+        for user_id in (1, 2, 3):
+            self.assertEqual(c.member_group_ids(user_id, lambda: [0]),
+                             frozenset([0]))
+
+    def test_redis_backend(self):
+        """Test Redis backend against fakeredis."""
+        from invenio_groups.cache import MemoryBackend, RedisBackend
+        try:
+            import fakeredis
+        except ImportError:
+            self.skipTest("fakeredis is not installed")
+
+        self._test_backend(RedisBackend(fakeredis.FakeStrictRedis()))
+
+        # two processes sharing a server see each other's invalidations
+        client = fakeredis.FakeStrictRedis()
+        client.flushall()
+        from invenio_groups.cache import MembershipCache
+        c1 = MembershipCache(backend=RedisBackend(client))
+        c2 = MembershipCache(backend=RedisBackend(client))
+        c1.member_group_ids(1, lambda: [1])
+        self.assertEqual(c2.member_group_ids(1, lambda: [2]),
+                         frozenset([1]))
+        c2.invalidate_user(1)
+        self.assertEqual(c1.member_group_ids(1, lambda: [2]),
+                         frozenset([2]))
+        self.assertIsInstance(MemoryBackend.from_app(self.app),
+                              MemoryBackend)
+
+
+class MembershipCacheTestCase(BaseTestCase):
+    """Test cache integration with data models."""
+
+    def setUp(self):
+        """Enable cache and clear tables."""
+        self.app.config['GROUPS_CACHE_ENABLED'] = True
+        self.app.extensions.pop('invenio-groups-cache', None)
+        super(MembershipCacheTestCase, self).setUp()
+
+    def tearDown(self):
+        """Disable cache."""
+        self.app.config['GROUPS_CACHE_ENABLED'] = False
+        self.app.extensions.pop('invenio-groups-cache', None)
+        super(MembershipCacheTestCase, self).tearDown()
+
+    def test_invalidation(self):
+        """Test signals invalidate cached entries."""
+        from invenio_groups.cache import get_cache
+        from invenio_groups.models import Group, MembershipState
+        from invenio.modules.accounts.models import User
+
+        u = User(email="test@test.test", password="test")
+        db.session.add(u)
+        db.session.commit()
+        g = Group.create(name="test")
+        cache = get_cache()
+
+        self.assertFalse(g.is_member(u))
+        self.assertFalse(g.is_member(u))
+        self.assertEqual(cache.stats()['hits'], 1)
+
+        m = g.add_member(u, state=MembershipState.PENDING_USER)
+        self.assertFalse(g.is_member(u))
+        self.assertEqual(g.members_count(), 0)
+        m.accept()
+        self.assertTrue(g.is_member(u))
+        self.assertEqual(g.members_count(), 1)
+        self.assertEqual(Group.query_by_user(u).count(), 1)
+
+        self.assertFalse(g.is_admin(u))
+        g.add_admin(u)
+        self.assertTrue(g.is_admin(u))
+        g.remove_admin(u)
+        self.assertFalse(g.is_admin(u))
+
+        g.remove_member(u)
+        self.assertFalse(g.is_member(u))
+        self.assertEqual(g.members_count(), 0)
+        self.assertEqual(Group.query_by_user(u).count(), 0)
+
+        g2 = Group.create(name="test2", admins=[u])
+        self.assertTrue(g2.is_admin(u))
+        self.assertEqual(Group.query_by_user(u).count(), 1)
+
+    def test_nested_invalidation(self):
+        """Test nested group changes only invalidate affected users."""
+        from invenio_groups.cache import get_cache
+        from invenio_groups.models import Group
+        from invenio.modules.accounts.models import User
+
+        u1 = User(email="test1@test1.test1", password="test1")
+        u2 = User(email="test2@test2.test2", password="test2")
+        db.session.add_all([u1, u2])
+        db.session.commit()
+        g = Group.create(name="test")
+        members = Group.create(name="members")
+        members.add_member(u1)
+        other = Group.create(name="other")
+        other.add_member(u2)
+        cache = get_cache()
+
+        self.assertFalse(g.is_member(u1))
+        self.assertTrue(other.is_member(u2))
+        g.add_member_group(members)
+        hits = cache.stats()['hits']
+        self.assertTrue(g.is_member(u1))
+        self.assertTrue(other.is_member(u2))
+        self.assertEqual(cache.stats()['hits'], hits + 1)
+
+        g.remove_member_group(members)
+        self.assertFalse(g.is_member(u1))
+
+        g.add_member_group(members)
+        self.assertTrue(g.is_member(u1))
+        hits = cache.stats()['hits']
+        g.delete()
+        self.assertEqual(Group.query_by_user(u1).count(), 1)
+        self.assertTrue(other.is_member(u2))
+        self.assertEqual(cache.stats()['hits'], hits + 1)
+
+
+TEST_SUITE = make_test_suite(LRUCacheTestCase, BackendTestCase,
+                             MembershipCacheTestCase)
+
+if __name__ == "__main__":
+    run_test_suite(TEST_SUITE)
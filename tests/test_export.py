@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2015 CERN.
+#
+# Invenio is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+
+
+""" Test export of group members. """
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import json
+from datetime import datetime
+
+from helpers import BaseTestCase
+
+from invenio.ext.sqlalchemy import db
+from invenio.testsuite import make_test_suite, run_test_suite
+
+
+class ExportTestCase(BaseTestCase):
+    """Test streaming of member lists."""
+
+    def test_stream_by_group(self):
+        """Test rows are streamed in user id order and filtered by state."""
+        from invenio_groups.models import EXPORT_FIELDS, Group, Membership, \
+            MembershipState
+        from invenio.modules.accounts.models import User
+
+        users = [User(email="test{0}@test.test".format(i),
+                      nickname="test{0}".format(i), password="test")
+                 for i in range(3)]
+        db.session.add_all(users)
+        db.session.commit()
+        g = Group.create(name="test")
+        g.add_member(users[0])
+        g.add_member(users[1], state=MembershipState.PENDING_ADMIN)
+        g.add_member(users[2])
+
+        rows = list(Membership.stream_by_group(g, batch_size=2))
+        self.assertEqual([r['id_user'] for r in rows],
+                         sorted(u.id for u in users))
+        self.assertEqual(set(rows[0]), set(EXPORT_FIELDS))
+        self.assertEqual(rows[0]['email'], "test0@test.test")
+        self.assertEqual(rows[1]['state'], MembershipState.PENDING_ADMIN)
+
+        rows = list(Membership.stream_by_group(
+            g.id, state=MembershipState.ACTIVE))
+        self.assertEqual([r['nickname'] for r in rows], ["test0", "test2"])
+        self.assertEqual(list(Membership.stream_by_group(0)), [])
+
+    def test_serializers(self):
+        """Test CSV and JSON lines serialization."""
+        from invenio_groups.export import to_csv, to_jsonlines
+
+        rows = [dict(id_user=1, nickname=None, email='a,"b"@test.test',
+                     state='M', created=datetime(2015, 1, 1),
+                     modified=datetime(2015, 1, 2))]
+
+        self.assertEqual(list(to_csv(rows)), [
+            'id_user,nickname,email,state,created,modified\r\n',
+            '1,,"a,""b""@test.test",M,2015-01-01T00:00:00,'
+            '2015-01-02T00:00:00\r\n',
+        ])
+        lines = list(to_jsonlines(rows))
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(json.loads(lines[0]), dict(
+            id_user=1, nickname=None, email='a,"b"@test.test', state='M',
+            created='2015-01-01T00:00:00', modified='2015-01-02T00:00:00'))
+
+
+TEST_SUITE = make_test_suite(ExportTestCase)
+
+if __name__ == "__main__":
+    run_test_suite(TEST_SUITE)
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2015 CERN.
+#
+# Invenio is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+
+
+""" Test bulk import of memberships. """
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+from helpers import BaseTestCase
+
+from invenio.ext.sqlalchemy import db
+from invenio.testsuite import make_test_suite, run_test_suite
+
+
+class ImporterTestCase(BaseTestCase):
+    """Test import_memberships."""
+
+    def setUp(self):
+        """Clear tables and create fixtures."""
+        from invenio_groups.models import Group, MembershipState
+        from invenio.modules.accounts.models import User
+
+        super(ImporterTestCase, self).setUp()
+        self.users = [User(email="test{0}@test.test".format(i),
+                           password="test") for i in range(3)]
+        db.session.add_all(self.users)
+        db.session.commit()
+        self.a = Group.create(name="a")
+        self.b = Group.create(name="b")
+        self.a.add_member(self.users[0])
+        self.a.add_member(self.users[1], state=MembershipState.PENDING_ADMIN)
+
+    def _rows(self):
+        return [
+            dict(group="a", user="test0@test.test"),
+            dict(group="a", user=str(self.users[1].id), state="active"),
+            dict(group="a", user="TEST2@test.test", state="U"),
+            dict(group="b", user=self.users[0].id, admin="yes"),
+            dict(group="missing", user="test0@test.test"),
+            dict(group="b", user="missing@test.test"),
+            dict(group="b", user="test1@test.test", state="invalid"),
+        ]
+
+    def test_dry_run(self):
+        """Test changes are only reported."""
+        from invenio_groups.importer import import_memberships
+        from invenio_groups.models import Membership
+
+        stats = import_memberships(self._rows(), batch_size=3, dry_run=True)
+        self.assertEqual(stats['rows'], 7)
+        self.assertEqual(stats['created'], 2)
+        self.assertEqual(stats['updated'], 1)
+        self.assertEqual(stats['unchanged'], 1)
+        self.assertEqual(stats['admins_added'], 1)
+        self.assertEqual(stats['unknown_groups'], 1)
+        self.assertEqual(stats['unknown_users'], 1)
+        self.assertEqual(stats['invalid'], 1)
+        self.assertEqual(Membership.query.count(), 2)
+
+    def test_import(self):
+        """Test memberships, admins and counters are updated."""
+        from invenio_groups.importer import import_memberships
+        from invenio_groups.models import Group, Membership, MembershipState
+
+        progress = []
+        stats = import_memberships(self._rows(), batch_size=3,
+                                   progress=lambda s: progress.append(
+                                       s['rows']))
+        self.assertEqual(progress, [3, 6, 7])
+        self.assertEqual(stats['created'], 2)
+
+        self.assertEqual(Membership.get(self.a, self.users[1]).state,
+                         MembershipState.ACTIVE)
+        self.assertEqual(Membership.get(self.a, self.users[2]).state,
+                         MembershipState.PENDING_USER)
+        self.assertTrue(self.b.is_admin(self.users[0]))
+        self.assertTrue(self.b.is_member(self.users[0]))
+        self.assertEqual(Group.recount(), [])
+
+        stats = import_memberships(self._rows())
+        self.assertEqual(stats['created'], 0)
+        self.assertEqual(stats['updated'], 0)
+        self.assertEqual(stats['unchanged'], 4)
+        self.assertEqual(stats['admins_added'], 0)
+
+    def test_readers(self):
+        """Test CSV and JSON lines readers."""
+        from invenio_groups.importer import read_csv, read_jsonlines
+
+        self.assertEqual(
+            list(read_csv(['group,user,state,admin\n', 'a,1,M,\n'])),
+            [dict(group='a', user='1', state='M', admin='')])
+        self.assertEqual(
+            list(read_jsonlines(['{"group": "a", "user": 1}\n', '\n'])),
+            [dict(group='a', user=1)])
+
+
+TEST_SUITE = make_test_suite(ImporterTestCase)
+
+if __name__ == "__main__":
+    run_test_suite(TEST_SUITE)
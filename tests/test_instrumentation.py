@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2015 CERN.
+#
+# Invenio is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+
+
+""" Test groups SQL instrumentation. """
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+from helpers import BaseTestCase
+
+from invenio.testsuite import make_test_suite, run_test_suite
+
+
+class InstrumentationTestCase(BaseTestCase):
+    """Test attribution of SQL queries to groups operations."""
+
+    def setUp(self):
+        """Clear tables but keep the users."""
+        self.clear_tables(users=False)
+
+    def test_profile(self):
+        """Test operations are measured only inside a profile."""
+        from invenio_groups.instrumentation import profile
+        from invenio_groups.models import Group
+        from invenio_groups.signals import operation_profiled
+
+        calls = []
+
+        def _receiver(sender, queries=None, **kwargs):
+            calls.append((sender, queries))
+
+        with operation_profiled.connected_to(_receiver):
+            Group.create(name="test1")
+            self.assertEqual(calls, [])
+
+            with profile('test') as frame:
+                g = Group.create(name="test2")
+                g.members_count()
+
+        self.assertEqual([name for name, dummy in calls],
+                         ['Group.create', 'Group.members_count'])
+        stats = frame.operations['Group.create']
+        self.assertEqual(stats['calls'], 1)
+        self.assertGreater(stats['queries'], 0)
+        self.assertGreaterEqual(frame.queries, stats['queries'])
+        self.assertIn('Group.create:1/', frame.summary())
+
+    def test_failed_query(self):
+        """Test a failing statement does not skew later measurements."""
+        from invenio_groups.instrumentation import profile
+        from invenio_groups.models import Group
+        from invenio.ext.sqlalchemy import db
+
+        with profile('test') as frame:
+            with self.assertRaises(Exception):
+                db.session.execute('SELECT * FROM groupNOSUCHTABLE')
+            db.session.rollback()
+            Group.create(name="test")
+        self.assertGreater(frame.queries, 0)
+        self.assertLessEqual(frame.query_time, frame.duration)
+
+        with profile('test') as frame:
+            Group.query.count()
+        self.assertEqual(frame.queries, 1)
+        self.assertLessEqual(frame.query_time, frame.duration)
+
+    def test_request(self):
+        """Test profile of a settings view request."""
+        from invenio_groups.signals import request_profiled
+
+        self.app.config['GROUPS_INSTRUMENTATION_ENABLED'] = True
+        calls = []
+
+        def _receiver(sender, endpoint=None, queries=None, **kwargs):
+            calls.append((endpoint, queries))
+
+        try:
+            self.login('admin', '')
+            with request_profiled.connected_to(_receiver):
+                response = self.client.get('/account/settings/groups/')
+        finally:
+            self.app.config['GROUPS_INSTRUMENTATION_ENABLED'] = False
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('queries=', response.headers['X-Groups-Profile'])
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(calls[0][0], 'groups_settings.index')
+        self.assertGreater(calls[0][1], 0)
+
+
+TEST_SUITE = make_test_suite(InstrumentationTestCase)
+
+if __name__ == "__main__":
+    run_test_suite(TEST_SUITE)
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2015 CERN.
+#
+# Invenio is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+
+
+""" Test background jobs. """
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+from helpers import BaseTestCase
+
+from invenio.ext.sqlalchemy import db
+from invenio.testsuite import make_test_suite, run_test_suite
+
+
+class JobsTestCase(BaseTestCase):
+    """Test job execution with the thread pool backend."""
+
+    def setUp(self):
+        """Clear tables and create a single worker backend."""
+        from invenio_groups.jobs import get_backend
+
+        super(JobsTestCase, self).setUp()
+        self.app.extensions.pop('invenio-groups-jobs', None)
+        self.app.config['GROUPS_JOBS_WORKERS'] = 1
+        self.backend = get_backend()
+
+    def tearDown(self):
+        """Remove backend and expunge session."""
+        self.app.extensions.pop('invenio-groups-jobs', None)
+        super(JobsTestCase, self).tearDown()
+
+    def _finished(self, job):
+        from invenio_groups.models import GroupJob
+
+        self.backend.wait()
+        db.session.expire_all()
+        return GroupJob.query.get(job.id).to_dict()
+
+    def test_invite_by_emails(self):
+        """Test invitations are sent by a job."""
+        from invenio_groups.jobs import enqueue
+        from invenio_groups.models import Group, InvitationStatus, \
+            JobStatus, Membership
+        from invenio.modules.accounts.models import User
+
+        u1 = User(email="test1@test1.test1", password="test1")
+        u2 = User(email="test2@test2.test2", password="test2")
+        db.session.add_all([u1, u2])
+        db.session.commit()
+        g = Group.create(name="test", admins=[u1])
+        g.add_member(u1)
+
+        emails = ["test1@test1.test1", "test2@test2.test2",
+                  "invalid@invalid.invalid"]
+        job = enqueue('invite_by_emails', user=u1, group_id=g.id,
+                      emails=emails, chunk_size=2)
+        self.assertEqual(job.id_user, u1.id)
+        state = self._finished(job)
+
+        self.assertEqual(state['status'], JobStatus.DONE)
+        self.assertEqual(state['progress'], 3)
+        self.assertEqual(state['total'], 3)
+        self.assertEqual(state['result'], {
+            InvitationStatus.INVITED: ["test2@test2.test2"],
+            InvitationStatus.ALREADY_MEMBER: ["test1@test1.test1"],
+            InvitationStatus.UNKNOWN: ["invalid@invalid.invalid"],
+        })
+        self.assertEqual(Membership.query.count(), 2)
+
+    def test_delete_group(self):
+        """Test group is deleted in chunks by a job."""
+        from invenio_groups.jobs import enqueue
+        from invenio_groups.models import Group, JobStatus, Membership
+        from invenio.modules.accounts.models import User
+
+        g = Group.create(name="test")
+        users = [User(email="test{0}@test.test".format(i), password="test")
+                 for i in range(5)]
+        db.session.add_all(users)
+        db.session.commit()
+        for u in users:
+            g.add_member(u)
+
+        state = self._finished(enqueue('delete_group', group_id=g.id,
+                                       chunk_size=2))
+
+        self.assertEqual(state['status'], JobStatus.DONE)
+        self.assertEqual(state['progress'], 5)
+        self.assertEqual(state['total'], 5)
+        self.assertEqual(state['result'], dict(name="test"))
+        self.assertEqual(Group.query.count(), 0)
+        self.assertEqual(Membership.query.count(), 0)
+
+    def test_failure(self):
+        """Test exceptions of a task are recorded."""
+        from invenio_groups.jobs import TASKS, enqueue, task
+        from invenio_groups.models import JobStatus
+
+        @task('test_fail')
+        def fail(progress, user_id):
+            progress(1, 2)
+            raise ValueError('broken')
+
+        try:
+            state = self._finished(enqueue('test_fail'))
+        finally:
+            TASKS.pop('test_fail')
+
+        self.assertEqual(state['status'], JobStatus.FAILED)
+        self.assertEqual(state['progress'], 1)
+        self.assertEqual(state['error'], 'broken')
+        self.assertIsNone(state['result'])
+
+    def test_checks(self):
+        """Test jobs fail for deleted groups and former admins."""
+        from invenio_groups.jobs import enqueue
+        from invenio_groups.models import Group, JobStatus, Membership
+        from invenio.modules.accounts.models import User
+
+        u1 = User(email="test1@test1.test1", password="test1")
+        db.session.add(u1)
+        db.session.commit()
+        g = Group.create(name="test")
+
+        state = self._finished(enqueue('invite_by_emails', user=u1,
+                                       group_id=g.id, emails=[u1.email]))
+        self.assertEqual(state['status'], JobStatus.FAILED)
+        self.assertEqual(state['error'], 'User {0} cannot administer '
+                         'group {1}.'.format(u1.id, g.id))
+        self.assertEqual(Membership.query.count(), 0)
+
+        g_id = g.id
+        g.delete()
+        state = self._finished(enqueue('delete_group', group_id=g_id))
+        self.assertEqual(state['status'], JobStatus.FAILED)
+        self.assertEqual(state['error'],
+                         'Group {0} does not exist.'.format(g_id))
+
+    def test_run_once(self):
+        """Test a job submitted twice runs only once."""
+        from invenio_groups.jobs import TASKS, enqueue, run_job, task
+        from invenio_groups.models import JobStatus
+
+        calls = []
+
+        @task('test_count')
+        def count(progress, user_id):
+            calls.append(1)
+            return len(calls)
+
+        try:
+            job = enqueue('test_count')
+            self.backend.submit(job.id)
+            state = self._finished(job)
+            run_job(job.id)
+        finally:
+            TASKS.pop('test_count')
+
+        self.assertEqual(calls, [1])
+        self.assertEqual(state['status'], JobStatus.DONE)
+        self.assertEqual(state['result'], 1)
+
+    def test_backend(self):
+        """Test the backend of the application is created from config."""
+        from invenio_groups.jobs import ThreadPoolBackend, get_backend
+
+        self.assertIsInstance(self.backend, ThreadPoolBackend)
+        self.assertIs(self.backend.app, self.app)
+        self.assertEqual(self.backend.workers, 1)
+        self.assertIs(get_backend(), self.backend)
+
+    def test_stale(self):
+        """Test running jobs without updates are marked as failed."""
+        from datetime import datetime, timedelta
+
+        from invenio_groups.jobs import fail_stale_jobs
+        from invenio_groups.models import GroupJob, JobStatus
+
+        old = datetime.now() - timedelta(hours=2)
+        stale = GroupJob(name='test', status=JobStatus.RUNNING,
+                         modified=old)
+        running = GroupJob(name='test', status=JobStatus.RUNNING)
+        pending = GroupJob(name='test', modified=old)
+        db.session.add_all([stale, running, pending])
+        db.session.commit()
+
+        self.assertEqual(fail_stale_jobs(timeout=3600), 1)
+        self.assertEqual(GroupJob.query.get(stale.id).status,
+                         JobStatus.FAILED)
+        self.assertEqual(GroupJob.query.get(stale.id).error,
+                         'Job stopped responding.')
+        self.assertEqual(GroupJob.query.get(running.id).status,
+                         JobStatus.RUNNING)
+        self.assertEqual(GroupJob.query.get(pending.id).status,
+                         JobStatus.PENDING)
+
+
+TEST_SUITE = make_test_suite(JobsTestCase)
+
+if __name__ == "__main__":
+    run_test_suite(TEST_SUITE)
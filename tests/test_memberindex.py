@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2015 CERN.
+#
+# Invenio is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+
+
+""" Test in-memory member index. """
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+from helpers import BaseTestCase
+
+from invenio.ext.sqlalchemy import db
+from invenio.testsuite import InvenioTestCase, make_test_suite, run_test_suite
+
+
+class SortedIntSetTestCase(InvenioTestCase):
+    """Test SortedIntSet class."""
+
+    def test_operations(self):
+        """Test set operations against Python sets."""
+        from invenio_groups.memberindex import SortedIntSet
+
+        a, b = set([1, 3, 5, 7, 9]), set([3, 4, 5, 100])
+        s_a, s_b = SortedIntSet(a), SortedIntSet(b)
+        self.assertEqual(list(s_a & s_b), sorted(a & b))
+        self.assertEqual(list(s_a | s_b), sorted(a | b))
+        self.assertEqual(list(s_a - s_b), sorted(a - b))
+        self.assertEqual(list(s_b - s_a), sorted(b - a))
+        large = SortedIntSet(range(0, 1000, 2))
+        self.assertEqual(list(SortedIntSet([2, 3, 998]) & large), [2, 998])
+        self.assertEqual(len(s_a), 5)
+        self.assertTrue(3 in s_a)
+        self.assertFalse(4 in s_a)
+
+    def test_contains_many(self):
+        """Test vectorized membership test keeps order of values."""
+        from invenio_groups.memberindex import SortedIntSet
+
+        s = SortedIntSet([2, 4, 6])
+        self.assertEqual(s.contains_many([6, 1, 4, 4, 7]),
+                         [True, False, True, True, False])
+        self.assertEqual(s.contains_many([]), [])
+
+    def test_add_discard(self):
+        """Test updates keep the array sorted."""
+        from invenio_groups.memberindex import SortedIntSet
+
+        s = SortedIntSet()
+        for value in [5, 1, 3, 3]:
+            s.add(value)
+        self.assertEqual(list(s), [1, 3, 5])
+        s.discard(3)
+        s.discard(4)
+        self.assertEqual(s, [1, 5])
+
+
+class MemberIndexTestCase(BaseTestCase):
+    """Test MemberIndex class."""
+
+    def setUp(self):
+        """Clear tables and reset the index."""
+        super(MemberIndexTestCase, self).setUp()
+        self.app.extensions.pop('invenio-groups-member-index', None)
+
+    def tearDown(self):
+        """Reset the index and expunge session."""
+        self.app.extensions.pop('invenio-groups-member-index', None)
+        super(MemberIndexTestCase, self).tearDown()
+
+    def _fixtures(self):
+        from invenio_groups.models import Group
+        from invenio.modules.accounts.models import User
+
+        users = [User(email="test{0}@test.test".format(i), password="test")
+                 for i in range(4)]
+        db.session.add_all(users)
+        db.session.commit()
+        a, b, c = [Group.create(name=name) for name in ("a", "b", "c")]
+        for u in users[:3]:
+            a.add_member(u)
+        for u in users[1:]:
+            b.add_member(u)
+        c.add_member(users[2])
+        return users, a, b, c
+
+    def test_set_operations(self):
+        """Test intersection, union and difference of groups."""
+        from invenio_groups.memberindex import get_member_index
+
+        users, a, b, c = self._fixtures()
+        ids = [u.id for u in users]
+        index = get_member_index()
+        self.assertEqual(index.load(), 3)
+
+        self.assertEqual(list(index.intersection(a, b)), ids[1:3])
+        self.assertEqual(list(index.union(a.id, c.id)), ids[:3])
+        self.assertEqual(
+            list(index.difference(index.intersection(a, b), c)), [ids[1]])
+        self.assertEqual(list(index.difference(b, a)), [ids[3]])
+
+        # results are copies, stored sets are replaced on updates
+        index.intersection(a).discard(ids[0])
+        index.difference(a).discard(ids[1])
+        index.members(a).discard(ids[2])
+        self.assertEqual(list(index.members(a)), ids[:3])
+        snapshot = index._members(a)
+        index.add(a.id, [ids[3], 0])
+        index.remove(a.id, [ids[0]])
+        self.assertEqual(list(snapshot), ids[:3])
+        self.assertEqual(list(index.members(a)), [0] + ids[1:])
+
+    def test_are_members(self):
+        """Test vectorized membership test."""
+        from invenio_groups.memberindex import are_members
+        from invenio_groups.models import Membership, MembershipState
+
+        users, a, b, c = self._fixtures()
+        ids = [u.id for u in users]
+        self.assertEqual(are_members(c, [ids[2], ids[0], 0]),
+                         [True, False, False])
+        self.assertEqual(are_members(a.id, ids), [True, True, True, False])
+
+        Membership.create(c, users[0], MembershipState.PENDING_ADMIN)
+        self.assertEqual(are_members(c, [ids[0]]), [False])
+
+    def test_signals(self):
+        """Test index follows membership changes."""
+        from invenio_groups.memberindex import get_member_index
+        from invenio_groups.models import Membership, MembershipState
+
+        users, a, b, c = self._fixtures()
+        ids = [u.id for u in users]
+        index = get_member_index()
+        index.load()
+
+        a.remove_member(users[0])
+        self.assertEqual(list(index.members(a)), ids[1:3])
+
+        m = Membership.create(a, users[3], MembershipState.PENDING_ADMIN)
+        self.assertFalse(ids[3] in index.members(a))
+        m.accept()
+        self.assertTrue(ids[3] in index.members(a))
+
+        Membership.create_many(c, ids)
+        self.assertEqual(list(index.members(c)), ids)
+
+        c_id = c.id
+        c.delete()
+        self.assertEqual(list(index.members(c_id)), [])
+
+    def test_nested(self):
+        """Test members of nested groups are members."""
+        from invenio_groups.memberindex import are_members, get_member_index
+        from invenio_groups.models import Group
+
+        users, a, b, c = self._fixtures()
+        ids = [u.id for u in users]
+        index = get_member_index()
+        index.load()
+
+        d = Group.create(name="d")
+        d.add_member_group(c)
+        a.add_member_group(d)
+        self.assertEqual(are_members(d, [ids[2], ids[3]]), [True, False])
+        self.assertEqual(list(index.members(a)), ids[:3])
+
+        c.add_member(users[3])
+        self.assertEqual(are_members(a, [ids[3]]), [True])
+        self.assertEqual(list(index.intersection(a, b)), ids[1:])
+
+        c.remove_member(users[3])
+        self.assertEqual(are_members(a, [ids[3]]), [False])
+        self.assertEqual(list(index.members(d)), [ids[2]])
+
+        d.remove_member_group(c)
+        self.assertEqual(list(index.members(d)), [])
+        self.assertEqual(list(index.members(a)), ids[:3])
+
+    def test_ttl(self):
+        """Test groups are reloaded after expiration."""
+        from invenio_groups.memberindex import MemberIndex
+        from invenio_groups.models import EffectiveMembership, Membership
+
+        now = [0]
+        users, a, b, c = self._fixtures()
+        index = MemberIndex(ttl=10, timer=lambda: now[0])
+        self.assertEqual(len(index.members(a)), 3)
+        EffectiveMembership.query.filter_by(id_group=a.id).delete()
+        Membership.query.filter_by(id_group=a.id).delete()
+        db.session.commit()
+        self.assertEqual(len(index.members(a)), 3)
+        now[0] = 10
+        self.assertEqual(len(index.members(a)), 0)
+
+
+TEST_SUITE = make_test_suite(SortedIntSetTestCase, MemberIndexTestCase)
+
+if __name__ == "__main__":
+    run_test_suite(TEST_SUITE)
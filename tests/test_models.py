@@ -22,32 +22,15 @@
 
 from __future__ import absolute_import, print_function, unicode_literals
 
+from helpers import BaseTestCase
+
 from invenio.ext.sqlalchemy import db
-from invenio.testsuite import InvenioTestCase, make_test_suite, run_test_suite
+from invenio.testsuite import make_test_suite, run_test_suite
 
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm.exc import FlushError, NoResultFound
 
 
-class BaseTestCase(InvenioTestCase):
-    """Base test case."""
-
-    def setUp(self):
-        """Clear tables."""
-        from invenio_groups.models import Group, Membership, GroupAdmin
-        from invenio.modules.accounts.models import User
-
-        Group.query.delete()
-        Membership.query.delete()
-        GroupAdmin.query.delete()
-        User.query.delete()
-        db.session.commit()
-
-    def tearDown(self):
-        """Expunge session."""
-        db.session.expunge_all()
-
-
 class SubscriptionPolicyTestCase(BaseTestCase):
     """Test SubscriptionPolicy class."""
 
@@ -220,6 +203,30 @@ class GroupTestCase(BaseTestCase):
         self.assertEqual(GroupAdmin.query.count(), 0)
         self.assertEqual(Membership.query.count(), 0)
 
+    def test_delete_all_states(self):
+        """Test deletion of memberships in any state, in chunks."""
+        from invenio_groups.models import Group, GroupAdmin, Membership, \
+            MembershipState
+        from invenio.modules.accounts.models import User
+
+        users = [User(email="test{0}@test.test".format(i), password="test")
+                 for i in range(5)]
+        db.session.add_all(users)
+        db.session.commit()
+        for chunk_size in [None, 2]:
+            a = Group.create(name="admin")
+            g = Group.create(name="test", admins=[a, users[0]])
+            g.add_members(users[:2])
+            g.add_members(users[2:4], state=MembershipState.PENDING_ADMIN)
+            g.add_members(users[4:], state=MembershipState.PENDING_USER)
+            self.assertEqual(len(g.members), 5)
+
+            g.delete(chunk_size=chunk_size)
+            self.assertEqual(Group.query.count(), 1)
+            self.assertEqual(Membership.query.count(), 0)
+            self.assertEqual(GroupAdmin.query.count(), 0)
+            a.delete()
+
     def test_update(self):
         """."""
         from invenio_groups.models import Group, SubscriptionPolicy, \
@@ -284,6 +291,49 @@ class GroupTestCase(BaseTestCase):
         self.assertEqual(Group.query_by_names(["test1", "test2"]).count(), 2)
         self.assertEqual(Group.query_by_names([]).count(), 0)
 
+    def test_search(self):
+        """Test search engines."""
+        from invenio_groups.models import Group, GroupNameNGram
+        from invenio_groups.search import NGramEngine, PrefixEngine, \
+            SubstringEngine
+
+        g = Group.create(name="Physics")
+        Group.create(name="Astrophysics")
+        Group.create(name="phys_ics 100%")
+
+        def names(q):
+            return [x.name for x in Group.search(Group.query, q)]
+
+        try:
+            self.app.extensions['invenio-groups-search'] = PrefixEngine()
+            self.assertEqual(names("ph"), ["Physics", "phys_ics 100%"])
+            self.assertEqual(names("phys_"), ["phys_ics 100%"])
+            self.assertEqual(names("phys%"), [])
+
+            self.app.extensions['invenio-groups-search'] = SubstringEngine()
+            self.assertEqual(names("physics"), ["Physics", "Astrophysics"])
+            self.assertEqual(names("0%"), ["phys_ics 100%"])
+            unranked = Group.search(Group.query, "physics", rank=False)
+            self.assertEqual(
+                [x.name for x in unranked.order_by(Group.name)],
+                ["Astrophysics", "Physics"])
+
+            self.app.extensions['invenio-groups-search'] = NGramEngine()
+            self.assertEqual(names("PHYSICS"), ["Physics", "Astrophysics"])
+            self.app.extensions['invenio-groups-search'] = NGramEngine(0.4)
+            self.assertEqual(names("phisics")[0], "Physics")
+
+            g.update(name="Chemistry")
+            self.assertEqual(names("chem"), ["Chemistry"])
+            self.assertEqual(names("physics"), ["Astrophysics"])
+            g.delete()
+            self.assertEqual(
+                GroupNameNGram.query.filter_by(group_id=g.id).count(), 0)
+            GroupNameNGram.rebuild()
+            self.assertEqual(names("physics"), ["Astrophysics"])
+        finally:
+            self.app.extensions.pop('invenio-groups-search', None)
+
     def test_query_by_user(self):
         """."""
         from invenio_groups.models import Group, Membership, \
@@ -385,6 +435,45 @@ class GroupTestCase(BaseTestCase):
         self.assertEqual(Membership.query.count(), 0)
         self.assertIsNone(g.remove_member(u))
 
+    def test_add_remove_members(self):
+        """Test bulk addition and removal of members."""
+        from invenio_groups.models import Group, Membership, \
+            MembershipState
+        from invenio_groups.signals import memberships_added, \
+            memberships_removed
+        from invenio.modules.accounts.models import User
+
+        g = Group.create(name="test1")
+        users = [User(email="test{0}@test.test".format(i), password="test")
+                 for i in range(5)]
+        db.session.add_all(users)
+        db.session.commit()
+        g.add_member(users[0])
+
+        calls = []
+
+        def _receiver(sender, group=None, user_ids=None, **kwargs):
+            calls.append((group.id, sorted(user_ids)))
+
+        with memberships_added.connected_to(_receiver):
+            added = g.add_members(users, state=MembershipState.PENDING_USER)
+        self.assertEqual(sorted(added), sorted(u.id for u in users[1:]))
+        self.assertEqual(calls, [(g.id, sorted(added))])
+        self.assertEqual(Membership.query.count(), 5)
+        self.assertEqual(
+            Membership.query_by_group(
+                g, state=MembershipState.PENDING_USER).count(), 4)
+        self.assertEqual(g.add_members(users), [])
+
+        calls = []
+        with memberships_removed.connected_to(_receiver):
+            self.assertEqual(g.remove_members(users[:3]), 3)
+            self.assertEqual(g.remove_members(users), 2)
+            self.assertEqual(g.remove_members(users[:3]), 0)
+        self.assertEqual(calls, [(g.id, sorted(u.id for u in users[:3])),
+                                 (g.id, sorted(u.id for u in users[3:]))])
+        self.assertEqual(Membership.query.count(), 0)
+
     def test_invite(self):
         """."""
         from invenio_groups.models import Group, Membership, \
@@ -409,6 +498,46 @@ class GroupTestCase(BaseTestCase):
         self.assertEqual(Membership.query.count(), 2)
         self.assertEqual(m.state, MembershipState.PENDING_USER)
 
+    def test_invite_by_emails(self):
+        """Test bulk invitation by emails."""
+        from invenio_groups.models import Group, InvitationStatus, \
+            Membership, MembershipState
+        from invenio.modules.accounts.models import User
+
+        g = Group.create(name="test")
+        u1 = User(email="test1@test1.test1", password="test1")
+        u2 = User(email="test2@test2.test2", password="test2")
+        u3 = User(email="test3@test3.test3", password="test3")
+        u4 = User(email="Test4@Test4.test4", password="test4")
+        db.session.add_all([u1, u2, u3, u4])
+        db.session.commit()
+        g.add_member(u1)
+
+        report = g.invite_by_emails([
+            "test1@test1.test1", "test2@test2.test2", "test3@test3.test3",
+            "test4@test4.test4", "invalid@invalid.invalid",
+        ])
+
+        self.assertEqual(report["test1@test1.test1"],
+                         InvitationStatus.ALREADY_MEMBER)
+        self.assertEqual(report["test2@test2.test2"],
+                         InvitationStatus.INVITED)
+        self.assertEqual(report["test3@test3.test3"],
+                         InvitationStatus.INVITED)
+        self.assertEqual(report["test4@test4.test4"],
+                         InvitationStatus.INVITED)
+        self.assertEqual(report["invalid@invalid.invalid"],
+                         InvitationStatus.UNKNOWN)
+        self.assertEqual(Membership.query.count(), 4)
+        self.assertEqual(Membership.get(g, u4).state,
+                         MembershipState.PENDING_USER)
+        self.assertEqual(Membership.get(g, u2).state,
+                         MembershipState.PENDING_USER)
+        self.assertEqual(g.invite_by_emails([]), {})
+        self.assertEqual(
+            g.invite_by_emails(["test2@test2.test2"])["test2@test2.test2"],
+            InvitationStatus.ALREADY_MEMBER)
+
     def test_subscribe(self):
         """."""
         from invenio_groups.models import Group, SubscriptionPolicy, \
@@ -466,6 +595,197 @@ class GroupTestCase(BaseTestCase):
 
         self.assertTrue(g.is_member(u))
 
+    def test_annotate_for_user(self):
+        """Test batched permission summary."""
+        from invenio_groups.models import Group, MembershipState, \
+            PrivacyPolicy
+        from invenio.modules.accounts.models import User
+
+        u = User(email="test@test.test", password="test")
+        u2 = User(email="test2@test2.test2", password="test2")
+        db.session.add_all([u, u2])
+        db.session.commit()
+
+        g1 = Group.create(name="test1", admins=[u])
+        g2 = Group.create(name="test2", privacy_policy=PrivacyPolicy.MEMBERS)
+        g3 = Group.create(name="test3", privacy_policy=PrivacyPolicy.PUBLIC)
+        g1.add_member(u2)
+        g2.add_member(u)
+        g2.add_member(u2)
+        g3.add_member(u, state=MembershipState.PENDING_ADMIN)
+
+        result = Group.annotate_for_user([g1, g2, g3], u)
+
+        self.assertEqual(Group.annotate_for_user([], u), {})
+        self.assertTrue(result[g1.id]['is_admin'])
+        self.assertFalse(result[g1.id]['is_member'])
+        self.assertTrue(result[g1.id]['can_see_members'])
+        self.assertEqual(result[g1.id]['members_count'], 1)
+        self.assertFalse(result[g2.id]['is_admin'])
+        self.assertTrue(result[g2.id]['is_member'])
+        self.assertTrue(result[g2.id]['can_see_members'])
+        self.assertEqual(result[g2.id]['members_count'], 2)
+        self.assertFalse(result[g3.id]['is_member'])
+        self.assertEqual(result[g3.id]['state'],
+                         MembershipState.PENDING_ADMIN)
+        self.assertTrue(result[g3.id]['can_see_members'])
+        self.assertEqual(result[g3.id]['members_count'], 0)
+        for g in [g1, g2, g3]:
+            self.assertEqual(result[g.id]['is_admin'], g.is_admin(u))
+            self.assertEqual(result[g.id]['is_member'], g.is_member(u))
+            self.assertEqual(result[g.id]['can_see_members'],
+                             g.can_see_members(u))
+            self.assertEqual(result[g.id]['members_count'],
+                             g.members_count())
+
+    def test_visible_member_lists(self):
+        """Test batched member list visibility."""
+        from invenio_groups.models import Group, PrivacyPolicy
+        from invenio.modules.accounts.models import User
+
+        u = User(email="test@test.test", password="test")
+        u2 = User(email="test2@test2.test2", password="test2")
+        db.session.add_all([u, u2])
+        db.session.commit()
+
+        groups = [
+            Group.create(name="public", privacy_policy=PrivacyPolicy.PUBLIC),
+            Group.create(name="members",
+                         privacy_policy=PrivacyPolicy.MEMBERS),
+            Group.create(name="members_in",
+                         privacy_policy=PrivacyPolicy.MEMBERS),
+            Group.create(name="admins", privacy_policy=PrivacyPolicy.ADMINS),
+            Group.create(name="admins_in", admins=[u],
+                         privacy_policy=PrivacyPolicy.ADMINS),
+        ]
+        groups[2].add_member(u)
+        groups[3].add_member(u)
+        ids = [g.id for g in groups]
+
+        self.assertEqual(Group.visible_member_lists(u, []), {})
+        self.assertEqual(Group.visible_member_lists(u, ids + [ids[0], 0]),
+                         dict(zip(ids, [True, False, True, False, True])))
+        self.assertEqual(Group.visible_member_lists(u2, ids),
+                         dict(zip(ids, [True, False, False, False, False])))
+        for g in groups:
+            for user in [u, u2]:
+                self.assertEqual(
+                    Group.visible_member_lists(user, [g.id])[g.id],
+                    g.can_see_members(user))
+
+    def test_counters(self):
+        """Test denormalized membership and admin counters."""
+        from invenio_groups.models import Group, GroupAdmin, Membership, \
+            MembershipState
+        from invenio.modules.accounts.models import User
+
+        users = [User(email="test{0}@test.test".format(i), password="test")
+                 for i in range(4)]
+        db.session.add_all(users)
+        db.session.commit()
+        a = Group.create(name="admins")
+        g = Group.create(name="test", admins=[users[0], a])
+
+        def counters():
+            g = Group.query.filter_by(name="test").one()
+            return (g.active_count, g.pending_admin_count,
+                    g.pending_user_count, g.admins_count)
+
+        self.assertEqual(counters(), (0, 0, 0, 2))
+        g.add_member(users[0])
+        g.add_members(users[1:3], state=MembershipState.PENDING_ADMIN)
+        g.invite(users[3])
+        self.assertEqual(counters(), (1, 2, 1, 2))
+        Membership.accept_many([(users[1].id, g.id)])
+        Membership.get(g, users[3]).accept()
+        self.assertEqual(counters(), (3, 1, 0, 2))
+        self.assertEqual(g.members_count(), 3)
+        Membership.get(g, users[2]).reject()
+        g.remove_member(users[3])
+        g.remove_members(users[:2])
+        self.assertEqual(counters(), (0, 0, 0, 2))
+        g.remove_admin(users[0])
+        self.assertEqual(counters(), (0, 0, 0, 1))
+        a.delete()
+        self.assertEqual(counters(), (0, 0, 0, 0))
+        self.assertEqual(GroupAdmin.query_admins_by_group_ids([g.id]).count(),
+                         0)
+
+        self.assertEqual(Group.recount(), [])
+        g.add_member(users[0])
+        Group.query.filter_by(id=g.id).update({Group.active_count: 5})
+        db.session.commit()
+        self.assertEqual(Group.recount([g.id]), [g.id])
+        self.assertEqual(counters(), (1, 0, 0, 0))
+
+
+class GroupAdminClosureTestCase(BaseTestCase):
+    """Test transitive group administration."""
+
+    def test_nested_admins(self):
+        """Test closure maintenance and effective admins at any depth."""
+        from invenio_groups.models import Group, GroupAdminClosure, \
+            Membership, MembershipState
+        from invenio.modules.accounts.models import User
+
+        u1 = User(email="test1@test1.test1", password="test1")
+        u2 = User(email="test2@test2.test2", password="test2")
+        u3 = User(email="test3@test3.test3", password="test3")
+        db.session.add_all([u1, u2, u3])
+        db.session.commit()
+
+        # g4 administers g3 administers g2 administers g1
+        g1 = Group.create(name="g1")
+        g2 = Group.create(name="g2")
+        g3 = Group.create(name="g3")
+        g4 = Group.create(name="g4", admins=[u1])
+        g1.add_admin(g2)
+        g3.add_admin(g4)
+        g2.add_admin(g3)
+        g4.add_member(u2)
+        g1.add_member(u3, state=MembershipState.PENDING_ADMIN)
+
+        def depths():
+            return dict(
+                ((a, d), depth) for (a, d, depth) in
+                GroupAdminClosure.query.with_entities(
+                    GroupAdminClosure.ancestor_id,
+                    GroupAdminClosure.descendant_id,
+                    GroupAdminClosure.depth))
+
+        self.assertEqual(depths(), {
+            (g2.id, g1.id): 1, (g3.id, g1.id): 2, (g4.id, g1.id): 3,
+            (g3.id, g2.id): 1, (g4.id, g2.id): 2, (g4.id, g3.id): 1,
+        })
+
+        self.assertEqual(
+            set(u.id for u in g1.query_effective_admins()),
+            set([u1.id, u2.id]))
+        self.assertEqual(
+            set(g.id for g in Group.query_administered_by(u1)),
+            set([g1.id, g2.id, g3.id, g4.id]))
+        self.assertEqual(
+            set(g.id for g in Group.query_administered_by(u2)),
+            set([g1.id, g2.id, g3.id]))
+        self.assertEqual(Group.query_administered_by(u3).count(), 0)
+        self.assertEqual(Membership.query_requests(u2).count(), 1)
+
+        # shortcut keeps the shortest depth and survives removal
+        g1.add_admin(g4)
+        self.assertEqual(depths()[(g4.id, g1.id)], 1)
+        g2.remove_admin(g3)
+        self.assertEqual(depths(), {
+            (g2.id, g1.id): 1, (g4.id, g1.id): 1, (g4.id, g3.id): 1,
+        })
+        self.assertEqual(Membership.query_requests(u2).count(), 1)
+
+        g4.delete()
+        self.assertEqual(depths(), {(g2.id, g1.id): 1})
+        self.assertEqual(Membership.query_requests(u2).count(), 0)
+
+        GroupAdminClosure.rebuild()
+        self.assertEqual(depths(), {(g2.id, g1.id): 1})
+
 
 class MembershipTestCase(BaseTestCase):
     """Test of membership data model."""
@@ -619,6 +939,50 @@ class MembershipTestCase(BaseTestCase):
         self.assertEqual(Membership.query_by_group(g).count(), 1)
         self.assertEqual(Membership.query_by_group(u2).count(), 0)
 
+    def test_keyset_paginate(self):
+        """Test keyset pagination of members and groups."""
+        from invenio_groups.models import Group, Membership, \
+            MembershipState
+        from invenio.modules.accounts.models import User
+
+        g = Group.create(name="test")
+        users = [User(email="test{0}@test.test".format(i), password="test")
+                 for i in range(5)]
+        db.session.add_all(users)
+        db.session.commit()
+        for u in users:
+            Membership.create(g, u, MembershipState.ACTIVE)
+            Group.create(name="group{0}".format(u.id), admins=[users[0]])
+
+        keys = [Membership.modified, Membership.id_user]
+        query = Membership.query_by_group(g)
+        page = query.keyset_paginate(keys, per_page=2, count=True)
+        self.assertEqual(page.total, 5)
+        self.assertFalse(page.has_prev)
+        seen = [m.id_user for m in page.items]
+        while page.has_next:
+            page = query.keyset_paginate(keys, cursor=page.next_cursor,
+                                         per_page=2)
+            seen.extend(m.id_user for m in page.items)
+        self.assertEqual(sorted(seen), sorted(u.id for u in users))
+        self.assertEqual(len(page.items), 1)
+
+        page = query.keyset_paginate(keys, cursor=page.prev_cursor,
+                                     per_page=2)
+        self.assertEqual([m.id_user for m in page.items], seen[2:4])
+        self.assertTrue(page.has_next)
+        self.assertTrue(page.has_prev)
+
+        page = query.keyset_paginate(keys, cursor='invalid', per_page=2)
+        self.assertEqual([m.id_user for m in page.items], seen[:2])
+
+        groups = Group.query_by_user(users[0]).keyset_paginate(
+            [Group.name, Group.id], per_page=3, descending=True)
+        names = sorted(['test'] + ['group{0}'.format(u.id) for u in users],
+                       reverse=True)
+        self.assertEqual([x.name for x in groups.items], names[:3])
+        self.assertEqual(groups.estimated_total, 6)
+
     def test_accept(self):
         """."""
         from invenio_groups.models import Group, Membership, \
@@ -635,6 +999,75 @@ class MembershipTestCase(BaseTestCase):
 
         self.assertEqual(m.state, MembershipState.ACTIVE)
 
+    def test_accept_many(self):
+        """Test bulk activation of memberships."""
+        from invenio_groups.models import Group, Membership, \
+            MembershipState
+        from invenio_groups.signals import memberships_accepted
+        from invenio.modules.accounts.models import User
+
+        g1 = Group.create(name="test1")
+        g2 = Group.create(name="test2")
+        u1 = User(email="test1@test1.test1", password="test1")
+        u2 = User(email="test2@test2.test2", password="test2")
+        db.session.add_all([u1, u2])
+        db.session.commit()
+        Membership.create(g1, u1, MembershipState.PENDING_ADMIN)
+        Membership.create(g1, u2, MembershipState.ACTIVE)
+        Membership.create(g2, u1, MembershipState.PENDING_USER)
+        keys = [(u1.id, g1.id), (u2.id, g1.id), (u1.id, g2.id)]
+
+        calls = []
+
+        def _receiver(sender, keys=None):
+            calls.append(sorted(keys))
+
+        with memberships_accepted.connected_to(_receiver):
+            self.assertEqual(Membership.accept_many(keys), 2)
+        self.assertEqual(calls, [sorted([(u1.id, g1.id), (u1.id, g2.id)])])
+        self.assertEqual(Membership.query_by_group(g1).count(), 2)
+        self.assertEqual(Membership.query_by_group(g2).count(), 1)
+        self.assertEqual(Membership.accept_many(keys), 0)
+
+    def test_accept_reject_all(self):
+        """Test set-based approval and rejection of pending requests."""
+        from invenio_groups.models import Group, Membership, \
+            MembershipState
+        from invenio_groups.signals import memberships_removed
+        from invenio.modules.accounts.models import User
+
+        a = User(email="admin@admin.admin", password="admin")
+        users = [User(email="test{0}@test.test".format(i), password="test")
+                 for i in range(4)]
+        db.session.add_all([a] + users)
+        db.session.commit()
+        g1 = Group.create(name="test1", admins=[a])
+        g2 = Group.create(name="test2", admins=[a])
+        for u in users:
+            Membership.create(g1, u, MembershipState.PENDING_ADMIN)
+        Membership.create(g2, users[0], MembershipState.PENDING_ADMIN)
+        Membership.create(g2, users[1], MembershipState.ACTIVE)
+
+        query = Membership.query_requests(a).filter(
+            Membership.id_group == g1.id)
+        self.assertEqual(Membership.accept_all(
+            Membership.search(query, "test0")), 1)
+        self.assertEqual(Membership.query_requests(a).count(), 4)
+        self.assertEqual(Membership.reject_all(query), 3)
+        self.assertEqual(Membership.query_by_group(g1).count(), 1)
+        self.assertEqual(Membership.query_requests(a).count(), 1)
+
+        calls = []
+
+        def _receiver(sender, group=None, user_ids=None, **kwargs):
+            calls.append((group.id, sorted(user_ids)))
+
+        with memberships_removed.connected_to(_receiver):
+            self.assertEqual(Membership.reject_many(
+                [(users[0].id, g2.id), (users[1].id, g2.id)]), 1)
+        self.assertEqual(calls, [(g2.id, [users[0].id])])
+        self.assertEqual(Membership.query_by_group(g2).count(), 1)
+
     def test_reject(self):
         """."""
         from invenio_groups.models import Group, Membership
@@ -727,9 +1160,241 @@ class GroupAdminTestCase(BaseTestCase):
             GroupAdmin.query_admins_by_group_ids, 'invalid')
 
 
+class GroupChangeTestCase(BaseTestCase):
+    """Test GroupChange class."""
+
+    def _changes(self, seq):
+        from invenio_groups.models import GroupChange
+
+        return [(c.change, c.id_user or c.admin_id, c.state)
+                for c in GroupChange.changes_since(seq)]
+
+    def test_changes_since(self):
+        """Test mutators append to the change log."""
+        from invenio_groups.models import ChangeType, Group, GroupChange, \
+            Membership, MembershipState, PrivacyPolicy
+        from invenio.modules.accounts.models import User
+
+        u1 = User(email="test1@test1.test1", password="test1")
+        u2 = User(email="test2@test2.test2", password="test2")
+        db.session.add_all([u1, u2])
+        db.session.commit()
+
+        self.assertEqual(GroupChange.last_seq(), 0)
+        g = Group.create(name="test", admins=[u1])
+        self.assertEqual(self._changes(0), [
+            (ChangeType.GROUP_CREATED, None, None),
+            (ChangeType.ADMIN_ADDED, u1.id, None),
+        ])
+
+        seq = GroupChange.last_seq()
+        g.add_member(u1)
+        g.add_member(u2, state=MembershipState.PENDING_ADMIN)
+        Membership.accept_many([(u2.id, g.id)])
+        g.remove_member(u1)
+        g.update(privacy_policy=PrivacyPolicy.PUBLIC)
+        self.assertEqual(self._changes(seq), [
+            (ChangeType.MEMBER_ADDED, u1.id, MembershipState.ACTIVE),
+            (ChangeType.MEMBER_ADDED, u2.id, MembershipState.PENDING_ADMIN),
+            (ChangeType.MEMBER_UPDATED, u2.id, MembershipState.ACTIVE),
+            (ChangeType.MEMBER_REMOVED, u1.id, MembershipState.ACTIVE),
+            (ChangeType.GROUP_UPDATED, None, None),
+        ])
+
+        seq = GroupChange.last_seq()
+        g.delete()
+        self.assertEqual(self._changes(seq), [
+            (ChangeType.MEMBER_REMOVED, u2.id, MembershipState.ACTIVE),
+            (ChangeType.ADMIN_REMOVED, u1.id, None),
+            (ChangeType.GROUP_DELETED, None, None),
+        ])
+
+        changes = GroupChange.changes_since(0, limit=3)
+        self.assertEqual(len(changes), 3)
+        self.assertEqual([c.seq for c in changes],
+                         sorted(c.seq for c in changes))
+        self.assertEqual(changes[0].to_dict()['change'],
+                         ChangeType.GROUP_CREATED)
+        self.assertEqual(GroupChange.prune(changes[-1].seq), 3)
+        self.assertEqual(GroupChange.changes_since(0)[0].seq,
+                         changes[-1].seq + 1)
+
+    def test_rename(self):
+        """Test a name-only update is logged and bumps the version."""
+        from invenio_groups.models import ChangeType, Group, GroupChange
+
+        g = Group.create(name="test")
+        seq, version = GroupChange.last_seq(), g.version
+        g.update(name="renamed")
+        self.assertEqual(self._changes(seq),
+                         [(ChangeType.GROUP_UPDATED, None, None)])
+        self.assertEqual(Group.query.get(g.id).version, version + 1)
+        self.assertEqual(Group.search(Group.query, 'renamed').count(), 1)
+
+    def test_versions(self):
+        """Test logged changes increment group versions and stamps."""
+        from invenio_groups.models import Group, MembershipState
+        from invenio.modules.accounts.models import User
+
+        u1 = User(email="test1@test1.test1", password="test1")
+        u2 = User(email="test2@test2.test2", password="test2")
+        db.session.add_all([u1, u2])
+        db.session.commit()
+
+        def stamp(user):
+            return Group.version_stamp(
+                Group.query_by_user(user, with_pending=True),
+                Group.query_administered_by(user))
+
+        self.assertEqual(stamp(u2), [[0, 0, 0], [0, 0, 0]])
+        g = Group.create(name="test", admins=[u1])
+        self.assertEqual([s[:2] for s in stamp(u1)],
+                         [[1, g.id], [1, g.id]])
+
+        stamp1, stamp2 = stamp(u1), stamp(u2)
+        g.add_member(u2, state=MembershipState.PENDING_USER)
+        self.assertNotEqual(stamp(u1), stamp1)
+        self.assertNotEqual(stamp(u2), stamp2)
+
+        stamp1 = stamp(u1)
+        g.update(description="changed")
+        self.assertNotEqual(stamp(u1), stamp1)
+
+        stamp2 = stamp(u2)
+        g.remove_member(u2)
+        self.assertNotEqual(stamp(u2), stamp2)
+        self.assertEqual(stamp(u2), [[0, 0, 0], [0, 0, 0]])
+
+        # groups gained through nested member and admin groups
+        members = Group.create(name="members")
+        members.add_member(u2)
+        stamp2 = stamp(u2)
+        g.add_member_group(members)
+        self.assertNotEqual(stamp(u2), stamp2)
+        stamp2 = stamp(u2)
+        other = Group.create(name="other")
+        other.add_admin(members)
+        self.assertNotEqual(stamp(u2), stamp2)
+
+        # only the changed group is bumped, stamps of members follow
+        db.session.expire_all()
+        version, parent = members.version, g.version
+        stamp2 = stamp(u2)
+        members.add_member(u1)
+        db.session.expire_all()
+        self.assertEqual(members.version, version + 1)
+        self.assertEqual(g.version, parent)
+        self.assertNotEqual(stamp(u2), stamp2)
+
+
+class GroupMemberGroupTestCase(BaseTestCase):
+    """Test nested member groups and effective memberships."""
+
+    def _users(self, count):
+        from invenio.modules.accounts.models import User
+
+        users = [User(email="test{0}@test.test".format(i), password="test")
+                 for i in range(count)]
+        db.session.add_all(users)
+        db.session.commit()
+        return users
+
+    def test_nesting(self):
+        """Test members of nested groups are members at any depth."""
+        from invenio_groups.models import ChangeType, EffectiveMembership, \
+            Group, GroupChange, GroupMemberClosure, Membership, \
+            MembershipState
+
+        u1, u2, u3 = self._users(3)
+        a = Group.create(name="a")
+        b = Group.create(name="b")
+        c = Group.create(name="c")
+        a.add_member(u1)
+        b.add_member(u2)
+        c.add_member(u3, state=MembershipState.PENDING_ADMIN)
+
+        a.add_member_group(b)
+        b.add_member_group(c)
+        self.assertEqual(GroupMemberClosure.query.filter_by(
+            ancestor_id=a.id, descendant_id=c.id).one().depth, 2)
+        self.assertTrue(a.is_member(u2))
+        self.assertFalse(a.is_member(u3))
+        self.assertFalse(b.is_member(u1))
+        self.assertEqual(GroupChange.changes_since(0)[-1].change,
+                         ChangeType.MEMBER_GROUP_ADDED)
+
+        Membership.get(c, u3).accept()
+        self.assertTrue(a.is_member(u3))
+        self.assertTrue(b.is_member(u3))
+        self.assertEqual(
+            set(g.id for g in Group.query_by_user(u3).all()),
+            set([a.id, b.id, c.id]))
+
+        self.assertRaises(ValueError, c.add_member_group, a)
+        self.assertRaises(ValueError, a.add_member_group, a)
+
+        # u3 stays member of a through a second chain
+        a.add_member_group(c)
+        b.remove_member_group(c)
+        self.assertFalse(b.is_member(u3))
+        self.assertTrue(a.is_member(u3))
+
+        c.remove_member(u3)
+        self.assertFalse(a.is_member(u3))
+        self.assertFalse(c.is_member(u3))
+
+        b.delete()
+        self.assertFalse(a.is_member(u2))
+        self.assertTrue(a.is_member(u1))
+        self.assertEqual(GroupMemberClosure.query.filter_by(
+            ancestor_id=a.id).count(), 1)
+
+        EffectiveMembership.query.delete()
+        EffectiveMembership.rebuild()
+        self.assertTrue(a.is_member(u1))
+        self.assertEqual(EffectiveMembership.query.count(), 1)
+
+    def test_accept_many_missing(self):
+        """Test accepting missing memberships adds no effective members."""
+        from invenio_groups.models import EffectiveMembership, Group, \
+            Membership, MembershipState
+
+        u1, u2 = self._users(2)
+        a = Group.create(name="a")
+        b = Group.create(name="b")
+        a.add_member_group(b)
+        b.add_member(u1, state=MembershipState.PENDING_ADMIN)
+
+        self.assertEqual(
+            Membership.accept_many([(u1.id, b.id), (u2.id, b.id)]), 1)
+        self.assertTrue(a.is_member(u1))
+        self.assertFalse(b.is_member(u2))
+        self.assertFalse(a.is_member(u2))
+        self.assertEqual(EffectiveMembership.query.filter_by(
+            id_user=u2.id).count(), 0)
+
+    def test_can_see_members(self):
+        """Test effective members can see hidden member lists."""
+        from invenio_groups.models import Group, PrivacyPolicy
+
+        u1, u2 = self._users(2)
+        a = Group.create(name="a", privacy_policy=PrivacyPolicy.MEMBERS)
+        b = Group.create(name="b")
+        b.add_member(u1)
+        self.assertFalse(a.can_see_members(u1))
+        a.add_member_group(b)
+        self.assertTrue(a.can_see_members(u1))
+        self.assertEqual(Group.visible_member_lists(u1, [a.id]), {a.id: True})
+        flags = Group.annotate_for_user([a], u1)[a.id]
+        self.assertTrue(flags['can_see_members'])
+        self.assertFalse(flags['is_member'])
+        self.assertFalse(a.can_see_members(u2))
+
+
 TEST_SUITE = make_test_suite(
     SubscriptionPolicyTestCase, PrivacyPolicyTestCase, GroupTestCase,
-    MembershipTestCase)
+    GroupAdminClosureTestCase, MembershipTestCase, GroupChangeTestCase,
+    GroupMemberGroupTestCase)
 
 if __name__ == "__main__":
     run_test_suite(TEST_SUITE)
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2015 CERN.
+#
+# Invenio is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+
+
+""" Test push delivery of the change log. """
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import gzip
+import json
+import threading
+from datetime import datetime, timedelta
+
+from helpers import BaseTestCase
+
+from invenio.ext.sqlalchemy import db
+from invenio.testsuite import make_test_suite, run_test_suite
+
+from six import BytesIO
+from six.moves.BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Record gzip compressed JSON POSTs and answer with a set status."""
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        assert self.headers['Content-Encoding'] == 'gzip'
+        with gzip.GzipFile(fileobj=BytesIO(body)) as f:
+            self.server.received.append(json.loads(f.read().decode('utf-8')))
+        self.send_response(self.server.status)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class OutboxTestCase(BaseTestCase):
+    """Test delivery against a local HTTP server."""
+
+    def setUp(self):
+        """Clear tables and start the HTTP server."""
+        self.clear_tables(users=False)
+
+        self.server = HTTPServer(('127.0.0.1', 0), _Handler)
+        self.server.received = []
+        self.server.status = 200
+        self.url = 'http://127.0.0.1:{0}/'.format(self.server.server_port)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def tearDown(self):
+        """Stop the HTTP server and expunge session."""
+        self.server.shutdown()
+        self.server.server_close()
+        super(OutboxTestCase, self).tearDown()
+
+    def test_deliver(self):
+        """Test batching, settling and positions."""
+        from invenio_groups.models import ChangeType, Group, GroupDelivery
+        from invenio_groups.outbox import deliver, deliver_all, \
+            delivered_seq
+
+        for name in ("a", "b", "c"):
+            Group.create(name=name)
+        later = datetime.now() + timedelta(seconds=60)
+
+        self.assertEqual(deliver(self.url, settle=60), 0)
+        self.assertEqual(self.server.received, [])
+
+        self.assertEqual(deliver_all([self.url], batch_size=2, settle=0,
+                                     now=later), {self.url: 3})
+        self.assertEqual([len(b['changes']) for b in self.server.received],
+                         [2, 1])
+        changes = [c for b in self.server.received for c in b['changes']]
+        self.assertEqual([c['change'] for c in changes],
+                         [ChangeType.GROUP_CREATED] * 3)
+        self.assertEqual(GroupDelivery.query.get(self.url).seq,
+                         changes[-1]['seq'])
+        self.assertEqual(delivered_seq([self.url]), changes[-1]['seq'])
+        self.assertEqual(delivered_seq([self.url, 'http://other/']), 0)
+        self.assertEqual(deliver(self.url, settle=0, now=later), 0)
+
+    def test_gaps(self):
+        """Test delivery waits a bounded time at gaps."""
+        from invenio_groups.models import ChangeType, GroupChange, \
+            GroupDelivery
+        from invenio_groups.outbox import deliver
+
+        seq = GroupChange.last_seq() + 100
+        now = datetime.now()
+        db.session.add(GroupDelivery(url=self.url, seq=seq, failures=0))
+        db.session.add_all([
+            GroupChange(seq=s, change=ChangeType.GROUP_UPDATED, id_group=1,
+                        created=now)
+            for s in (seq + 1, seq + 3)])
+        db.session.commit()
+
+        later = now + timedelta(seconds=30)
+        self.assertEqual(
+            deliver(self.url, settle=0, gap_timeout=60, now=later), 1)
+        self.assertEqual(
+            deliver(self.url, settle=0, gap_timeout=60, now=later), 0)
+
+        db.session.add(GroupChange(seq=seq + 2,
+                                   change=ChangeType.GROUP_UPDATED,
+                                   id_group=1, created=now))
+        db.session.commit()
+        self.assertEqual(
+            deliver(self.url, settle=0, gap_timeout=60, now=later), 2)
+        self.assertEqual(GroupDelivery.query.get(self.url).seq, seq + 3)
+
+        db.session.add(GroupChange(seq=seq + 5,
+                                   change=ChangeType.GROUP_UPDATED,
+                                   id_group=1, created=now))
+        db.session.commit()
+        self.assertEqual(
+            deliver(self.url, settle=0, gap_timeout=60, now=later), 0)
+        self.assertEqual(deliver(self.url, settle=0, gap_timeout=60,
+                                 now=now + timedelta(seconds=61)), 1)
+        self.assertEqual(GroupDelivery.query.get(self.url).seq, seq + 5)
+
+    def test_retry(self):
+        """Test failed batches are retried with backoff."""
+        from invenio_groups.models import Group, GroupDelivery
+        from invenio_groups.outbox import backoff, deliver
+
+        Group.create(name="a")
+        now = datetime.now() + timedelta(seconds=60)
+        self.server.status = 500
+
+        self.assertIsNone(deliver(self.url, settle=0, now=now))
+        position = GroupDelivery.query.get(self.url)
+        self.assertEqual(position.seq, 0)
+        self.assertEqual(position.failures, 1)
+        self.assertTrue(position.last_error)
+
+        self.server.status = 200
+        self.assertIsNone(deliver(self.url, settle=0, now=now))
+        self.assertEqual(deliver(
+            self.url, settle=0, now=now + timedelta(seconds=backoff(1))), 1)
+        self.assertEqual(len(self.server.received), 2)
+        position = GroupDelivery.query.get(self.url)
+        self.assertEqual(position.failures, 0)
+        self.assertIsNone(position.next_attempt)
+
+        self.assertEqual([backoff(n) for n in range(1, 5)], [2, 4, 8, 16])
+        self.assertEqual(backoff(20), 600)
+
+
+TEST_SUITE = make_test_suite(OutboxTestCase)
+
+if __name__ == "__main__":
+    run_test_suite(TEST_SUITE)
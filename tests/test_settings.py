@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2015 CERN.
+#
+# Invenio is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+
+
+""" Test settings views. """
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+from helpers import BaseTestCase
+
+from invenio.ext.sqlalchemy import db
+from invenio.testsuite import make_test_suite, run_test_suite
+
+
+class ConditionalGetTestCase(BaseTestCase):
+    """Test ETags of the settings views."""
+
+    def setUp(self):
+        """Clear tables and create a group administered by admin."""
+        from invenio_groups.models import Group
+        from invenio.modules.accounts.models import User
+
+        self.clear_tables(users=False)
+        User.query.filter_by(email="test1@test1.test1").delete(
+            synchronize_session=False)
+        db.session.commit()
+
+        self.admin = User.query.filter_by(nickname='admin').one()
+        self.user = User(email="test1@test1.test1", password="test1")
+        db.session.add(self.user)
+        db.session.commit()
+        self.group = Group.create(name="test", admins=[self.admin])
+        self.login('admin', '')
+
+    def tearDown(self):
+        """Remove test user and expunge session."""
+        self.group.delete()
+        db.session.delete(self.user)
+        db.session.commit()
+        super(ConditionalGetTestCase, self).tearDown()
+
+    def _revalidate(self, url):
+        """Get a page and revalidate it with its ETag."""
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response.headers['ETag']
+        response = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers['ETag'], etag)
+        return etag
+
+    def test_index(self):
+        """Test index page is revalidated until a group changes."""
+        url = '/account/settings/groups/'
+        etag = self._revalidate(url)
+        self.group.update(description="changed")
+        response = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+        self.assertNotEqual(self._revalidate(url + '?q=test'), etag)
+
+    def test_members(self):
+        """Test members page is revalidated until the members change."""
+        url = '/account/settings/groups/{0}/members'.format(self.group.id)
+        etag = self._revalidate(url)
+        self.group.add_member(self.user)
+        response = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+
+    def test_requests_and_invitations(self):
+        """Test pending pages change with pending memberships."""
+        from invenio_groups.models import MembershipState
+
+        requests = self._revalidate('/account/settings/groups/requests')
+        invitations = self._revalidate(
+            '/account/settings/groups/invitations')
+        self.group.add_member(self.user,
+                              state=MembershipState.PENDING_ADMIN)
+        self.assertEqual(self.client.get(
+            '/account/settings/groups/requests',
+            headers={'If-None-Match': requests}).status_code, 200)
+        self.assertEqual(self.client.get(
+            '/account/settings/groups/invitations',
+            headers={'If-None-Match': invitations}).status_code, 304)
+
+    def test_disabled(self):
+        """Test ETags can be disabled."""
+        self.app.config['GROUPS_SETTINGS_ETAGS'] = False
+        try:
+            response = self.client.get('/account/settings/groups/')
+        finally:
+            self.app.config['GROUPS_SETTINGS_ETAGS'] = True
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response.headers)
+
+
+TEST_SUITE = make_test_suite(ConditionalGetTestCase)
+
+if __name__ == "__main__":
+    run_test_suite(TEST_SUITE)